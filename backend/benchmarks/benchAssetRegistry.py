@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Asset registry benchmark.
+Renders the same synthetic quotations in one process twice: once with a warm
+asset registry (fonts, logo and styles shared across renders, as in the
+render server and batch workers) and once with the registry reset before
+every document, which is what each render paid before it existed.
+
+Usage: python3 benchAssetRegistry.py [--quotations 100] [--items 10]
+"""
+
+import io
+import json
+import time
+import argparse
+import statistics
+
+from quotationFixtures import make_quotation
+from quotationAssets import ASSETS
+from generateQuotationPDF import render_quotation_pdf
+
+
+def reset_registry():
+    ASSETS.clear()
+
+
+def time_renders(quotations, cold):
+    timings = []
+    for data in quotations:
+        if cold:
+            reset_registry()
+        started = time.perf_counter()
+        render_quotation_pdf(data, io.BytesIO())
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summarize(label, timings):
+    result = {
+        'mode': label,
+        'documents': len(timings),
+        'mean_ms': round(statistics.mean(timings), 2),
+        'median_ms': round(statistics.median(timings), 2),
+        'total_s': round(sum(timings) / 1000, 3),
+    }
+    print(f"{label:>5}: {result['mean_ms']:8.2f} ms/doc mean, "
+          f"{result['median_ms']:8.2f} ms median, {result['total_s']:.2f}s total")
+    return result
+
+
+def run(n_quotations, n_items):
+    quotations = [make_quotation(i, n_items) for i in range(n_quotations)]
+    # One throwaway render so imports and first-use setup don't land in either run.
+    render_quotation_pdf(quotations[0], io.BytesIO())
+
+    cold = summarize('cold', time_renders(quotations, cold=True))
+    reset_registry()
+    warm = summarize('warm', time_renders(quotations, cold=False))
+    saving = cold['mean_ms'] - warm['mean_ms']
+    print(f"saving: {saving:.2f} ms/doc ({saving / cold['mean_ms'] * 100:.1f}%)")
+    return {'cold': cold, 'warm': warm, 'saving_ms_per_doc': round(saving, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-document cost with a cold vs warm asset registry")
+    parser.add_argument('--quotations', type=int, default=100)
+    parser.add_argument('--items', type=int, default=10, help="Line items per quotation")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.quotations, args.items)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
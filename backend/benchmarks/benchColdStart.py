@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark.
+Starts --runs fresh interpreters with and without the precompiled asset
+bundle (PDF_ASSET_BUNDLE, see quotationAssetBundle.py, built into a
+temporary directory first) and times each step up to the first PDF:
+importing the generator, loading the bundle, fonts, the logo (full size and
+downsampled for optimized output), the style sheets, compiling the default
+template and the first render. Reports the median of each. Exits with
+status 1 if the bundled process renders different bytes or did not use the
+bundle.
+
+Usage: python3 benchColdStart.py [--runs 10] [--items 10]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+from quotationFixtures import SCRIPTS_DIR, make_quotation
+
+STEPS = ('import', 'bundle', 'fonts', 'logo', 'logo_optimized', 'styles', 'template', 'first_render')
+
+
+def child(n_items, output_path):
+    """Runs in the fresh interpreter: times each step and prints them as JSON."""
+    timings = {}
+    started = time.perf_counter()
+
+    def lap(step):
+        nonlocal started
+        now = time.perf_counter()
+        timings[step] = (now - started) * 1000
+        started = now
+
+    from generateQuotationPDF import render_quotation_pdf, QuotationHeaderFooter, logo_dpi
+    from quotationAssets import ASSETS, find_logo_path
+    from quotationTemplates import get_quotation_styles, compile_template
+    lap('import')
+    bundled = ASSETS.bundle() is not None
+    lap('bundle')
+    font_reg, font_bold = ASSETS.fonts()
+    lap('fonts')
+    ASSETS.logo()
+    lap('logo')
+    ASSETS.image(find_logo_path(), fit=QuotationHeaderFooter.LOGO_BOX, dpi=logo_dpi())
+    lap('logo_optimized')
+    ASSETS.stylesheet()
+    get_quotation_styles(font_reg, font_bold)
+    lap('styles')
+    payload = make_quotation(0, n_items)
+    compile_template(payload)
+    lap('template')
+    render_quotation_pdf(payload, output_path)
+    lap('first_render')
+    print(json.dumps({'bundled': bundled, 'timings': timings}))
+
+
+def run_child(n_items, output_path, bundle):
+    env = dict(os.environ, PDF_INVARIANT_OUTPUT='1', PDF_ASSET_BUNDLE=bundle or '')
+    out = subprocess.run([sys.executable, __file__, '--items', str(n_items), '--child', output_path],
+                         check=True, capture_output=True, text=True, env=env).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+def build(bundle):
+    subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'quotationAssetBundle.py'), bundle],
+                   check=True, capture_output=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process start to first PDF, with and without the asset bundle")
+    parser.add_argument('--runs', type=int, default=10, help="Fresh processes per mode")
+    parser.add_argument('--items', type=int, default=10, help="Line items in the first quotation")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.items, args.child)
+        return
+
+    problems = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        bundle = os.path.join(work_dir, 'quotation-assets.bundle')
+        started = time.perf_counter()
+        build(bundle)
+        build_ms = (time.perf_counter() - started) * 1000
+        print(f"bundle: {os.path.getsize(bundle)} bytes, built in {build_ms:.0f} ms")
+
+        results = {'sources': [], 'bundle': []}
+        pdfs = {}
+        for run in range(args.runs):
+            # Alternate the modes so drift in the machine's load hits both alike.
+            for mode in results:
+                path = os.path.join(work_dir, f"{mode}.pdf")
+                result = run_child(args.items, path, bundle if mode == 'bundle' else None)
+                if result['bundled'] != (mode == 'bundle'):
+                    problems.append(f"{mode}: bundle {'used' if result['bundled'] else 'not used'}")
+                results[mode].append(result['timings'])
+                with open(path, 'rb') as f:
+                    pdfs.setdefault(mode, set()).add(f.read())
+
+    if len(pdfs['sources'] | pdfs['bundle']) != 1:
+        problems.append("bundled and unbundled processes rendered different PDFs")
+
+    medians = {mode: {step: statistics.median(t[step] for t in timings) for step in STEPS}
+               for mode, timings in results.items()}
+    print(f"{'step (median ms)':<18}{'sources':>10}{'bundle':>10}")
+    for step in STEPS:
+        print(f"{step:<18}{medians['sources'][step]:>10.2f}{medians['bundle'][step]:>10.2f}")
+    totals = {mode: sum(steps.values()) for mode, steps in medians.items()}
+    assets = {mode: sum(steps[step] for step in STEPS[1:6]) for mode, steps in medians.items()}
+    print(f"{'assets':<18}{assets['sources']:>10.2f}{assets['bundle']:>10.2f}"
+          f"  ({assets['sources'] / assets['bundle']:.1f}x)")
+    print(f"{'to first PDF':<18}{totals['sources']:>10.2f}{totals['bundle']:>10.2f}"
+          f"  ({totals['sources'] - totals['bundle']:.1f} ms saved)")
+    if problems:
+        raise SystemExit('\n'.join(problems))
+
+
+if __name__ == '__main__':
+    main()
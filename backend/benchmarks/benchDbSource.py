@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Database source benchmark.
+Builds a SQLite stand-in from complete_database_with_data.sql, checks the
+payloads quotationDbSource streams for its quotations match the route's
+JOIN as quotationFixtures emulates it, then copies the quotations up to
+--rows and times getting every payload ready to render two ways:
+
+  per-quotation  one query per id, JSON-encoded to a temp file and read
+                 back, as a Node-driven bulk job hands payloads over
+  stream         one query over all of them, rows streamed --itersize at a
+                 time (quotationDbSource)
+
+With --render both paths also render every PDF. With --postgres the
+payloads are also checked against, and both paths timed on, the
+PostgreSQL server in the DB_* variables, which must hold the dump
+(--rows does not apply). Exits with status 1 if any payload differs.
+
+Usage: python3 benchDbSource.py [--rows 2000] [--itersize 200] [--render] [--postgres]
+"""
+
+import io
+import os
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+
+from quotationFixtures import load_sql_quotations
+from quotationDbSource import SqliteSource, PostgresSource, build_sqlite_standin
+from generateQuotationPDF import render_quotation_pdf
+
+
+def check_payloads(source):
+    """Differences between streamed payloads and the fixture emulation of the route."""
+    expected = {str(payload['id']): payload for payload in load_sql_quotations()}
+    problems = []
+    for payload in source.payloads():
+        fixture = expected.pop(str(payload['id']), None)
+        if fixture is None:
+            problems.append(f"quotation {payload['id']} is not in the dump")
+            continue
+        for name in sorted(set(payload) | set(fixture)):
+            if str(payload.get(name)) != str(fixture.get(name)):
+                problems.append(f"quotation {payload['id']}: {name} is {payload.get(name)!r}, "
+                                f"the route gives {fixture.get(name)!r}")
+    problems.extend(f"quotation {missing} was not streamed" for missing in expected)
+    return problems
+
+
+def copy_quotations(db_path, rows):
+    """Copies the stand-in's quotations (new ids and quote numbers) until there are rows of them."""
+    conn = sqlite3.connect(db_path)
+    originals = conn.execute('SELECT * FROM quotations ORDER BY id').fetchall()
+    names = [column[0] for column in conn.execute('SELECT * FROM quotations LIMIT 0').description]
+    id_at, number_at = names.index('id'), names.index('quote_number')
+    next_id = max(row[id_at] for row in originals) + 1
+    copies = []
+    for index in range(rows - len(originals)):
+        row = list(originals[index % len(originals)])
+        row[id_at] = next_id + index
+        row[number_at] = f"{row[number_at]}-{index}"
+        copies.append(row)
+    conn.executemany(f"INSERT INTO quotations VALUES ({', '.join('?' for _ in names)})", copies)
+    conn.commit()
+    conn.close()
+
+
+def time_per_quotation(source, ids, render, work_dir):
+    started = time.perf_counter()
+    for quotation_id in ids:
+        payload = next(source.payloads([quotation_id]))
+        path = os.path.join(work_dir, f"{quotation_id}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        os.unlink(path)
+        if render:
+            render_quotation_pdf(payload, io.BytesIO())
+    return time.perf_counter() - started
+
+
+def time_stream(source, render):
+    started = time.perf_counter()
+    count = 0
+    for payload in source.payloads():
+        count += 1
+        if render:
+            render_quotation_pdf(payload, io.BytesIO())
+    return time.perf_counter() - started, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming quotations from the database vs per-quotation handoff")
+    parser.add_argument('--rows', type=int, default=2000, help="Quotations to read (default: 2000)")
+    parser.add_argument('--itersize', type=int, default=200, help="Rows per fetch for the stream path")
+    parser.add_argument('--render', action='store_true', help="Render every PDF as well")
+    parser.add_argument('--postgres', action='store_true',
+                        help="Also check and time PostgreSQL (DB_* variables)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, 'standin.db')
+        build_sqlite_standin(db_path)
+        with SqliteSource(db_path) as source:
+            problems = check_payloads(source)
+        if args.postgres:
+            with PostgresSource(itersize=args.itersize) as source:
+                problems += check_payloads(source)
+        if problems:
+            raise SystemExit('\n'.join(problems))
+        print("streamed payloads match the route's JOIN")
+
+        if args.postgres:
+            source = PostgresSource(itersize=args.itersize)
+        else:
+            copy_quotations(db_path, args.rows)
+            source = SqliteSource(db_path, itersize=args.itersize)
+        with source:
+            ids = [payload['id'] for payload in source.payloads()]
+            per_quotation_s = time_per_quotation(source, ids, args.render, work_dir)
+            stream_s, count = time_stream(source, args.render)
+
+    label = 'read + render' if args.render else 'read'
+    print(f"{label} {len(ids)} quotations per quotation: {per_quotation_s:.2f}s "
+          f"({per_quotation_s / len(ids) * 1000:.3f} ms each)")
+    print(f"{label} {count} quotations streamed:      {stream_s:.2f}s "
+          f"({stream_s / count * 1000:.3f} ms each, {per_quotation_s / stream_s:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
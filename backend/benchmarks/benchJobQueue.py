@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Render job queue load test.
+Submits synthetic quotations to a fresh quotationJobQueue database in
+bursts (as when a batch of quotations is sent at once) while a pool of
+queue workers drains it, then reports sustained throughput, queue latency
+(submit -> first claim) and end-to-end latency (submit -> PDF stored)
+percentiles, and how long each burst took to clear. A share of the
+payloads is invalid, to check that they are dead-lettered without
+holding up the rest. Before the load test, a worker's lease is made to
+run out mid-render while another worker takes the job over and completes
+it, to check that the stalled worker's late completion is refused and
+leaves the other worker's PDF in place. Exits with status 1 on either
+failure.
+
+Usage: python3 benchJobQueue.py [--workers N] [--bursts 5] [--burst-size 50]
+           [--gap 2.0] [--items 10] [--invalid-rate 0.02]
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import statistics
+import multiprocessing
+
+from quotationFixtures import make_quotation
+from quotationJobQueue import JobQueue, run_workers, render_job, output_paths
+
+
+def invalid_quotation(index):
+    payload = make_quotation(index, 1)
+    payload['items'] = [{'description': 'Broken line', 'quantity': 'lots', 'unit_price': 1}]
+    return payload
+
+
+def percentiles(values):
+    if not values:
+        return None
+    if len(values) == 1:
+        return {'p50': values[0], 'p95': values[0], 'p99': values[0], 'max': values[0]}
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {'p50': round(cuts[49], 1), 'p95': round(cuts[94], 1), 'p99': round(cuts[98], 1),
+            'max': round(max(values), 1)}
+
+
+def submit_bursts(queue, bursts, burst_size, gap_s, n_items, invalid_rate, seed=0):
+    """Submits the bursts and returns [(burst start, [job ids])], plus the ids meant to fail."""
+    rng = random.Random(seed)
+    submitted, invalid = [], set()
+    index = 0
+    for burst in range(bursts):
+        if burst:
+            time.sleep(gap_s)
+        started = time.time()
+        ids = []
+        for _ in range(burst_size):
+            job_id = f"load-{index}"
+            if rng.random() < invalid_rate:
+                queue.submit(invalid_quotation(index), job_id)
+                invalid.add(job_id)
+            else:
+                queue.submit(make_quotation(index, n_items), job_id)
+            ids.append(job_id)
+            index += 1
+        submitted.append((started, ids))
+    return submitted, invalid
+
+
+def check_lost_lease(work_dir):
+    """
+    Problems (a list of strings) found when a worker finishes rendering a
+    job after its lease ran out and another worker rendered and completed it.
+    """
+    db_path = os.path.join(work_dir, 'lease.db')
+    output_dir = os.path.join(work_dir, 'lease-pdfs')
+    os.makedirs(output_dir)
+    stalled, taker = JobQueue(db_path, lease_s=0.05), JobQueue(db_path)
+    try:
+        stalled.submit(make_quotation(0, 3), 'lost-lease')
+        job = stalled.claim('stalled')
+        output_path, stalled_staged = output_paths(output_dir, job['id'], 'stalled')
+        # The stalled worker's render outlasts its lease without a heartbeat...
+        time.sleep(0.1)
+        taken = taker.claim('taker')
+        if taken is None or taken['id'] != job['id']:
+            return ["the expired lease wasn't handed to another worker"]
+        _, taker_staged = output_paths(output_dir, taken['id'], 'taker')
+        render_job(taken, taker_staged)
+        taker.complete(taken['id'], 'taker', output_path, 1.0, taker_staged)
+        with open(output_path, 'rb') as f:
+            expected = f.read()
+        # ...and only finishes (with different bytes) after the job is done.
+        with open(stalled_staged, 'wb') as f:
+            f.write(b'%PDF-1.4 stale render')
+        completed = stalled.complete(job['id'], 'stalled', output_path, 1.0, stalled_staged)
+
+        problems = []
+        if completed:
+            problems.append("complete() accepted a worker whose lease ran out")
+        with open(output_path, 'rb') as f:
+            if f.read() != expected:
+                problems.append("the stalled worker overwrote the completed job's PDF")
+        if os.path.exists(stalled_staged):
+            problems.append("the stalled worker's staging file was left behind")
+        status = taker.status(job['id'])
+        if status['status'] != 'done' or status['worker'] != 'taker':
+            problems.append(f"job ended {status['status']} by {status['worker']}, not done by taker")
+        return problems
+    finally:
+        stalled.close()
+        taker.close()
+
+
+def run(workers, bursts, burst_size, gap_s, n_items, invalid_rate):
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, 'queue.db')
+        queue = JobQueue(db_path)
+        stop = multiprocessing.get_context('spawn').Event()
+        supervisor = threading.Thread(target=run_workers, args=(db_path, os.path.join(work_dir, 'pdfs')),
+                                      kwargs={'workers': workers, 'max_jobs': 0, 'poll_s': 0.01, 'stop': stop})
+        supervisor.start()
+        try:
+            submitted, invalid = submit_bursts(queue, bursts, burst_size, gap_s, n_items, invalid_rate)
+            while queue.pending():
+                time.sleep(0.05)
+        finally:
+            stop.set()
+            supervisor.join()
+
+        jobs = {job_id: queue.status(job_id) for _, ids in submitted for job_id in ids}
+        queue.close()
+
+    done = [job for job in jobs.values() if job['status'] == 'done']
+    dead = {job['id'] for job in jobs.values() if job['status'] == 'dead'}
+    if dead != invalid or len(done) + len(dead) != len(jobs):
+        raise SystemExit(f"Unexpected outcome: {len(done)} done, {len(dead)} dead, "
+                         f"{len(invalid)} invalid payloads submitted")
+
+    first_submit = min(job['submitted_at'] for job in jobs.values())
+    last_finish = max(job['finished_at'] for job in jobs.values())
+    wall_s = last_finish - first_submit
+    busy_s = sum(job['render_ms'] for job in done) / 1000
+    burst_results = []
+    for number, (started, ids) in enumerate(submitted, 1):
+        clear_s = max(jobs[job_id]['finished_at'] for job_id in ids) - started
+        burst_results.append({'burst': number, 'jobs': len(ids), 'clear_s': round(clear_s, 3)})
+
+    return {
+        'workers': workers,
+        'jobs': len(jobs),
+        'done': len(done),
+        'dead': len(dead),
+        'wall_s': round(wall_s, 3),
+        'pdfs_per_second': round(len(done) / wall_s, 2),
+        'worker_utilisation': round(busy_s / (wall_s * workers), 3),
+        'queue_ms': percentiles([job['queue_ms'] for job in jobs.values()]),
+        'total_ms': percentiles([job['total_ms'] for job in done]),
+        'render_ms': percentiles([job['render_ms'] for job in done]),
+        'bursts': burst_results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bursty load test of the quotation render job queue")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--bursts', type=int, default=5)
+    parser.add_argument('--burst-size', type=int, default=50, help="Jobs submitted back to back per burst")
+    parser.add_argument('--gap', type=float, default=2.0, help="Seconds between bursts")
+    parser.add_argument('--items', type=int, default=10, help="Line items per quotation")
+    parser.add_argument('--invalid-rate', type=float, default=0.02,
+                        help="Share of payloads that can't be rendered (default: 0.02)")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        problems = check_lost_lease(work_dir)
+    if problems:
+        raise SystemExit('Lost lease: ' + '; '.join(problems))
+    print("lost lease: a stalled worker's late render was discarded")
+
+    result = run(args.workers, args.bursts, args.burst_size, args.gap, args.items, args.invalid_rate)
+    print(f"{result['jobs']} jobs in {args.bursts} bursts of {args.burst_size}, {args.workers} workers: "
+          f"{result['done']} done, {result['dead']} dead-lettered")
+    print(f"sustained throughput: {result['pdfs_per_second']:.2f} PDFs/s over {result['wall_s']:.2f}s "
+          f"(workers busy {result['worker_utilisation']:.0%})")
+    for label in ('queue_ms', 'total_ms', 'render_ms'):
+        stats = result[label]
+        print(f"{label:>10}: p50 {stats['p50']:8.1f}  p95 {stats['p95']:8.1f}  "
+              f"p99 {stats['p99']:8.1f}  max {stats['max']:8.1f}")
+    for burst in result['bursts']:
+        print(f"burst {burst['burst']}: {burst['jobs']} jobs cleared in {burst['clear_s']:.2f}s")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Layout dry run benchmark.
+Times layout_quotation (quotationLayout.py) against a full in-memory render
+for the quotations in complete_database_with_data.sql and synthetic
+quotations at --items line items, with the full and minimal templates.
+Exits with status 1 if the dry run's page count differs from the
+rendered PDF's or its per-page item ranges don't cover every line item
+exactly once.
+
+Usage: python3 benchLayoutDryRun.py [--items 1,10,100,1000] [--repeat 5]
+"""
+
+import io
+import time
+import argparse
+import statistics
+
+from quotationFixtures import make_quotation, load_sql_quotations
+from quotationModel import parse_quotation
+from quotationMetrics import RenderMetrics
+from generateQuotationPDF import render_quotation_pdf
+from quotationLayout import layout_quotation
+
+
+def scenarios(item_counts):
+    for payload in load_sql_quotations():
+        yield f"sql/{payload['quote_number']}", payload
+    for n_items in item_counts:
+        for template in ('full', 'minimal'):
+            yield f"{n_items}/{template}", make_quotation(0, n_items, description_words=30, template=template)
+
+
+def best_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def check(name, payload, layout):
+    """Problems with layout, checked against a real render of payload."""
+    problems = []
+    metrics = RenderMetrics()
+    render_quotation_pdf(payload, io.BytesIO(), metrics)
+    if layout['page_count'] != metrics.counts['pages']:
+        problems.append(f"{name}: dry run has {layout['page_count']} pages, the PDF {metrics.counts['pages']}")
+    expected = 1
+    for page in layout['pages']:
+        if page['items']:
+            first, last = page['items']
+            if first != expected:
+                problems.append(f"{name}: page {page['page']} starts at item {first}, expected {expected}")
+            expected = last + 1
+    n_items = len(parse_quotation(payload).items)
+    if expected - 1 != n_items:
+        problems.append(f"{name}: pages cover {expected - 1} of {n_items} items")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Layout-only dry run vs full render")
+    parser.add_argument('--items', default='1,10,100,1000',
+                        help="Comma-separated item counts for the synthetic quotations (default: 1,10,100,1000)")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per scenario (median reported)")
+    args = parser.parse_args()
+
+    item_counts = [int(n) for n in args.items.split(',')]
+    problems = []
+    print(f"{'scenario':<22}{'pages':>6}{'render ms':>11}{'layout ms':>11}{'speedup':>9}  warnings")
+    for name, payload in scenarios(item_counts):
+        layout = layout_quotation(payload)  # warm the asset registry and template
+        problems.extend(check(name, payload, layout))
+        render_ms = best_ms(lambda: render_quotation_pdf(payload, io.BytesIO()), args.repeat)
+        layout_ms = best_ms(lambda: layout_quotation(payload), args.repeat)
+        warnings = ','.join(sorted({warning['type'] for warning in layout['warnings']})) or '-'
+        print(f"{name:<22}{layout['page_count']:>6}{render_ms:>11.2f}{layout_ms:>11.2f}"
+              f"{render_ms / layout_ms:>8.1f}x  {warnings}")
+    if problems:
+        raise SystemExit('\n'.join(problems))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Long item list benchmark.
+Renders one synthetic quotation at 100, 1k, 10k and 50k line items through
+the chunked ItemsTable and reports time per 1k items, which should stay
+roughly flat if layout is linear. With --monolithic, sizes up to
+--monolithic-max are also laid out as one platypus Table (the pre-chunking
+layout, with the header row repeated) for comparison.
+
+Usage: python3 benchLongTable.py [--sizes 100,1000,10000,50000] [--monolithic]
+"""
+
+import io
+import json
+import time
+import argparse
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.platypus import SimpleDocTemplate, Table
+
+from quotationFixtures import make_quotation
+from generateQuotationPDF import render_quotation_pdf
+from quotationAssets import register_custom_fonts
+from quotationTemplates import get_quotation_styles
+from quotationItemsTable import ItemRows, TITLE, COLUMN_HEADERS
+from quotationModel import parse_items
+
+
+def time_chunked(data):
+    started = time.perf_counter()
+    render_quotation_pdf(data, io.BytesIO())
+    return time.perf_counter() - started
+
+
+def time_monolithic(data):
+    font_reg, font_bold = register_custom_fonts()
+    styles = get_quotation_styles(font_reg, font_bold)
+    total_width = A4[0] - 30*mm
+    col_widths = [total_width*0.45, total_width*0.15, total_width*0.20, total_width*0.20]
+
+    started = time.perf_counter()
+    items = parse_items(data['items'])
+    rows = ItemRows(items, styles, col_widths)
+    cells = [rows.measure(item)[0] for item in items]
+    table = Table([[TITLE, "", "", ""], COLUMN_HEADERS] + cells, colWidths=col_widths, repeatRows=2)
+    table.setStyle(styles.items_table)
+    doc = SimpleDocTemplate(io.BytesIO(), pagesize=A4, rightMargin=15*mm, leftMargin=15*mm,
+                            topMargin=68*mm, bottomMargin=15*mm)
+    doc.build([table])
+    return time.perf_counter() - started
+
+
+def run(sizes, monolithic_max=None):
+    results = []
+    for n_items in sizes:
+        data = make_quotation(0, n_items)
+        result = {'items': n_items, 'chunked_s': round(time_chunked(data), 3)}
+        result['chunked_ms_per_1k'] = round(result['chunked_s'] * 1e6 / n_items, 1)
+        line = f"{n_items:>7} items: chunked {result['chunked_s']:8.3f}s ({result['chunked_ms_per_1k']:.1f} ms/1k)"
+        if monolithic_max is not None and n_items <= monolithic_max:
+            result['monolithic_s'] = round(time_monolithic(data), 3)
+            line += f"  monolithic {result['monolithic_s']:8.3f}s"
+        print(line)
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Layout time vs number of quotation line items")
+    parser.add_argument('--sizes', default='100,1000,10000,50000',
+                        help="Comma-separated item counts (default: 100,1000,10000,50000)")
+    parser.add_argument('--monolithic', action='store_true',
+                        help="Also time the single-Table layout for comparison")
+    parser.add_argument('--monolithic-max', type=int, default=10000,
+                        help="Largest item count to lay out as a single Table (default: 10000)")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    sizes = [int(n) for n in args.sizes.split(',')]
+    results = run(sizes, args.monolithic_max if args.monolithic else None)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Output size benchmark.
+Renders the quotations in complete_database_with_data.sql and synthetic
+quotations at 10, 100 and 1k line items twice, as today's output and in
+the output-optimized mode (PDF_OPTIMIZE_OUTPUT: logo downsampled to the
+box it is drawn in, binary Flate streams), and reports the bytes of each
+per category (images, fonts, content streams, other; see
+quotationPdfSize.py) next to the median render time. Exits with status 1
+if an embedded font is not subset or optimized output comes out larger.
+
+Usage: python3 benchOutputSize.py [--items 10,100,1000] [--repeat 5] [--logo-dpi 150]
+"""
+
+import io
+import os
+import json
+import time
+import argparse
+import statistics
+
+from quotationFixtures import make_quotation, load_sql_quotations
+from generateQuotationPDF import render_quotation_pdf
+from quotationPdfSize import CATEGORIES, size_breakdown
+
+MODES = ('default', 'optimized')
+
+
+def scenarios(item_counts):
+    for payload in load_sql_quotations():
+        yield f"sql/{payload['quote_number']}", payload
+    for n_items in item_counts:
+        yield f"synthetic/{n_items}", make_quotation(0, n_items)
+
+
+def measure(payload, optimize, repeat):
+    render_quotation_pdf(payload, io.BytesIO(), optimize=optimize)  # warm the asset registry
+    times = []
+    for _ in range(repeat):
+        output = io.BytesIO()
+        started = time.perf_counter()
+        render_quotation_pdf(payload, output, optimize=optimize)
+        times.append((time.perf_counter() - started) * 1000)
+    sizes = size_breakdown(output.getvalue())
+    return {
+        'ms': round(statistics.median(times), 2),
+        'bytes': sizes['total'],
+        **{name: sizes[name] for name in CATEGORIES},
+        'fonts_subset': all(font['subset'] for font in sizes['embedded_fonts']),
+    }
+
+
+def run(item_counts, repeat):
+    results = {}
+    for name, payload in scenarios(item_counts):
+        results[name] = {mode: measure(payload, mode == 'optimized', repeat) for mode in MODES}
+    return results
+
+
+def print_results(results):
+    header = ''.join(f"{name:>9}" for name in CATEGORIES)
+    print(f"{'scenario':<24}{'mode':<10}{'bytes':>9}{header}{'ms':>9}")
+    for name, modes in results.items():
+        for mode in MODES:
+            result = modes[mode]
+            cells = ''.join(f"{result[category]:>9}" for category in CATEGORIES)
+            print(f"{name:<24}{mode:<10}{result['bytes']:>9}{cells}{result['ms']:>9.2f}")
+        default, optimized = modes['default'], modes['optimized']
+        print(f"{'':<24}{'saved':<10}{1 - optimized['bytes'] / default['bytes']:>9.0%}"
+              f"{'':>{9 * len(CATEGORIES)}}{optimized['ms'] - default['ms']:>+9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF bytes per category and render time, default vs optimized output")
+    parser.add_argument('--items', default='10,100,1000',
+                        help="Comma-separated item counts for the synthetic quotations (default: 10,100,1000)")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed renders per scenario and mode")
+    parser.add_argument('--logo-dpi', type=int, help="Sets PDF_LOGO_DPI for the optimized renders")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.logo_dpi:
+        os.environ['PDF_LOGO_DPI'] = str(args.logo_dpi)
+    results = run([int(n) for n in args.items.split(',')], args.repeat)
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    problems = []
+    for name, modes in results.items():
+        if not all(result['fonts_subset'] for result in modes.values()):
+            problems.append(f"{name}: an embedded font is not subset")
+        if modes['optimized']['bytes'] > modes['default']['bytes']:
+            problems.append(f"{name}: optimized output is larger than the default")
+    if problems:
+        raise SystemExit('\n'.join(problems))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Item paragraph cache benchmark.
+Renders a run of catalogue-heavy quotations, their lines drawn (most
+popular first) from a synthetic catalogue of --catalog products plus a
+--custom share of one-off lines, once per paragraph cache size in --sizes
+(0 turns the cache off, see quotationParagraphCache.py). Reports ms per
+quotation, the cache hit rate and the entries held for each. Exits with
+status 1 if any size renders a byte different from the uncached PDFs.
+
+Usage: python3 benchParagraphCache.py [--quotations 200] [--items 40] [--catalog 400]
+           [--custom 0.1] [--sizes 0,256,2048]
+"""
+
+import io
+import time
+import random
+import argparse
+
+from reportlab import rl_config
+
+from quotationFixtures import CATALOG, make_quotation, long_text
+from generateQuotationPDF import render_quotation_pdf
+from quotationParagraphCache import PARAGRAPHS
+from quotationPricing import compute_totals
+
+
+def make_catalog(size, rng):
+    """size products: the dump's catalogue, then numbered variants of it with longer descriptions."""
+    products = [dict(product) for product in CATALOG]
+    while len(products) < size:
+        base = CATALOG[len(products) % len(CATALOG)]
+        products.append(dict(base, product_id=str(len(products) + 100),
+                             name=f"{base['name']} {len(products)}",
+                             description=long_text(rng, rng.randint(4, 30))))
+    return products[:size]
+
+
+def make_quotations(count, n_items, catalog, custom, seed=0):
+    rng = random.Random(seed)
+    # Popular products turn up far more often than the long tail.
+    weights = [1 / rank for rank in range(1, len(catalog) + 1)]
+    quotations = []
+    for index in range(count):
+        payload = make_quotation(index, n_items)
+        items = []
+        for item in payload['items']:
+            if rng.random() < custom:
+                item = dict(item, name=f"Custom work {index}-{len(items)}",
+                            description=long_text(rng, rng.randint(4, 30)))
+            else:
+                item = dict(item, **rng.choices(catalog, weights)[0])
+            items.append(item)
+        totals = compute_totals(items, payload['discount'], payload['tax_rate'])
+        payload.update(items=items, subtotal=str(totals.subtotal),
+                       tax_amount=str(totals.tax_amount), total=str(totals.total))
+        quotations.append(payload)
+    return quotations
+
+
+def run(quotations, size):
+    PARAGRAPHS.clear()
+    PARAGRAPHS.max_entries = size
+    hits, misses = PARAGRAPHS.hits, PARAGRAPHS.misses
+    outputs = []
+    started = time.perf_counter()
+    for payload in quotations:
+        output = io.BytesIO()
+        render_quotation_pdf(payload, output)
+        outputs.append(output.getvalue())
+    elapsed = time.perf_counter() - started
+    hits, misses = PARAGRAPHS.hits - hits, PARAGRAPHS.misses - misses
+    return {
+        'ms': elapsed / len(quotations) * 1000,
+        'hit_rate': hits / (hits + misses) if hits + misses else 0,
+        'entries': len(PARAGRAPHS._entries),
+        'outputs': outputs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render time and hit rate by item paragraph cache size")
+    parser.add_argument('--quotations', type=int, default=200, help="Quotations rendered per size")
+    parser.add_argument('--items', type=int, default=40, help="Line items per quotation")
+    parser.add_argument('--catalog', type=int, default=400, help="Products in the synthetic catalogue")
+    parser.add_argument('--custom', type=float, default=0.1, help="Share of one-off lines (default: 0.1)")
+    parser.add_argument('--sizes', default='0,256,2048',
+                        help="Comma-separated cache sizes in entries (default: 0,256,2048)")
+    args = parser.parse_args()
+
+    # Fixed dates and ids, so cached and uncached PDFs can be compared byte for byte.
+    rl_config.invariant = 1
+    catalog = make_catalog(args.catalog, random.Random(1))
+    quotations = make_quotations(args.quotations, args.items, catalog, args.custom)
+    render_quotation_pdf(quotations[0], io.BytesIO())  # warm the asset registry
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    if 0 not in sizes:
+        sizes.insert(0, 0)
+    results = {size: run(quotations, size) for size in sizes}
+
+    baseline = results[0]
+    print(f"{args.quotations} quotations x {args.items} items, {args.catalog} products, "
+          f"{args.custom:.0%} one-off lines")
+    print(f"{'size':>6}{'ms/quote':>10}{'hit rate':>10}{'entries':>9}{'speedup':>9}")
+    problems = []
+    for size, result in results.items():
+        print(f"{size:>6}{result['ms']:>10.2f}{result['hit_rate']:>10.1%}{result['entries']:>9}"
+              f"{baseline['ms'] / result['ms']:>8.2f}x")
+        if result['outputs'] != baseline['outputs']:
+            problems.append(f"cache size {size}: PDFs differ from the uncached render")
+    if problems:
+        raise SystemExit('\n'.join(problems))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Parallel render scaling benchmark.
+Renders the same set of synthetic quotations with batchRenderQuotations at
+1, 2, 4 and N worker processes and reports throughput for each.
+
+Usage: python3 benchParallelRender.py [--quotations 200] [--items 10] [--workers 1,2,4,8]
+"""
+
+import os
+import json
+import argparse
+import tempfile
+
+from quotationFixtures import make_quotation
+from batchRenderQuotations import render_batch
+
+
+def run(quotations, n_items, worker_counts):
+    records = [(f"fixture:{i}", make_quotation(i, n_items), None) for i in range(quotations)]
+    results = []
+    baseline = None
+    for workers in worker_counts:
+        with tempfile.TemporaryDirectory() as output_dir:
+            summary = render_batch(iter(records), output_dir, workers=workers)
+        seconds = summary['elapsed_ms'] / 1000
+        throughput = summary['succeeded'] / seconds if seconds else 0.0
+        baseline = baseline or throughput
+        results.append({
+            'workers': workers,
+            'quotations': summary['total'],
+            'failed': summary['failed'],
+            'seconds': round(seconds, 3),
+            'pdfs_per_second': round(throughput, 2),
+            'speedup': round(throughput / baseline, 2) if baseline else None,
+        })
+        print(f"{workers:>3} workers: {throughput:8.2f} PDFs/s  "
+              f"({seconds:.2f}s, speedup x{results[-1]['speedup']})")
+    return results
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Quotation render throughput vs worker count")
+    parser.add_argument('--quotations', type=int, default=200)
+    parser.add_argument('--items', type=int, default=10, help="Line items per quotation")
+    parser.add_argument('--workers', default=','.join(str(n) for n in sorted({1, 2, 4, cpus})),
+                        help="Comma-separated worker counts (default: 1,2,4,<cpu count>)")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    worker_counts = [int(n) for n in args.workers.split(',')]
+    results = run(args.quotations, args.items, worker_counts)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'cpus': cpus, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
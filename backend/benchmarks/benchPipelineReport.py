@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Sales pipeline report benchmark.
+Writes a synthetic pg_dump with --quotations quotations spread over
+--clients clients, --months months and every status (a few without a client
+or a creation date), then times generatePipelineReport.py's steps: reading
+the dump into columns, building the cube and the report figures, and
+rendering the PDF. Next to them it times the same aggregation done one
+quotation at a time in plain Python over the rows already read. Exits with status 1 if the cube's
+counts or values differ from that loop's, or if the report's totals don't
+add up.
+
+Usage: python3 benchPipelineReport.py [--quotations 100000] [--clients 500]
+           [--months 36] [--repeat 5]
+"""
+
+import io
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from decimal import Decimal
+from collections import defaultdict
+
+from quotationFixtures import CATALOG
+from pgDumpReader import iter_copy_rows
+from quotationPricing import money, to_decimal
+from generatePipelineReport import (
+    STATUSES, PipelineCube, load_dump, month_label, month_ordinal, pipeline_report, render_pipeline_report
+)
+
+FIRST_MONTH = month_ordinal('2023-01')
+
+
+def write_dump(path, n_quotations, n_clients, n_months, seed=1):
+    """A pg_dump with just the clients and quotations columns the report reads."""
+    rng = random.Random(seed)
+    prices = [float(product['price']) for product in CATALOG]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("COPY public.clients (id, name) FROM stdin;\n")
+        for client_id in range(1, n_clients + 1):
+            f.write(f"{client_id}\tClient {client_id:04d} (Pty) Ltd\n")
+        f.write("\\.\n\n")
+        f.write("COPY public.quotations (id, quote_number, client_id, status, total, created_at) FROM stdin;\n")
+        for quotation_id in range(1, n_quotations + 1):
+            client_id = str(rng.randint(1, n_clients)) if rng.random() > 0.001 else '\\N'
+            status = rng.choices(STATUSES, weights=(30, 25, 20, 15, 10))[0]
+            total = sum(rng.choice(prices) * rng.randint(1, 5) for _ in range(rng.randint(1, 4))) * 1.15
+            month = month_label(FIRST_MONTH + rng.randrange(n_months))
+            created_at = f"{month}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:15:00.000000"
+            if rng.random() < 0.0005:
+                created_at = '\\N'
+            f.write(f"{quotation_id}\tQ-{quotation_id:06d}\t{client_id}\t{status}\t{total:.2f}\t{created_at}\n")
+        f.write("\\.\n")
+
+
+def per_row_aggregate(rows):
+    """{(client_id, month, status): [count, Decimal value]}, one quotation row at a time."""
+    cells = defaultdict(lambda: [0, 0])
+    for row in rows:
+        month = month_ordinal((row['created_at'] or '')[:7])
+        if row['status'] not in STATUSES or month < 0:
+            continue
+        client_id = int(row['client_id']) if row['client_id'] is not None else None
+        cell = cells[(client_id, month, row['status'])]
+        cell[0] += 1
+        cell[1] += money(to_decimal(row['total']))
+    return cells
+
+
+def cube_cells(cube, client_ids):
+    cells = {}
+    for client, month, status in zip(*cube.counts.nonzero()):
+        value = Decimal(int(cube.values[client, month, status])).scaleb(-2)
+        cells[(client_ids[client], cube.first_month + int(month), STATUSES[status])] = [
+            int(cube.counts[client, month, status]), value]
+    return cells
+
+
+def check_report(report, cube):
+    problems = []
+    month = month_ordinal(report['month']) - cube.first_month
+    expected = int(cube.counts[:, month].sum())
+    if report['total']['count'] != expected:
+        problems.append(f"report total counts {report['total']['count']} quotations, the cube {expected}")
+    if sum(status['count'] for status in report['statuses']) != expected:
+        problems.append("status counts don't add up to the month's total")
+    clients = report['clients'] + ([report['other_clients']] if report['other_clients'] else [])
+    if sum(row['value'] for row in clients) != report['total']['value']:
+        problems.append("client values don't add up to the month's total")
+    if report['trend'][-1]['value'] != report['total']['value']:
+        problems.append("the trend's last month differs from the month's total")
+    return problems
+
+
+def median_ms(func, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized pipeline report aggregation vs rendering")
+    parser.add_argument('--quotations', type=int, default=100000, help="Quotations in the synthetic dump")
+    parser.add_argument('--clients', type=int, default=500, help="Clients in the synthetic dump")
+    parser.add_argument('--months', type=int, default=36, help="Months the quotations are spread over")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per step (median reported)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        sql_path = os.path.join(work_dir, 'pipeline.sql')
+        write_dump(sql_path, args.quotations, args.clients, args.months)
+
+        load_ms, columns = median_ms(lambda: load_dump(sql_path), args.repeat)
+        cube_ms, cube = median_ms(lambda: PipelineCube(columns), args.repeat)
+        report_ms, report = median_ms(lambda: pipeline_report(cube), args.repeat)
+        render_ms, _ = median_ms(lambda: render_pipeline_report(report, io.BytesIO()), args.repeat)
+        rows = [row for _, row in iter_copy_rows(sql_path, 'quotations')]
+        loop_ms, cells = median_ms(lambda: per_row_aggregate(rows), 1)
+
+    problems = []
+    vectorized = cube_cells(cube, columns.client_ids)
+    if vectorized != cells:
+        differing = [key for key in set(vectorized) | set(cells) if vectorized.get(key) != cells.get(key)]
+        problems.append(f"cube differs from the per-row aggregation in {len(differing)} cell(s)")
+    problems.extend(check_report(report, cube))
+
+    aggregate_ms = cube_ms + report_ms
+    _, pages = render_pipeline_report(report, io.BytesIO())
+    print(f"{len(columns)} quotations ({columns.skipped} skipped), {cube.counts.shape[0]} clients, "
+          f"{cube.counts.shape[1]} months, report for {report['month']} ({pages} pages)")
+    print(f"{'step (median ms)':<28}{'ms':>10}")
+    print(f"{'load dump into columns':<28}{load_ms:>10.2f}")
+    print(f"{'build cube':<28}{cube_ms:>10.2f}")
+    print(f"{'report figures':<28}{report_ms:>10.2f}")
+    print(f"{'render PDF':<28}{render_ms:>10.2f}")
+    print(f"{'per-row aggregation':<28}{loop_ms:>10.2f}")
+    print(f"\naggregation is {aggregate_ms / render_ms * 100:.1f}% of the render time, "
+          f"{loop_ms / aggregate_ms:.0f}x faster than the per-row loop")
+    if problems:
+        raise SystemExit('\n'.join(problems))
+
+
+if __name__ == '__main__':
+    main()
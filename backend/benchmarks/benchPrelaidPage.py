@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Pre-laid acceptance page check and benchmark.
+Builds quotations twice: once with the customer acceptance page replayed
+from its pre-laid content stream (quotationPrelaidPage), and once with
+replay switched off, as on a ReportLab release outside REPLAY_VERSIONS, so
+the page is laid out from its flowables. The acceptance (last) page of the
+two must draw the same operators with the same operands, apart from the
+q ... Q the replay wraps around its stream, and every other page must be
+identical. Cases cover a few and many line items, custom and non-ASCII
+terms and the page without its signature block. Also times a render both
+ways. Exits with status 1 if any page differs, or if the default case
+isn't replayed on a ReportLab release that supports it.
+
+Usage: python3 benchPrelaidPage.py [--repeat 20]
+"""
+
+import io
+import time
+import argparse
+import statistics
+
+from reportlab.pdfgen.canvas import Canvas
+
+from quotationFixtures import make_quotation
+import quotationPrelaidPage
+from quotationPrelaidPage import PrelaidPage, parse_content
+from generateQuotationPDF import build_quotation_story, render_quotation_pdf
+
+CASES = [
+    ('5 items', {}, 5),
+    ('120 items', {}, 120),
+    ('custom terms', {'default_terms': 'Prices exclude delivery.\nPayment within 30 days.'}, 5),
+    ('non-ASCII terms', {'default_terms': '“Quoted” prices hold for 30 days – excl. VAT.'}, 5),
+    ('no signature block', {'show_signature': False}, 5),
+]
+
+
+class RecordingCanvas(Canvas):
+    """Canvas that keeps every page's content stream as text."""
+
+    def __init__(self, *args, **kwargs):
+        Canvas.__init__(self, *args, **kwargs)
+        self.page_streams = []
+        RecordingCanvas.last = self
+
+    def showPage(self):
+        self.page_streams.append('\n'.join(self._code))
+        Canvas.showPage(self)
+
+
+def build_pages(data, replay):
+    """(page content streams, whether the acceptance page was replayed) for data."""
+    supported = quotationPrelaidPage.REPLAY_SUPPORTED
+    quotationPrelaidPage.REPLAY_SUPPORTED = supported and replay
+    try:
+        doc, elements, on_page = build_quotation_story(data, io.BytesIO())
+        prelaid = next((f for f in elements if isinstance(f, PrelaidPage)), None)
+        doc.build(elements, onFirstPage=on_page, onLaterPages=on_page, canvasmaker=RecordingCanvas)
+    finally:
+        quotationPrelaidPage.REPLAY_SUPPORTED = supported
+    current = prelaid._current if prelaid is not None else None
+    return RecordingCanvas.last.page_streams, bool(current and current.portable)
+
+
+def operators(stream):
+    return [(operator, [text for _, text, _ in operands]) for operator, operands in parse_content(stream)]
+
+
+def page_problems(label, replayed, fresh):
+    problems = []
+    if len(replayed) != len(fresh):
+        return [f"{label}: {len(replayed)} pages replayed, {len(fresh)} laid out"]
+    if replayed[:-1] != fresh[:-1]:
+        problems.append(f"{label}: pages before the acceptance page differ")
+    ops, expected = operators(replayed[-1]), operators(fresh[-1])
+    start = next((i for i, (a, b) in enumerate(zip(ops, expected)) if a != b), len(expected))
+    # The replayed stream is drawn inside its own q ... Q.
+    if ops[start:start + 1] == [('q', [])] and ops[-1:] == [('Q', [])]:
+        ops = ops[:start] + ops[start + 1:-1]
+    if ops != expected:
+        first = next((i for i, (a, b) in enumerate(zip(ops, expected)) if a != b), min(len(ops), len(expected)))
+        problems.append(f"{label}: the acceptance page draws differently when replayed, from operator "
+                        f"{first} ({ops[first] if first < len(ops) else 'end'} vs "
+                        f"{expected[first] if first < len(expected) else 'end'})")
+    return problems
+
+
+def median_ms(data, replay, repeat):
+    supported = quotationPrelaidPage.REPLAY_SUPPORTED
+    quotationPrelaidPage.REPLAY_SUPPORTED = supported and replay
+    try:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render_quotation_pdf(data, io.BytesIO())
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        quotationPrelaidPage.REPLAY_SUPPORTED = supported
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-laid acceptance page vs laying it out per document")
+    parser.add_argument('--repeat', type=int, default=20, help="Timed renders per way (median reported)")
+    args = parser.parse_args()
+
+    problems = []
+    print(f"{'case':<22}{'pages':>6}{'replayed':>10}")
+    for index, (label, overrides, n_items) in enumerate(CASES):
+        data = dict(make_quotation(index, n_items), **overrides)
+        replayed, was_replayed = build_pages(data, replay=True)
+        fresh, _ = build_pages(data, replay=False)
+        problems.extend(page_problems(label, replayed, fresh))
+        if index == 0 and quotationPrelaidPage.REPLAY_SUPPORTED and not was_replayed:
+            problems.append(f"{label}: the acceptance page wasn't replayed")
+        print(f"{label:<22}{len(replayed):>6}{'yes' if was_replayed else 'no':>10}")
+
+    if not quotationPrelaidPage.REPLAY_SUPPORTED:
+        print("\nreplay is off on this ReportLab release; every acceptance page was laid out normally")
+    else:
+        data = make_quotation(0, 5)
+        median_ms(data, True, 1)
+        replay_ms, layout_ms = median_ms(data, True, args.repeat), median_ms(data, False, args.repeat)
+        print(f"\n5-item render: {replay_ms:.2f} ms replayed, {layout_ms:.2f} ms laid out "
+              f"({layout_ms - replay_ms:.2f} ms saved)")
+    if problems:
+        raise SystemExit('\n'.join(problems))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Quotation totals audit benchmark.
+Audits synthetic quotations rows, a small share of them with a tampered
+stored total, one quotation at a time (audit_rows) and in column batches
+(audit_batch, with numpy and with the plain-list fallback), and checks
+that every mode reports the same mismatches. Rows are audited twice: with
+items as JSONB text, the way they sit in complete_database_with_data.sql
+(decoding it costs every mode the same), and with items already decoded,
+which isolates the pricing itself.
+
+Usage: python3 benchPricingAudit.py [--quotations 20000] [--items 10] [--mismatch-rate 0.01]
+"""
+
+import json
+import time
+import random
+import argparse
+from decimal import Decimal
+
+from quotationFixtures import make_quotation
+import quotationPricing
+from quotationPricing import audit_rows, audit_batch, STORED_FIELDS
+
+
+def make_rows(n_quotations, n_items, mismatch_rate, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_quotations):
+        payload = make_quotation(i, rng.randint(1, 2 * n_items - 1))
+        row = {name: payload[name] for name in ('id', 'quote_number', 'discount', 'tax_rate') + STORED_FIELDS}
+        row['items'] = json.dumps(payload['items'])
+        if rng.random() < mismatch_rate:
+            field = rng.choice(STORED_FIELDS)
+            row[field] = str(Decimal(row[field]) + Decimal('0.01'))
+        rows.append(row)
+    return rows
+
+
+def time_audit(label, audit, rows):
+    started = time.perf_counter()
+    mismatches = audit(rows)
+    elapsed = time.perf_counter() - started
+    print(f"{label:>16}: {elapsed * 1000:9.1f} ms  ({len(rows) / elapsed:,.0f} quotations/s, "
+          f"{len(mismatches)} mismatches)")
+    return {'mode': label, 'ms': round(elapsed * 1000, 2), 'mismatches': len(mismatches)}, mismatches
+
+
+def audit_batch_without_numpy(rows):
+    numpy_module, quotationPricing.np = quotationPricing.np, None
+    try:
+        return audit_batch(rows)
+    finally:
+        quotationPricing.np = numpy_module
+
+
+def run(n_quotations, n_items, mismatch_rate):
+    text_rows = make_rows(n_quotations, n_items, mismatch_rate)
+    decoded_rows = [dict(row, items=json.loads(row['items'])) for row in text_rows]
+    print(f"{n_quotations} quotations, {sum(len(row['items']) for row in decoded_rows)} items")
+
+    modes = [('per-row', audit_rows), ('batch (lists)', audit_batch_without_numpy)]
+    if quotationPricing.np is not None:
+        modes.append(('batch (numpy)', audit_batch))
+
+    results = {'quotations': n_quotations}
+    for shape, rows in (('items as text', text_rows), ('items decoded', decoded_rows)):
+        print(f"\n{shape}:")
+        shape_results, reference = [], None
+        for label, audit in modes:
+            result, mismatches = time_audit(label, audit, rows)
+            if reference is None:
+                reference = mismatches
+            elif mismatches != reference:
+                raise SystemExit(f"{label} reported different mismatches than per-row")
+            shape_results.append(result)
+        for result in shape_results[1:]:
+            print(f"{result['mode']}: {shape_results[0]['ms'] / result['ms']:.1f}x faster than per-row")
+        results[shape] = shape_results
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row vs batched quotation totals audit")
+    parser.add_argument('--quotations', type=int, default=20000)
+    parser.add_argument('--items', type=int, default=10, help="Mean line items per quotation")
+    parser.add_argument('--mismatch-rate', type=float, default=0.01,
+                        help="Share of quotations given a wrong stored total (default: 0.01)")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.quotations, args.items, args.mismatch_rate)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
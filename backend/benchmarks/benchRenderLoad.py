@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+PDF endpoint load test.
+Drives the quotation renderer the way the PDF route does, with N clients
+downloading at once, and reports for each concurrency level throughput,
+p50/p95/p99 latency, peak aggregate RSS of the renderer processes and
+failures, so capacity can be planned from numbers. Modes (--modes):
+
+  exec          a python3 generateQuotationPDF.py process per request, the
+                payload written to a temp JSON file and the PDF read back
+                from one, as routes/quotations.js originally did
+  exec-stdio    a process per request, payload on stdin and PDF on stdout
+  server        --servers long-lived quotationRenderServer.py processes fed
+                JSON-line jobs, recycled every --max-jobs jobs with their
+                unanswered jobs sent to the replacement, as
+                services/quotationRenderer.js does (one server)
+  server-cache  server with a fresh --cache-dir per level
+
+Requests are drawn from --mix, weighted payload classes:
+
+  sql     the quotations in complete_database_with_data.sql
+  small   5 catalogue lines      medium  50 lines      large  500 lines
+
+with --distinct payloads per synthetic class, so repeats occur as they do
+for real downloads. With --revalidate, that share of server requests
+carries the last ETag seen for its payload as If-None-Match (exec modes
+have no conditional path and ignore it).
+
+Each client sends its next request as soon as the last one is answered.
+RSS is sampled from /proc every --sample-ms, so it is reported on Linux
+only. Temp file names are unique per request (the original route's
+quote_<id>_data.json would collide when one quotation is downloaded twice
+at once).
+
+Usage: python3 benchRenderLoad.py [--modes exec,exec-stdio,server,server-cache]
+           [--concurrency 1,5,20,50] [--requests 100] [--mix small=70,medium=25,large=5]
+           [--servers 1] [--max-jobs 200] [--revalidate 0.0] [--json PATH]
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+
+from quotationFixtures import SCRIPTS_DIR, make_quotation, load_sql_quotations
+
+GENERATE_SCRIPT = os.path.join(SCRIPTS_DIR, 'generateQuotationPDF.py')
+SERVER_SCRIPT = os.path.join(SCRIPTS_DIR, 'quotationRenderServer.py')
+MODES = ('exec', 'exec-stdio', 'server', 'server-cache')
+CLASS_ITEMS = {'small': 5, 'medium': 50, 'large': 500}
+
+
+def build_payloads(mix, distinct):
+    """{class: [(payload key, payload JSON)]} for every class in mix."""
+    payloads = {}
+    for name in mix:
+        if name == 'sql':
+            quotations = load_sql_quotations()
+        elif name in CLASS_ITEMS:
+            quotations = [make_quotation(index, CLASS_ITEMS[name]) for index in range(distinct)]
+        else:
+            raise SystemExit(f"Unknown payload class {name!r} (sql, {', '.join(CLASS_ITEMS)})")
+        payloads[name] = [(f"{name}/{index}", json.dumps(quotation))
+                          for index, quotation in enumerate(quotations)]
+    return payloads
+
+
+def plan_requests(payloads, mix, count, revalidate, seed=0):
+    """count (class, payload key, payload JSON, revalidate) requests, drawn by weight."""
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    requests = []
+    for _ in range(count):
+        name = rng.choices(names, weights)[0]
+        key, body = rng.choice(payloads[name])
+        requests.append((name, key, body, rng.random() < revalidate))
+    return requests
+
+
+def last_line(stderr):
+    lines = stderr.decode('utf-8', 'replace').strip().splitlines()
+    return lines[-1] if lines else 'renderer failed'
+
+
+def rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class RssSampler:
+    """Background thread summing the RSS of the tracked processes; keeps the peak."""
+
+    def __init__(self, interval_s):
+        self.interval_s = interval_s
+        self.available = os.path.isdir('/proc/self')
+        self.pids = set()
+        self.lock = threading.Lock()
+        self.peak_kb = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def track(self, pid):
+        with self.lock:
+            self.pids.add(pid)
+
+    def untrack(self, pid):
+        with self.lock:
+            self.pids.discard(pid)
+
+    def reset(self):
+        self.peak_kb = 0
+
+    def _run(self):
+        while not self.stopped.wait(self.interval_s):
+            if not self.available:
+                continue
+            with self.lock:
+                pids = list(self.pids)
+            self.peak_kb = max(self.peak_kb, sum(rss_kb(pid) for pid in pids))
+
+    def peak_mb(self):
+        return round(self.peak_kb / 1024, 1) if self.available else None
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+class ExecTarget:
+    """A generateQuotationPDF.py process per request, through temp files or stdin/stdout."""
+
+    def __init__(self, sampler, stdio=False):
+        self.sampler = sampler
+        self.stdio = stdio
+        self.work_dir = tempfile.mkdtemp(prefix='pdf-load-')
+
+    def request(self, key, body, etag=None):
+        if self.stdio:
+            proc = subprocess.Popen([sys.executable, GENERATE_SCRIPT, '-', '-'], stdin=subprocess.PIPE,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self.sampler.track(proc.pid)
+            try:
+                pdf, stderr = proc.communicate(body.encode('utf-8'))
+            finally:
+                self.sampler.untrack(proc.pid)
+            if proc.returncode:
+                return {'ok': False, 'error': last_line(stderr)}
+            return {'ok': True, 'bytes': len(pdf)}
+
+        name = uuid.uuid4().hex
+        data_path = os.path.join(self.work_dir, f"quote_{name}_data.json")
+        pdf_path = os.path.join(self.work_dir, f"quote_{name}.pdf")
+        with open(data_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(json.loads(body), indent=2))
+        proc = subprocess.Popen([sys.executable, GENERATE_SCRIPT, data_path, pdf_path],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.sampler.track(proc.pid)
+        try:
+            _, stderr = proc.communicate()
+        finally:
+            self.sampler.untrack(proc.pid)
+        try:
+            if proc.returncode:
+                return {'ok': False, 'error': last_line(stderr)}
+            with open(pdf_path, 'rb') as f:
+                return {'ok': True, 'bytes': len(f.read())}
+        finally:
+            for path in (data_path, pdf_path):
+                if os.path.exists(path):
+                    os.unlink(path)
+
+    def close(self):
+        os.rmdir(self.work_dir)
+
+
+class ServerProcess:
+    """One quotationRenderServer.py over stdin/stdout, with a thread reading its replies."""
+
+    def __init__(self, target, args):
+        self.target = target
+        env = dict(os.environ)
+        # As services/quotationRenderer.js starts its worker.
+        env.setdefault('PDF_INVARIANT_OUTPUT', '1')
+        self.proc = subprocess.Popen([sys.executable, SERVER_SCRIPT, *args], stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env, text=True)
+        self.recycled = False
+        self.write_lock = threading.Lock()
+        target.sampler.track(self.proc.pid)
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def send(self, job):
+        try:
+            with self.write_lock:
+                self.proc.stdin.write(json.dumps(job) + '\n')
+                self.proc.stdin.flush()
+        except (OSError, ValueError):
+            pass  # the server has gone; recycling or fail() deals with the job
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+
+    def _read(self):
+        for line in self.proc.stdout:
+            reply = json.loads(line)
+            if reply.get('event') == 'recycle':
+                self.recycled = True
+                self.target.replace(self)
+            elif 'id' in reply:
+                self.target.answer(reply)
+        self.proc.wait()
+        self.target.sampler.untrack(self.proc.pid)
+        if not self.recycled:
+            self.target.fail(self, f"render server exited with status {self.proc.returncode}")
+
+
+class ServerTarget:
+    """
+    Round-robin over long-lived render servers. A server that recycles is
+    replaced at once and its unanswered jobs are sent to the replacement.
+    """
+
+    def __init__(self, sampler, servers=1, max_jobs=200, cache_dir=None):
+        self.sampler = sampler
+        self.args = ['--max-jobs', str(max_jobs)]
+        if cache_dir:
+            self.args += ['--cache-dir', cache_dir]
+        self.lock = threading.Lock()
+        self.pending = {}                # job id -> (job, server, event, reply holder)
+        self.next_id = 0
+        self.etags = {}
+        self.servers = [ServerProcess(self, self.args) for _ in range(servers)]
+
+    def request(self, key, body, etag=None):
+        done = threading.Event()
+        holder = {}
+        with self.lock:
+            self.next_id += 1
+            job = {'id': str(self.next_id), 'data': json.loads(body)}
+            if etag and key in self.etags:
+                job['if_none_match'] = f'"{self.etags[key]}"'
+            server = self.servers[self.next_id % len(self.servers)]
+            self.pending[job['id']] = [job, server, done, holder]
+        server.send(job)
+        done.wait()
+        reply = holder['reply']
+        if not reply.get('ok'):
+            return {'ok': False, 'error': reply.get('error')}
+        with self.lock:
+            self.etags[key] = reply.get('input_sha256')
+        if reply.get('not_modified'):
+            return {'ok': True, 'bytes': 0, 'not_modified': True}
+        return {'ok': True, 'bytes': len(reply['pdf']) * 3 // 4}
+
+    def answer(self, reply):
+        with self.lock:
+            entry = self.pending.pop(str(reply['id']), None)
+        if entry:
+            entry[3]['reply'] = reply
+            entry[2].set()
+
+    def replace(self, server):
+        with self.lock:
+            index = self.servers.index(server)
+            replacement = self.servers[index] = ServerProcess(self, self.args)
+            orphans = [entry for entry in self.pending.values() if entry[1] is server]
+            for entry in orphans:
+                entry[1] = replacement
+        for entry in orphans:
+            replacement.send(entry[0])
+        server.close()
+
+    def fail(self, server, error):
+        with self.lock:
+            failed = [key for key, entry in self.pending.items() if entry[1] is server]
+            entries = [self.pending.pop(key) for key in failed]
+        for entry in entries:
+            entry[3]['reply'] = {'ok': False, 'error': error}
+            entry[2].set()
+
+    def close(self):
+        with self.lock:
+            servers = list(self.servers)
+            self.servers = []
+        for server in servers:
+            server.recycled = True
+            server.close()
+            server.proc.wait()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+    rank = max(1, min(len(values), round(fraction * len(values) + 0.5)))
+    return values[rank - 1]
+
+
+def run_level(target, requests, concurrency):
+    """Runs requests with concurrency clients; returns the level's results."""
+    latencies, failures, errors = [], [], {}
+    not_modified = 0
+    lock = threading.Lock()
+    cursor = iter(requests)
+
+    def client():
+        nonlocal not_modified
+        while True:
+            with lock:
+                request = next(cursor, None)
+            if request is None:
+                return
+            name, key, body, revalidate = request
+            started = time.perf_counter()
+            try:
+                result = target.request(key, body, revalidate)
+            except Exception as e:
+                result = {'ok': False, 'error': str(e)}
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with lock:
+                if result['ok']:
+                    latencies.append(elapsed_ms)
+                    not_modified += bool(result.get('not_modified'))
+                else:
+                    failures.append(name)
+                    error = str(result.get('error'))
+                    errors[error] = errors.get(error, 0) + 1
+
+    target.sampler.reset()
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': len(requests),
+        'seconds': round(seconds, 2),
+        'throughput_rps': round(len(latencies) / seconds, 2) if seconds else None,
+        'p50_ms': round(percentile(latencies, 0.50) or 0, 1),
+        'p95_ms': round(percentile(latencies, 0.95) or 0, 1),
+        'p99_ms': round(percentile(latencies, 0.99) or 0, 1),
+        'peak_rss_mb': target.sampler.peak_mb(),
+        'failed': len(failures),
+        'not_modified': not_modified,
+        'errors': errors,
+    }
+
+
+def make_target(mode, sampler, args, cache_dir):
+    if mode == 'exec':
+        return ExecTarget(sampler)
+    if mode == 'exec-stdio':
+        return ExecTarget(sampler, stdio=True)
+    return ServerTarget(sampler, args.servers, args.max_jobs,
+                        cache_dir if mode == 'server-cache' else None)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test of the quotation PDF render path")
+    parser.add_argument('--modes', default=','.join(MODES), help=f"Comma-separated modes (default: all of {', '.join(MODES)})")
+    parser.add_argument('--concurrency', default='1,5,20,50', help="Comma-separated client counts (default: 1,5,20,50)")
+    parser.add_argument('--requests', type=int, default=100, help="Requests per mode and level (default: 100)")
+    parser.add_argument('--mix', default='small=70,medium=25,large=5',
+                        help="Weighted payload classes: sql, small, medium, large (default: small=70,medium=25,large=5)")
+    parser.add_argument('--distinct', type=int, default=20, help="Distinct payloads per synthetic class (default: 20)")
+    parser.add_argument('--servers', type=int, default=1, help="Render servers in the server modes (default: 1)")
+    parser.add_argument('--max-jobs', type=int, default=200, help="Jobs before a server recycles (default: 200)")
+    parser.add_argument('--revalidate', type=float, default=0.0,
+                        help="Share of server requests sent with If-None-Match (default: 0)")
+    parser.add_argument('--sample-ms', type=float, default=20, help="RSS sampling interval (default: 20)")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    modes = args.modes.split(',')
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f"unknown mode {mode!r}")
+    mix = parse_mix(args.mix)
+    payloads = build_payloads(mix, args.distinct)
+    requests = plan_requests(payloads, mix, args.requests, args.revalidate)
+    levels = [int(n) for n in args.concurrency.split(',')]
+
+    sampler = RssSampler(args.sample_ms / 1000)
+    results = {}
+    print(f"{args.requests} requests per level, mix {args.mix}, {os.cpu_count()} CPUs")
+    print(f"{'mode':<14}{'clients':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'peak RSS MB':>13}{'failed':>8}{'304':>6}")
+    try:
+        for mode in modes:
+            results[mode] = []
+            for concurrency in levels:
+                with tempfile.TemporaryDirectory() as cache_dir:
+                    target = make_target(mode, sampler, args, cache_dir)
+                    try:
+                        result = run_level(target, requests, concurrency)
+                    finally:
+                        target.close()
+                results[mode].append(result)
+                rss = '-' if result['peak_rss_mb'] is None else f"{result['peak_rss_mb']:.1f}"
+                print(f"{mode:<14}{concurrency:>8}{result['throughput_rps']:>9.2f}{result['p50_ms']:>9.1f}"
+                      f"{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}{rss:>13}{result['failed']:>8}"
+                      f"{result['not_modified']:>6}")
+                for error, count in result['errors'].items():
+                    print(f"{'':<22}{count} x {error}")
+    finally:
+        sampler.close()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'cpus': os.cpu_count(), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Render memory benchmark.
+Renders one synthetic quotation at 1k, 10k and 50k line items, each in a
+fresh process, and reports how far the render pushed peak RSS above the
+process's size with the payload already loaded. Line items are laid out
+page by page (see quotationItemsTable.py), so the growth is small, but it
+is still linear in the item count: a little under 1 KB per item, against
+about 8 KB when every row was measured up front. Exits with status 1 when
+the largest size grows past --ceiling-mb, or when the growth per item
+between the smallest and largest sizes exceeds --max-kb-per-item.
+
+Usage: python3 benchRenderMemory.py [--sizes 1000,10000,50000] [--ceiling-mb 56]
+           [--max-kb-per-item 1.2]
+"""
+
+import io
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from quotationFixtures import make_quotation
+from generateQuotationPDF import render_quotation_pdf, ASSETS
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(n_items):
+    """Renders n_items in this process; returns the measurements."""
+    data = make_quotation(0, n_items)
+    ASSETS.fonts()
+    ASSETS.logo()
+    ASSETS.stylesheet()
+    before = peak_rss_mb()
+    started = time.perf_counter()
+    output = io.BytesIO()
+    render_quotation_pdf(data, output)
+    seconds = time.perf_counter() - started
+    peak = peak_rss_mb()
+    return {
+        'items': n_items,
+        'loaded_mb': round(before, 1),
+        'peak_mb': round(peak, 1),
+        'growth_mb': round(peak - before, 1),
+        'pdf_mb': round(len(output.getvalue()) / 1e6, 2),
+        'seconds': round(seconds, 2),
+    }
+
+
+def measure_in_subprocess(n_items):
+    out = subprocess.run([sys.executable, __file__, '--child', str(n_items)],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+def run(sizes):
+    results = []
+    for n_items in sizes:
+        result = measure_in_subprocess(n_items)
+        print(f"{n_items:>7} items: peak RSS +{result['growth_mb']:6.1f} MB over {result['loaded_mb']:.0f} MB "
+              f"loaded  (PDF {result['pdf_mb']:.2f} MB, {result['seconds']:.1f}s)")
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak render memory vs number of quotation line items")
+    parser.add_argument('--sizes', default='1000,10000,50000',
+                        help="Comma-separated item counts (default: 1000,10000,50000)")
+    parser.add_argument('--ceiling-mb', type=float, default=56,
+                        help="Largest allowed RSS growth for the largest size (default: 56)")
+    parser.add_argument('--max-kb-per-item', type=float, default=1.2,
+                        help="Largest allowed RSS growth per item between the smallest and "
+                             "largest sizes (default: 1.2)")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if resource is None:
+        raise SystemExit("benchRenderMemory needs the resource module (Linux or macOS)")
+    if args.child is not None:
+        print(json.dumps(measure(args.child)))
+        return
+
+    sizes = [int(n) for n in args.sizes.split(',')]
+    results = run(sizes)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'ceiling_mb': args.ceiling_mb, 'max_kb_per_item': args.max_kb_per_item,
+                       'results': results}, f, indent=2)
+
+    problems = []
+    smallest = min(results, key=lambda result: result['items'])
+    largest = max(results, key=lambda result: result['items'])
+    if largest['growth_mb'] > args.ceiling_mb:
+        problems.append(f"{largest['items']} items grew peak RSS by {largest['growth_mb']} MB, "
+                        f"over the {args.ceiling_mb} MB ceiling")
+    else:
+        print(f"{largest['items']} items stayed under the {args.ceiling_mb:g} MB ceiling")
+    if largest['items'] > smallest['items']:
+        kb_per_item = ((largest['growth_mb'] - smallest['growth_mb']) * 1024
+                       / (largest['items'] - smallest['items']))
+        if kb_per_item > args.max_kb_per_item:
+            problems.append(f"peak RSS grew {kb_per_item:.2f} KB per item from {smallest['items']} to "
+                            f"{largest['items']} items, over the {args.max_kb_per_item:g} KB limit")
+        else:
+            print(f"{kb_per_item:.2f} KB per item from {smallest['items']} to {largest['items']} items, "
+                  f"under the {args.max_kb_per_item:g} KB limit")
+    if problems:
+        raise SystemExit('\n'.join(problems))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Reproducible output benchmark.
+Renders the quotations in complete_database_with_data.sql, synthetic
+quotations at 10 and 1k line items and one without created_at in invariant
+mode (PDF_INVARIANT_OUTPUT=1), each in two fresh processes, and checks the
+two PDFs are byte-identical, the digest render_quotation_pdf returns is the
+SHA-256 of the bytes written and both processes agree on the input digest
+(quotationPdfCache.cache_key). Also reports the render time next to the
+time to answer a matching If-None-Match from the input digest alone.
+Exits with status 1 on any mismatch.
+
+Usage: python3 benchReproducibleOutput.py [--items 10,1000] [--optimize]
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import subprocess
+
+from quotationFixtures import make_quotation, load_sql_quotations
+
+
+def scenarios(item_counts):
+    for payload in load_sql_quotations():
+        yield f"sql/{payload['quote_number']}", payload
+    for n_items in item_counts:
+        yield f"synthetic/{n_items}", make_quotation(0, n_items)
+    undated = make_quotation(1, 10)
+    del undated['created_at']
+    yield "synthetic/no-created_at", undated
+
+
+def render(payload, output_path):
+    """Renders payload to output_path in this process; returns the measurements."""
+    from generateQuotationPDF import render_quotation_pdf
+    from quotationPdfCache import cache_key, etag_matches
+
+    render_quotation_pdf(payload, os.devnull)  # warm the asset registry
+    started = time.perf_counter()
+    digest = render_quotation_pdf(payload, output_path)
+    render_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    key = cache_key(payload)
+    if not etag_matches(f'"{key}"', key):
+        raise SystemExit("etag_matches rejected the render's own ETag")
+    etag_ms = (time.perf_counter() - started) * 1000
+    return {'sha256': digest, 'input_sha256': key,
+            'render_ms': round(render_ms, 2), 'etag_ms': round(etag_ms, 3)}
+
+
+def render_in_subprocess(index, items, output_path, optimize):
+    env = dict(os.environ, PDF_INVARIANT_OUTPUT='1')
+    # A fixed SOURCE_DATE_EPOCH would hide a date taken from the clock.
+    env.pop('SOURCE_DATE_EPOCH', None)
+    if optimize:
+        env['PDF_OPTIMIZE_OUTPUT'] = '1'
+    out = subprocess.run([sys.executable, __file__, '--items', items, '--child', str(index), output_path],
+                         check=True, capture_output=True, text=True, env=env).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+def check(name, index, items, work_dir, optimize):
+    """Renders scenario index twice; returns (result, problems)."""
+    runs, pdfs = [], []
+    for attempt in range(2):
+        path = os.path.join(work_dir, f"{index}-{attempt}.pdf")
+        runs.append(render_in_subprocess(index, items, path, optimize))
+        with open(path, 'rb') as f:
+            pdfs.append(f.read())
+
+    problems = []
+    if pdfs[0] != pdfs[1]:
+        problems.append(f"{name}: two renders differ")
+    for run, pdf in zip(runs, pdfs):
+        if run['sha256'] != hashlib.sha256(pdf).hexdigest():
+            problems.append(f"{name}: reported sha256 is not the digest of the bytes written")
+    if runs[0]['input_sha256'] != runs[1]['input_sha256']:
+        problems.append(f"{name}: input digests differ")
+    result = {
+        'bytes': len(pdfs[0]),
+        'identical': pdfs[0] == pdfs[1],
+        'sha256': runs[0]['sha256'],
+        'render_ms': min(run['render_ms'] for run in runs),
+        'etag_ms': min(run['etag_ms'] for run in runs),
+    }
+    return result, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Invariant renders in separate processes are byte-identical")
+    parser.add_argument('--items', default='10,1000',
+                        help="Comma-separated item counts for the synthetic quotations (default: 10,1000)")
+    parser.add_argument('--optimize', action='store_true', help="Render in the output-optimized mode as well")
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('output', nargs='?', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    item_counts = [int(n) for n in args.items.split(',')]
+    if args.child is not None:
+        payload = list(scenarios(item_counts))[args.child][1]
+        print(json.dumps(render(payload, args.output)))
+        return
+
+    problems = []
+    print(f"{'scenario':<28}{'bytes':>9}  {'sha256':<14}{'identical':>10}{'render ms':>11}{'etag ms':>9}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for index, (name, _) in enumerate(scenarios(item_counts)):
+            result, found = check(name, index, args.items, work_dir, args.optimize)
+            problems.extend(found)
+            print(f"{name:<28}{result['bytes']:>9}  {result['sha256'][:12]:<14}"
+                  f"{'yes' if result['identical'] else 'NO':>10}{result['render_ms']:>11.2f}{result['etag_ms']:>9.3f}")
+    if problems:
+        raise SystemExit('\n'.join(problems))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env node
+// Single-flight render benchmark.
+// Drives services/quotationRenderer.js (and through it a real
+// quotationRenderServer.py worker) with --concurrency simultaneous requests
+// for the same quotation and checks they cost exactly one render, all get the
+// same PDF, distinct quotations still render separately, a request after the
+// flight has settled renders again and a failing render rejects every waiter.
+// Reports the wall time of the coalesced burst next to the same number of
+// renders one after another. Exits with status 1 on any failed check.
+//
+// Usage: node benchSingleFlight.js [--concurrency 20] [--items 40]
+
+const { execFileSync } = require('child_process');
+
+process.env.PDF_RENDER_METRICS = '1';
+// Only the render_metrics lines are of interest here; keep the log quiet.
+console.log = () => {};
+const { renderQuotation, layoutQuotation, getRenderStats } = require('../services/quotationRenderer');
+
+const argValue = (name, fallback) => {
+  const index = process.argv.indexOf(name);
+  return index === -1 ? fallback : Number(process.argv[index + 1]);
+};
+const concurrency = argValue('--concurrency', 20);
+const nItems = argValue('--items', 40);
+
+const pythonCmd = process.platform === 'win32' ? 'python' : 'python3';
+const makeQuotations = (count) => JSON.parse(execFileSync(pythonCmd, ['-c', `
+import json
+from quotationFixtures import make_quotation
+print(json.dumps([make_quotation(i, ${nItems}) for i in range(${count})]))
+`], { cwd: __dirname }));
+
+const problems = [];
+const check = (ok, message) => {
+  if (!ok) problems.push(message);
+};
+const report = (...args) => process.stdout.write(args.join(' ') + '\n');
+// render_metrics arrive on stderr, possibly after the reply on stdout.
+const settle = () => new Promise((resolve) => setTimeout(resolve, 300));
+
+const burst = async (label, requests) => {
+  const before = getRenderStats();
+  const started = process.hrtime.bigint();
+  const results = await Promise.allSettled(requests());
+  const ms = Number(process.hrtime.bigint() - started) / 1e6;
+  await settle();
+  const after = getRenderStats();
+  const counts = {
+    jobs: after.jobs - before.jobs,
+    renders: after.renders - before.renders,
+    coalesced: after.coalesced - before.coalesced,
+  };
+  report(`${label.padEnd(34)}${String(counts.jobs).padStart(6)}${String(counts.renders).padStart(9)}`
+    + `${String(counts.coalesced).padStart(11)}${ms.toFixed(1).padStart(10)}`);
+  return { results, counts, ms };
+};
+
+const main = async () => {
+  const [quotation, ...others] = makeQuotations(4);
+  await renderQuotation(others[2]); // start the worker and warm its assets
+  await settle();
+
+  report(`${'case'.padEnd(34)}${'jobs'.padStart(6)}${'renders'.padStart(9)}${'coalesced'.padStart(11)}${'ms'.padStart(10)}`);
+
+  const same = await burst(`${concurrency} x same quotation`,
+    () => Array.from({ length: concurrency }, () => renderQuotation(quotation)));
+  check(same.counts.jobs === 1, `same quotation: ${same.counts.jobs} jobs, expected 1`);
+  check(same.counts.renders === 1, `same quotation: ${same.counts.renders} renders, expected 1`);
+  check(same.counts.coalesced === concurrency - 1,
+    `same quotation: ${same.counts.coalesced} coalesced, expected ${concurrency - 1}`);
+  const pdfs = same.results.map((result) => result.status === 'fulfilled' && result.value.pdf);
+  check(pdfs.every((pdf) => pdf && pdf.equals(pdfs[0])), 'same quotation: waiters got different PDFs');
+
+  const distinct = await burst(`${concurrency} x 2 quotations`,
+    () => Array.from({ length: concurrency }, (_, i) => renderQuotation(others[i % 2])));
+  check(distinct.counts.jobs === 2, `2 quotations: ${distinct.counts.jobs} jobs, expected 2`);
+
+  const again = await burst('same quotation after it settled', () => [renderQuotation(quotation)]);
+  check(again.counts.jobs === 1 && again.counts.coalesced === 0, 'a settled render was reused');
+
+  const layout = await burst(`${concurrency} x layout`,
+    () => Array.from({ length: concurrency }, () => layoutQuotation(quotation)));
+  check(layout.counts.jobs === 1, `layout: ${layout.counts.jobs} jobs, expected 1`);
+  check(layout.results.every((result) => result.status === 'fulfilled' && result.value.page_count),
+    'layout: a waiter got no page count');
+
+  const broken = { ...quotation, items: '[not json' };
+  const failing = await burst(`${concurrency} x failing quotation`,
+    () => Array.from({ length: concurrency }, () => renderQuotation(broken)));
+  check(failing.counts.jobs === 1, `failing quotation: ${failing.counts.jobs} jobs, expected 1`);
+  check(failing.results.every((result) => result.status === 'rejected'),
+    'failing quotation: a waiter did not get the error');
+
+  let sequentialMs = 0;
+  const before = getRenderStats();
+  for (let i = 0; i < concurrency; i += 1) {
+    const started = process.hrtime.bigint();
+    await renderQuotation(quotation);
+    sequentialMs += Number(process.hrtime.bigint() - started) / 1e6;
+  }
+  check(getRenderStats().jobs - before.jobs === concurrency, 'sequential requests were coalesced');
+  check(getRenderStats().inFlight === 0, `${getRenderStats().inFlight} flights left over`);
+  report(`\n${concurrency} simultaneous requests: ${same.ms.toFixed(1)} ms with one shared render, `
+    + `${sequentialMs.toFixed(1)} ms for ${concurrency} renders one after another`);
+};
+
+main()
+  .catch((err) => problems.push(`unexpected error: ${err.message}`))
+  .finally(() => {
+    if (problems.length) process.stderr.write(problems.join('\n') + '\n');
+    process.exit(problems.length ? 1 : 0);
+  });
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+PDF generator benchmark suite.
+
+Renders realistic quotations (the rows in complete_database_with_data.sql)
+and a synthetic matrix of item counts, description lengths and template
+toggles through generateQuotationPDF.py and the older generatePDF.py, and
+records wall time and peak traced memory for each phase:
+
+  import   fresh interpreter importing the generator module
+  assets   compiling the template (fonts, logo, styles) from a cold registry
+  build    payload -> flowables (build_quotation_story)
+  layout   doc.build into memory
+  write    PDF bytes to disk
+
+Results are written as JSON keyed by scenario and phase, so two runs (e.g.
+before and after a ReportLab upgrade) can be diffed with --compare.
+
+Usage: python3 benchSuite.py [--quick] [--repeat 5] [--json out.json]
+       python3 benchSuite.py --compare baseline.json [--json out.json] [--threshold 10] [--min-ms 1]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import importlib
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from quotationFixtures import SCRIPTS_DIR, make_quotation, load_sql_quotations
+
+FORMAT = 'quotation-pdf-bench/1'
+GENERATORS = {
+    'quotation': 'generateQuotationPDF',
+    'legacy': 'generatePDF',
+}
+PHASES = ('assets', 'build', 'layout', 'write')
+ITEM_COUNTS = (1, 10, 100, 1000)
+QUICK_ITEM_COUNTS = (1, 10, 100)
+DESCRIPTIONS = {'short': None, 'long': 60}
+
+
+def scenarios(quick=False):
+    """Yields (name, generator, payload) for every benchmark case."""
+    for generator in GENERATORS:
+        for payload in load_sql_quotations():
+            yield f"{generator}/sql/{payload['quote_number']}", generator, payload
+
+    for n_items in (QUICK_ITEM_COUNTS if quick else ITEM_COUNTS):
+        for desc, words in DESCRIPTIONS.items():
+            for template in ('full', 'minimal'):
+                payload = make_quotation(0, n_items, description_words=words, template=template)
+                yield f"quotation/items={n_items}/desc={desc}/template={template}", 'quotation', payload
+            # generatePDF.py has no template toggles.
+            payload = make_quotation(0, n_items, description_words=words)
+            yield f"legacy/items={n_items}/desc={desc}", 'legacy', payload
+
+
+class PhaseRecorder:
+    """Collects wall time and, when tracing, peak memory growth per phase."""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.ms = {}
+        self.peak_kb = {}
+
+    @contextmanager
+    def phase(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            start_bytes = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        yield
+        self.ms[name] = (time.perf_counter() - started) * 1000
+        if self.trace_memory:
+            self.peak_kb[name] = (tracemalloc.get_traced_memory()[1] - start_bytes) / 1024
+
+
+def render_phases(generator, data, output_path, recorder):
+    """Renders data once, recording each phase. Returns (pages, pdf_bytes)."""
+    module = importlib.import_module(GENERATORS[generator])
+    buffer = io.BytesIO()
+
+    if generator == 'quotation':
+        with recorder.phase('assets'):
+            module.ASSETS.clear()
+            template = module.prepare_render_assets(data)
+        with recorder.phase('build'):
+            doc, elements, on_page = module.build_quotation_story(data, buffer, template)
+        with recorder.phase('layout'):
+            doc.build(elements, onFirstPage=on_page, onLaterPages=on_page)
+    else:
+        # generatePDF.py sets up its styles inline, so that cost lands in build.
+        with recorder.phase('assets'):
+            pass
+        with recorder.phase('build'):
+            doc, elements = module.build_quotation_story(data, buffer)
+        with recorder.phase('layout'):
+            doc.build(elements)
+
+    with recorder.phase('write'):
+        with open(output_path, 'wb') as f:
+            f.write(buffer.getvalue())
+    return getattr(doc, 'page', None), len(buffer.getvalue())
+
+
+def summarize(samples):
+    return {'median_ms': round(statistics.median(samples), 3), 'min_ms': round(min(samples), 3)}
+
+
+def bench_scenario(generator, data, repeat, output_path):
+    # The first render pays one-off costs (module import, reportlab caches) outside any phase.
+    render_phases(generator, data, output_path, PhaseRecorder())
+
+    timings = {phase: [] for phase in PHASES}
+    totals = []
+    for _ in range(repeat):
+        recorder = PhaseRecorder()
+        pages, pdf_bytes = render_phases(generator, data, output_path, recorder)
+        for phase in PHASES:
+            timings[phase].append(recorder.ms[phase])
+        totals.append(sum(recorder.ms.values()))
+
+    # Memory is traced in a separate pass because tracemalloc slows everything down.
+    recorder = PhaseRecorder(trace_memory=True)
+    tracemalloc.start()
+    try:
+        render_phases(generator, data, output_path, recorder)
+    finally:
+        tracemalloc.stop()
+
+    phases = {}
+    for phase in PHASES:
+        phases[phase] = summarize(timings[phase])
+        phases[phase]['peak_kb'] = round(recorder.peak_kb[phase], 1)
+    return {
+        'generator': generator,
+        'items': len(data['items']) if isinstance(data.get('items'), list) else None,
+        'phases': phases,
+        'total': summarize(totals),
+        'pages': pages,
+        'pdf_bytes': pdf_bytes,
+    }
+
+
+IMPORT_PROBE = """
+import sys, time, tracemalloc
+sys.path.insert(0, sys.argv[1])
+if sys.argv[3] == 'memory':
+    tracemalloc.start()
+started = time.perf_counter()
+__import__(sys.argv[2])
+elapsed = (time.perf_counter() - started) * 1000
+print(tracemalloc.get_traced_memory()[1] / 1024 if sys.argv[3] == 'memory' else elapsed)
+"""
+
+
+def bench_import(module_name, repeat):
+    def probe(mode):
+        out = subprocess.run([sys.executable, '-c', IMPORT_PROBE, SCRIPTS_DIR, module_name, mode],
+                             check=True, capture_output=True, text=True).stdout
+        return float(out.strip().splitlines()[-1])
+
+    samples = [probe('time') for _ in range(repeat)]
+    phase = summarize(samples)
+    phase['peak_kb'] = round(probe('memory'), 1)
+    return {'generator': None, 'items': None, 'phases': {'import': phase}, 'total': summarize(samples)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPTS_DIR,
+                              check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(repeat, quick=False, match=None):
+    import reportlab
+
+    results = {}
+    for generator, module_name in GENERATORS.items():
+        name = f"{generator}/import"
+        if match and match not in name:
+            continue
+        results[name] = bench_import(module_name, repeat)
+        print(f"{name:<50} {results[name]['total']['median_ms']:9.2f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'bench.pdf')
+        for name, generator, data in scenarios(quick):
+            if match and match not in name:
+                continue
+            result = results[name] = bench_scenario(generator, data, repeat, output_path)
+            phases = '  '.join(f"{phase} {result['phases'][phase]['median_ms']:.1f}" for phase in PHASES)
+            print(f"{name:<50} {result['total']['median_ms']:9.2f} ms  ({phases})")
+
+    return {
+        'format': FORMAT,
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'reportlab': reportlab.Version,
+            'platform': platform.platform(),
+            'repeat': repeat,
+        },
+        'scenarios': results,
+    }
+
+
+def compare(baseline, current, threshold, min_ms=1.0):
+    """
+    Prints per-phase median deltas. Returns the number of regressions over
+    threshold %, ignoring phases that take under min_ms in both runs.
+    """
+    regressions = 0
+    print(f"\n{'scenario / phase':<60} {'base ms':>10} {'now ms':>10} {'delta':>8}")
+    for name, result in current['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if not old:
+            continue
+        for phase, stats in list(result['phases'].items()) + [('total', result['total'])]:
+            old_stats = old['total'] if phase == 'total' else old['phases'].get(phase)
+            if not old_stats or max(old_stats['median_ms'], stats['median_ms']) < min_ms:
+                continue
+            delta = (stats['median_ms'] - old_stats['median_ms']) / old_stats['median_ms'] * 100
+            flag = ''
+            if delta > threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            print(f"{name + ' / ' + phase:<60} {old_stats['median_ms']:>10.2f} "
+                  f"{stats['median_ms']:>10.2f} {delta:>+7.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-phase benchmarks for the quotation PDF generators")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed renders per scenario (default: 5)")
+    parser.add_argument('--quick', action='store_true', help="Skip the 1000-item scenarios")
+    parser.add_argument('--match', help="Only run scenarios whose name contains this string")
+    parser.add_argument('--json', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Baseline JSON from an earlier run to diff against")
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help="Slowdown in %% that counts as a regression with --compare (default: 10)")
+    parser.add_argument('--min-ms', type=float, default=1.0,
+                        help="Ignore phases faster than this in both runs when comparing (default: 1)")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.quick, args.match)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('format') != FORMAT:
+            print(f"Baseline format {baseline.get('format')!r} is not {FORMAT!r}", file=sys.stderr)
+            sys.exit(2)
+        regressions = compare(baseline, results, args.threshold, args.min_ms)
+        print(f"\n{regressions} phase(s) slower than {args.threshold:g}%")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+Synthetic quotation payloads for the PDF benchmarks.
+
+Payloads have the shape of the row the /api/quotations/:id/pdf route sends
+to generateQuotationPDF.py: the quotations columns, the joined client,
+contact and template columns, and a JSONB items list drawn from the
+products catalogue in complete_database_with_data.sql. load_sql_quotations()
+returns the real quotations from that dump, joined the same way the route does.
+"""
+
+import os
+import sys
+import json
+import random
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(BENCH_DIR, '..', 'scripts')
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+from pgDumpReader import SQL_DUMP, read_copy_tables
+
+# products rows from complete_database_with_data.sql
+CATALOG = [
+    {'product_id': '1', 'name': 'Sophos Firewall', 'description': 'Perimeter Firewall', 'price': '123123.00'},
+    {'product_id': '5', 'name': 'Penetration Test', 'description': 'Penetration Test', 'price': '900.00'},
+    {'product_id': '6', 'name': 'Security Consulting', 'description': 'IT Consulting Hours', 'price': '1500.00'},
+    {'product_id': '7', 'name': 'GRC Consulting',
+     'description': 'Governance, Risk, and Compliance professional services', 'price': '1200.00'},
+    {'product_id': '9', 'name': 'Kaspersky Antivirus', 'description': 'Endpoint Protection', 'price': '850.00'},
+]
+
+TEMPLATE = {
+    'template_id': 1,
+    'template_name': 'ScaryByte Default',
+    'template_updated_at': '2025-11-22T23:47:36.627Z',
+    'company_name': 'ScaryByte (Pty) Ltd',
+    'company_tagline': 'MILITARY GRADE CYBER SOLUTIONS',
+    'company_address': '165 West Street, Sandton, Johannesburg',
+    'company_phone': '+27 (0) 10 006 3999',
+    'company_email': 'support@scarybyte.co.za',
+    'company_website': 'WWW.SCARYBYTE.CO.ZA',
+    'company_reg_number': '2021/324782/07',
+    'company_vat_number': '4500299245',
+    'primary_color': '#8B0000',
+    'secondary_color': '#FFFFFF',
+    'accent_color': '#000000',
+    'show_logo': True,
+    'show_tagline': True,
+    'show_client_info': True,
+    'show_description': True,
+    'show_terms': True,
+    'show_signature': True,
+    'default_terms': 'This quotation is not a contract nor a bill. Please email all completed '
+                     'documents to support@scarybyte.co.za. All prices are in South African Rands (ZAR).',
+    'default_notes': None,
+    'vat_rate': '15.00',
+    'logo_url': None,
+}
+
+CLIENT = {
+    'client_id': 2,
+    'client_name': 'Eskom',
+    'client_email': 'eskom@eskom.co.za',
+    'client_phone': '+27123123123',
+    'client_company': 'Eskom',
+    'client_address': '165 west street',
+    'client_city': 'johannesburg',
+    'client_country': 'South Africa',
+    'primary_contact_name': 'Carmen Hull',
+    'primary_contact_email': 'carmen@scarybyte.co.za',
+    'primary_contact_phone': '+27456456456',
+    'primary_contact_position': 'Boss 2',
+    'created_by_name': 'Admin User',
+    'created_by_email': 'admin@crm.com',
+}
+
+
+# Template toggle sets for make_quotation(template=...).
+TEMPLATE_VARIANTS = {
+    'full': {},
+    'minimal': {
+        'show_logo': False, 'show_tagline': False, 'show_description': False,
+        'show_terms': False, 'show_signature': False, 'default_terms': None,
+    },
+}
+
+FILLER_WORDS = (
+    'managed detection response endpoint hardening licence renewal onsite support '
+    'quarterly review firewall policy audit remediation reporting compliance'
+).split()
+
+
+def long_text(rng, words):
+    return ' '.join(rng.choice(FILLER_WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def make_quotation(index=0, n_items=5, seed=None, description_words=None, template='full'):
+    """
+    Returns one route-shaped quotation payload with n_items catalogue lines.
+    description_words replaces each item description (and the quotation
+    description) with that many words of filler; template picks a
+    TEMPLATE_VARIANTS entry.
+    """
+    rng = random.Random(index if seed is None else seed)
+    items = []
+    for _ in range(n_items):
+        product = rng.choice(CATALOG)
+        # The frontend sends quantity both as a number and as a string.
+        quantity = rng.randint(1, 20)
+        item = dict(product, quantity=quantity if rng.random() < 0.5 else str(quantity))
+        if description_words:
+            item['description'] = long_text(rng, description_words)
+        items.append(item)
+
+    subtotal = sum(float(item['price']) * float(item['quantity']) for item in items)
+    tax = round(subtotal * 0.15, 2)
+    payload = {
+        'id': index + 1,
+        'quote_number': f"2025113{index:05d}",
+        'status': 'draft',
+        'valid_until': '2025-12-07T00:00:00.000Z',
+        'subtotal': f"{subtotal:.2f}",
+        'tax_rate': '15.00',
+        'tax_amount': f"{tax:.2f}",
+        'discount': '0.00',
+        'total': f"{subtotal + tax:.2f}",
+        'items': items,
+        'notes': '',
+        'terms': '',
+        'created_by': 1,
+        'created_at': '2025-11-30T02:42:33.558Z',
+        'updated_at': '2025-11-30T02:42:33.558Z',
+        'description': 'Managed security services and supporting hardware as discussed.',
+        'prepared_by': 'Rayhaan',
+    }
+    if description_words:
+        payload['description'] = long_text(rng, description_words * 4)
+    payload.update(CLIENT)
+    payload.update(TEMPLATE)
+    payload.update(TEMPLATE_VARIANTS[template])
+    return payload
+
+
+def _timestamp(value):
+    """pg timestamp text -> the ISO form node-postgres hands the route."""
+    if not value:
+        return value
+    if ' ' not in value:
+        return f"{value}T00:00:00.000Z"
+    date, clock = value.split(' ')
+    return f"{date}T{clock[:12]}Z"
+
+
+def load_sql_quotations(sql_path=SQL_DUMP):
+    """The quotations in the SQL dump, joined like the PDF route's query."""
+    tables = read_copy_tables(sql_path)
+    clients = {row['id']: row for row in tables.get('clients', [])}
+    users = {row['id']: row for row in tables.get('users', [])}
+    templates = {row['id']: row for row in tables.get('quotation_templates', [])}
+    primary_contacts = {row['client_id']: row for row in tables.get('contacts', [])
+                        if row['is_primary'] == 't'}
+
+    payloads = []
+    for row in tables.get('quotations', []):
+        payload = dict(row)
+        payload['items'] = json.loads(row['items'])
+        for name in ('valid_until', 'created_at', 'updated_at'):
+            payload[name] = _timestamp(row[name])
+
+        client = clients.get(row['client_id'], {})
+        contact = primary_contacts.get(row['client_id'])
+        user = users.get(row['created_by'], {})
+        payload.update({
+            'client_name': client.get('name'),
+            'client_email': client.get('email'),
+            'client_phone': client.get('phone'),
+            'client_company': client.get('company'),
+            'client_address': client.get('address'),
+            'client_city': client.get('city'),
+            'client_country': client.get('country'),
+            'primary_contact_name': (f"{contact['first_name']} {contact['last_name']}"
+                                     if contact else client.get('name')),
+            'primary_contact_email': contact['email'] if contact else client.get('email'),
+            'primary_contact_phone': contact['phone'] if contact else client.get('phone'),
+            'primary_contact_position': contact['position'] if contact else None,
+            'created_by_name': user.get('full_name'),
+            'created_by_email': user.get('email'),
+        })
+
+        template = templates.get(row['template_id'], {})
+        for name, value in template.items():
+            if name in ('id', 'is_default', 'vat_number', 'created_by', 'created_at'):
+                continue
+            if name == 'updated_at':
+                payload['template_updated_at'] = _timestamp(value)
+                continue
+            if name.startswith('show_'):
+                value = value == 't'
+            payload['template_name' if name == 'name' else name] = value
+        payloads.append(payload)
+    return payloads
@@ -2,11 +2,8 @@ const express = require('express');
 const router = express.Router();
 const db = require('../config/database');
 const { authenticateToken, requirePermission } = require('../middleware/auth');
-const { exec } = require('child_process');
-const util = require('util');
-const execPromise = util.promisify(exec);
-const fs = require('fs').promises;
-const path = require('path');
+const { renderQuotation, layoutQuotation } = require('../services/quotationRenderer');
+const pdfJobs = require('../services/quotationJobs');
 
 // Get all quotations
 router.get('/', authenticateToken, requirePermission('view_quotations'), async (req, res) => {
@@ -257,90 +254,82 @@ router.delete('/:id', authenticateToken, requirePermission('delete_quotations'),
   }
 });
 
+// The quotation row with its client, primary contact, author and template
+// columns, as the PDF renderer expects it; undefined if there is none.
+const fetchPdfQuotation = async (id) => {
+  const result = await db.query(
+    `SELECT q.*, 
+            c.name as client_name, 
+            c.email as client_email, 
+            c.phone as client_phone,
+            c.company as client_company, 
+            c.address as client_address, 
+            c.city as client_city, 
+            c.country as client_country,
+            COALESCE(CONCAT(pc.first_name, ' ', pc.last_name), c.name) as primary_contact_name,
+            COALESCE(pc.email, c.email) as primary_contact_email,
+            COALESCE(pc.phone, c.phone) as primary_contact_phone,
+            pc.position as primary_contact_position,
+            u.full_name as created_by_name, 
+            u.email as created_by_email,
+            t.name as template_name,
+            t.company_name,
+            t.company_tagline,
+            t.company_address,
+            t.company_phone,
+            t.company_email,
+            t.company_website,
+            t.company_reg_number,
+            t.company_vat_number,
+            t.primary_color,
+            t.secondary_color,
+            t.accent_color,
+            t.show_logo,
+            t.show_tagline,
+            t.show_client_info,
+            t.show_description,
+            t.show_terms,
+            t.show_signature,
+            t.default_terms,
+            t.default_notes,
+            t.vat_rate,
+            t.logo_url,
+            t.updated_at as template_updated_at
+     FROM quotations q 
+     LEFT JOIN clients c ON q.client_id = c.id
+     LEFT JOIN contacts pc ON c.id = pc.client_id AND pc.is_primary = true
+     LEFT JOIN users u ON q.created_by = u.id
+     LEFT JOIN quotation_templates t ON q.template_id = t.id
+     WHERE q.id = $1`,
+    [id]
+  );
+  return result.rows[0];
+};
+
 // Generate PDF
 router.get('/:id/pdf', authenticateToken, requirePermission('generate_pdf'), async (req, res) => {
   try {
     const { id } = req.params;
     
     // Get quotation with all details including primary contact
-    const result = await db.query(
-      `SELECT q.*, 
-              c.name as client_name, 
-              c.email as client_email, 
-              c.phone as client_phone,
-              c.company as client_company, 
-              c.address as client_address, 
-              c.city as client_city, 
-              c.country as client_country,
-              COALESCE(CONCAT(pc.first_name, ' ', pc.last_name), c.name) as primary_contact_name,
-              COALESCE(pc.email, c.email) as primary_contact_email,
-              COALESCE(pc.phone, c.phone) as primary_contact_phone,
-              pc.position as primary_contact_position,
-              u.full_name as created_by_name, 
-              u.email as created_by_email,
-              t.name as template_name,
-              t.company_name,
-              t.company_tagline,
-              t.company_address,
-              t.company_phone,
-              t.company_email,
-              t.company_website,
-              t.company_reg_number,
-              t.company_vat_number,
-              t.primary_color,
-              t.secondary_color,
-              t.accent_color,
-              t.show_logo,
-              t.show_tagline,
-              t.show_client_info,
-              t.show_description,
-              t.show_terms,
-              t.show_signature,
-              t.default_terms,
-              t.default_notes,
-              t.vat_rate,
-              t.logo_url
-       FROM quotations q 
-       LEFT JOIN clients c ON q.client_id = c.id
-       LEFT JOIN contacts pc ON c.id = pc.client_id AND pc.is_primary = true
-       LEFT JOIN users u ON q.created_by = u.id
-       LEFT JOIN quotation_templates t ON q.template_id = t.id
-       WHERE q.id = $1`,
-      [id]
-    );
+    const quotation = await fetchPdfQuotation(id);
 
-    if (result.rows.length === 0) {
+    if (!quotation) {
       return res.status(404).json({ error: 'Quotation not found' });
     }
-
-    const quotation = result.rows[0];
     
-    const pdfDir = path.join(__dirname, '../temp');
-    const dataPath = path.join(pdfDir, `quote_${id}_data.json`);
-    const pdfPath = path.join(pdfDir, `quote_${id}.pdf`);
-
-    // Create temp directory if it doesn't exist
-    await fs.mkdir(pdfDir, { recursive: true });
-
-    // Write quotation data to temp file
-    await fs.writeFile(dataPath, JSON.stringify(quotation, null, 2));
-
-    // Call Python script to generate PDF
-    const scriptPath = path.join(__dirname, '../scripts/generateQuotationPDF.py');
-    // Use 'python' on Windows, 'python3' on Unix
-    const pythonCmd = process.platform === 'win32' ? 'python' : 'python3';
-    const { stdout, stderr } = await execPromise(`${pythonCmd} "${scriptPath}" "${dataPath}" "${pdfPath}"`);
-
-    if (stderr) {
-      console.error('PDF generation warning:', stderr);
+    // Render through the long-lived Python PDF worker (payload in, PDF bytes out).
+    // With reproducible renders (PDF_INVARIANT_OUTPUT, the default) an unchanged
+    // quotation keeps its strong ETag and a matching If-None-Match gets a 304
+    // without rendering; otherwise every render differs, so no ETag is sent.
+    const rendered = await renderQuotation(quotation, { ifNoneMatch: req.get('If-None-Match') });
+    if (rendered.invariant) {
+      res.setHeader('ETag', `"${rendered.inputSha256}"`);
     }
-
-    // Read the generated PDF
-    const pdfBuffer = await fs.readFile(pdfPath);
-
-    // Clean up temp files
-    await fs.unlink(dataPath);
-    await fs.unlink(pdfPath);
+    if (rendered.notModified) {
+      return res.status(304).end();
+    }
+    const pdfBuffer = rendered.pdf;
 
     // Generate filename in the specified format
     const rawCompany = quotation.client_company || quotation.client_name || 'NA';
@@ -365,4 +354,98 @@ router.get('/:id/pdf', authenticateToken, requirePermission('generate_pdf'), asy
   }
 });
 
+// Pagination of the quotation's PDF without rendering it: page count, which
+// line items land on each page and overflow warnings (see scripts/quotationLayout.py).
+router.get('/:id/layout', authenticateToken, requirePermission('generate_pdf'), async (req, res) => {
+  try {
+    const quotation = await fetchPdfQuotation(req.params.id);
+
+    if (!quotation) {
+      return res.status(404).json({ error: 'Quotation not found' });
+    }
+
+    res.json(await layoutQuotation(quotation));
+  } catch (error) {
+    console.error('PDF layout error:', error);
+    res.status(500).json({ error: 'Failed to lay out PDF' });
+  }
+});
+
+// Queue a background PDF render (needs PDF_JOB_QUEUE_DB and running job workers)
+router.post('/:id/pdf-jobs', authenticateToken, requirePermission('generate_pdf'), async (req, res) => {
+  try {
+    if (!pdfJobs.isEnabled()) {
+      return res.status(503).json({ error: 'PDF job queue is not configured' });
+    }
+
+    const quotation = await fetchPdfQuotation(req.params.id);
+
+    if (!quotation) {
+      return res.status(404).json({ error: 'Quotation not found' });
+    }
+
+    const jobId = await pdfJobs.submitPdfJob(quotation);
+    const statusUrl = `${req.baseUrl}/pdf-jobs/${jobId}`;
+    res.location(statusUrl).status(202).json({ id: jobId, status_url: statusUrl });
+  } catch (error) {
+    console.error('PDF job submit error:', error);
+    res.status(500).json({ error: 'Failed to queue PDF' });
+  }
+});
+
+const findPdfJob = async (req, res) => {
+  if (!pdfJobs.isEnabled()) {
+    res.status(503).json({ error: 'PDF job queue is not configured' });
+    return null;
+  }
+  const job = await pdfJobs.getPdfJob(req.params.job);
+  if (!job) {
+    res.status(404).json({ error: 'PDF job not found' });
+  }
+  return job;
+};
+
+// Poll a PDF job; once it is done, pdf_url downloads the PDF
+router.get('/pdf-jobs/:job', authenticateToken, requirePermission('generate_pdf'), async (req, res) => {
+  try {
+    const job = await findPdfJob(req, res);
+    if (!job) return;
+
+    // Server paths and worker names stay internal.
+    const status = { ...job };
+    delete status.output_path;
+    delete status.worker;
+    if (job.status === 'done') {
+      status.pdf_url = `${req.baseUrl}/pdf-jobs/${job.id}/pdf`;
+    }
+    res.json(status);
+  } catch (error) {
+    console.error('PDF job status error:', error);
+    res.status(500).json({ error: 'Failed to fetch PDF job' });
+  }
+});
+
+// Download a done PDF job's PDF
+router.get('/pdf-jobs/:job/pdf', authenticateToken, requirePermission('generate_pdf'), async (req, res) => {
+  try {
+    const job = await findPdfJob(req, res);
+    if (!job) return;
+
+    if (job.status !== 'done') {
+      return res.status(409).json({ error: 'PDF job is not done', status: job.status });
+    }
+    res.contentType('application/pdf');
+    res.setHeader('Content-Disposition', `attachment; filename="${job.id}.pdf"`);
+    res.sendFile(job.output_path, (error) => {
+      if (error && !res.headersSent) {
+        console.error('PDF job download error:', error);
+        res.status(404).json({ error: 'PDF job output not found' });
+      }
+    });
+  } catch (error) {
+    console.error('PDF job download error:', error);
+    res.status(500).json({ error: 'Failed to fetch PDF job' });
+  }
+});
+
 module.exports = router;
\ No newline at end of file
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Quotation Totals Audit
+Checks every quotation's stored subtotal, tax_amount and total against its
+items, priced exactly by quotationPricing.py, and reports the ones that
+disagree.
+
+Quotations are read from the COPY data of a pg_dump file (by default
+complete_database_with_data.sql) or from a JSON-lines file of route
+payloads, and are audited in column batches of --chunk-size rows, so a
+full table scan runs in bounded memory. --per-row prices each quotation
+on its own instead, for comparison.
+
+Exits with status 1 when any quotation disagrees.
+
+Usage: python3 auditQuotationTotals.py [--sql PATH | --jsonl PATH]
+           [--chunk-size N] [--per-row] [--json PATH]
+"""
+
+import sys
+import json
+import time
+import argparse
+from itertools import islice
+
+from pgDumpReader import SQL_DUMP, iter_copy_rows
+from quotationPricing import audit_batch, audit_rows
+
+
+def iter_sql_quotations(sql_path):
+    for _, row in iter_copy_rows(sql_path, 'quotations'):
+        yield row
+
+
+def iter_jsonl_quotations(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield {'id': None, 'quote_number': f"{path}:{line_no}", 'items': f"invalid JSON: {e}"}
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def describe(mismatch):
+    label = mismatch['quote_number'] or f"id {mismatch['id']}"
+    if 'error' in mismatch:
+        return f"{label}: cannot price: {mismatch['error']}"
+    return (f"{label}: {mismatch['field']} stored {mismatch['stored']}, "
+            f"items give {mismatch['computed']} ({mismatch['difference']})")
+
+
+def audit(rows, chunk_size=10000, per_row=False):
+    """Returns (quotations audited, mismatches, elapsed seconds)."""
+    check = audit_rows if per_row else audit_batch
+    audited = 0
+    mismatches = []
+    started = time.perf_counter()
+    for chunk in chunked(rows, chunk_size):
+        audited += len(chunk)
+        mismatches.extend(check(chunk))
+    return audited, mismatches, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report quotations whose stored totals don't match their items")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--sql', default=SQL_DUMP, help="pg_dump file to read quotations from (default: %(default)s)")
+    source.add_argument('--jsonl', help="JSON-lines file of quotation payloads instead of a dump")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Quotations priced per batch (default: 10000)")
+    parser.add_argument('--per-row', action='store_true', help="Price one quotation at a time instead of in batches")
+    parser.add_argument('--json', help="Also write the mismatches to this JSON file")
+    args = parser.parse_args()
+
+    rows = iter_jsonl_quotations(args.jsonl) if args.jsonl else iter_sql_quotations(args.sql)
+    try:
+        audited, mismatches, elapsed = audit(rows, max(1, args.chunk_size), args.per_row)
+    except OSError as e:
+        print(f"Error reading quotations: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    for mismatch in mismatches:
+        print(describe(mismatch))
+    quotations = len({(m['id'], m['quote_number']) for m in mismatches})
+    print(f"Audited {audited} quotation(s) in {elapsed * 1000:.1f} ms: "
+          f"{quotations} with mismatched totals ({len(mismatches)} field(s))")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'audited': audited, 'mismatches': mismatches}, f, indent=2)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
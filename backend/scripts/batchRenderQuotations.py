@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Batch Quotation PDF Renderer
+Renders many quotation payloads in a single process.
+
+Input is either a JSON-lines file (one payload per line, the same shape the
+/api/quotations/:id/pdf route dumps) or a directory of *.json / *.jsonl files.
+Each quotation is written to <output_dir>/quote_<quote_number>.pdf and a
+machine-readable summary with per-item status, timings and PDF SHA-256 is
+written to <output_dir>/summary.json (or --summary). A bad record is
+reported in the summary and the run carries on. With PDF_INVARIANT_OUTPUT=1
+unchanged quotations render to the same bytes, so equal digests across
+runs mark PDFs an archive already holds.
+
+With --workers N the quotations are fanned out over N worker processes
+(each loads the fonts and logo once); results are still reported in input
+order and only a bounded number of payloads is in flight at any time. If a
+worker dies mid-render (e.g. OOM-killed), the quotations it and the other
+workers had in hand are reported as failed and the rest of the batch carries
+on in a fresh pool.
+
+Usage: python3 batchRenderQuotations.py <input.jsonl|input_dir> <output_dir>
+           [--summary PATH] [--workers N] [--max-in-flight N]
+"""
+
+import sys
+import os
+import re
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from generateQuotationPDF import render_quotation_pdf, ASSETS
+
+
+def iter_payloads(input_path):
+    """
+    Yields (source, payload, error) for every record under input_path.
+    source is "file" or "file:line"; exactly one of payload/error is set.
+    """
+    if os.path.isdir(input_path):
+        paths = sorted(
+            os.path.join(input_path, name) for name in os.listdir(input_path)
+            if name.endswith('.json') or name.endswith('.jsonl')
+        )
+    else:
+        paths = [input_path]
+
+    for path in paths:
+        if path.endswith('.json'):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    yield path, json.load(f), None
+            except Exception as e:
+                yield path, None, f"Error loading JSON data: {e}"
+            continue
+
+        try:
+            f = open(path, 'r', encoding='utf-8')
+        except OSError as e:
+            yield path, None, f"Error opening input: {e}"
+            continue
+        with f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                source = f"{path}:{line_no}"
+                try:
+                    yield source, json.loads(line), None
+                except ValueError as e:
+                    yield source, None, f"Error loading JSON data: {e}"
+
+
+def output_name(payload, index):
+    """File name for a payload: quote_<quote_number>.pdf, falling back to id or position."""
+    key = None
+    if isinstance(payload, dict):
+        key = payload.get('quote_number') or payload.get('id')
+    if key is None:
+        key = f"record_{index}"
+    safe = re.sub(r'[^A-Za-z0-9\-_]', '_', str(key))
+    return f"quote_{safe}.pdf"
+
+
+def render_one(payload, output_path):
+    """
+    Renders a payload and returns (ok, error, elapsed_ms, sha256). Never raises.
+    A failed render leaves whatever PDF output_path already held in place.
+    """
+    started = time.perf_counter()
+    sha256 = None
+    try:
+        if not isinstance(payload, dict):
+            raise ValueError("Quotation payload must be a JSON object")
+        sha256 = render_quotation_pdf(payload, output_path)
+        ok, error = True, None
+    except Exception as e:
+        ok, error = False, str(e)
+    return ok, error, round((time.perf_counter() - started) * 1000, 2), sha256
+
+
+def plan_jobs(records, output_dir):
+    """Assigns every record a unique output path, in input order."""
+    used_names = set()
+    for index, (source, payload, error) in enumerate(records):
+        name = output_name(payload, index)
+        if name in used_names:
+            name = f"{name[:-4]}_{index}.pdf"
+        used_names.add(name)
+        yield index, source, payload, error, os.path.join(output_dir, name)
+
+
+def summary_item(index, source, payload, output_path, ok, error, elapsed_ms, sha256=None):
+    return {
+        'index': index,
+        'source': source,
+        'quote_number': payload.get('quote_number') if isinstance(payload, dict) else None,
+        'output': output_path if ok else None,
+        'status': 'ok' if ok else 'error',
+        'error': error,
+        'elapsed_ms': elapsed_ms,
+        'sha256': sha256,
+    }
+
+
+def warm_worker():
+    """Pool initializer: load fonts, logo and styles once per worker process."""
+    ASSETS.fonts()
+    ASSETS.logo()
+    ASSETS.stylesheet()
+
+
+def iter_results_parallel(jobs, workers, max_in_flight):
+    """
+    Renders planned jobs on a pool of worker processes.
+    Yields summary items in input order with at most max_in_flight payloads
+    submitted but not yet collected, so memory stays flat on huge inputs.
+    A pool broken by a worker that died is replaced for the jobs after it.
+    """
+    pool = ProcessPoolExecutor(workers, initializer=warm_worker)
+    in_flight = deque()
+    try:
+        for index, source, payload, error, output_path in jobs:
+            pending = None
+            if error is None:
+                try:
+                    pending = pool.submit(render_one, payload, output_path)
+                except BrokenProcessPool:
+                    pool.shutdown(wait=True)
+                    pool = ProcessPoolExecutor(workers, initializer=warm_worker)
+                    pending = pool.submit(render_one, payload, output_path)
+            in_flight.append((index, source, payload, error, output_path, pending))
+
+            if len(in_flight) >= max_in_flight:
+                yield _collect(in_flight.popleft())
+        while in_flight:
+            yield _collect(in_flight.popleft())
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _collect(entry):
+    index, source, payload, error, output_path, pending = entry
+    if pending is None:
+        return summary_item(index, source, payload, output_path, False, error, 0.0)
+    try:
+        ok, error, elapsed_ms, sha256 = pending.result()
+    except BrokenProcessPool as e:
+        ok, error, elapsed_ms, sha256 = False, f"Worker process died while rendering: {e}", 0.0, None
+    return summary_item(index, source, payload, output_path, ok, error, elapsed_ms, sha256)
+
+
+def iter_results_serial(jobs):
+    for index, source, payload, error, output_path in jobs:
+        if error is None:
+            ok, error, elapsed_ms, sha256 = render_one(payload, output_path)
+        else:
+            ok, elapsed_ms, sha256 = False, 0.0, None
+        yield summary_item(index, source, payload, output_path, ok, error, elapsed_ms, sha256)
+
+
+def render_batch(records, output_dir, workers=1, max_in_flight=None):
+    """
+    Renders (source, payload, error) records into output_dir, using a pool of
+    worker processes when workers > 1. Returns the summary dict.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    started_at = datetime.now().isoformat()
+    started = time.perf_counter()
+
+    jobs = plan_jobs(records, output_dir)
+    if workers > 1:
+        results = iter_results_parallel(jobs, workers, max_in_flight or workers * 4)
+    else:
+        results = iter_results_serial(jobs)
+    items = list(results)
+
+    succeeded = sum(1 for item in items if item['status'] == 'ok')
+    return {
+        'started_at': started_at,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        'workers': workers,
+        'total': len(items),
+        'succeeded': succeeded,
+        'failed': len(items) - succeeded,
+        'items': items,
+    }
+
+
+def write_summary(summary, summary_path):
+    tmp_path = f"{summary_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    os.replace(tmp_path, summary_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render many quotation PDFs in one process")
+    parser.add_argument('input', help="JSON-lines file or directory of .json/.jsonl payloads")
+    parser.add_argument('output_dir', help="Directory the PDFs are written to")
+    parser.add_argument('--summary', help="Summary JSON path (default: <output_dir>/summary.json)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes to render with (default: 1, 0 = one per CPU)")
+    parser.add_argument('--max-in-flight', type=int,
+                        help="Payloads queued to the pool at once (default: 4 per worker)")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    summary = render_batch(iter_payloads(args.input), args.output_dir,
+                           workers=workers, max_in_flight=args.max_in_flight)
+    summary_path = args.summary or os.path.join(args.output_dir, 'summary.json')
+    write_summary(summary, summary_path)
+
+    print(f"Rendered {summary['succeeded']}/{summary['total']} quotations "
+          f"in {summary['elapsed_ms'] / 1000:.1f}s, summary: {summary_path}")
+    if summary['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
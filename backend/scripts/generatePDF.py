@@ -6,7 +6,6 @@ Generates professional PDF quotations from JSON data
 
 import sys
 import json
-from datetime import datetime
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.units import inch
@@ -15,6 +14,9 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
 from reportlab.pdfgen import canvas
 
+from quotationPricing import money
+from quotationModel import parse_quotation
+
 def create_quotation_pdf(data_path, output_path):
     """Generate a professional quotation PDF"""
     
@@ -22,9 +24,20 @@ def create_quotation_pdf(data_path, output_path):
     with open(data_path, 'r') as f:
         data = json.load(f)
     
+    doc, elements = build_quotation_story(data, output_path)
+    
+    # Build PDF
+    doc.build(elements)
+    print(f"PDF generated successfully: {output_path}")
+
+def build_quotation_story(data, output):
+    """Returns (doc, elements) for a quotation (payload or Quotation), ready for doc.build"""
+    
+    quotation = parse_quotation(data)
+    
     # Create PDF
     doc = SimpleDocTemplate(
-        output_path,
+        output,
         pagesize=letter,
         rightMargin=0.75*inch,
         leftMargin=0.75*inch,
@@ -75,8 +88,8 @@ def create_quotation_pdf(data_path, output_path):
             Paragraph("<b>To:</b>", heading_style)
         ],
         [
-            Paragraph(f"{data.get('created_by_name', 'N/A')}<br/>{data.get('created_by_email', '')}", normal_style),
-            Paragraph(f"<b>{data.get('client_name', 'N/A')}</b><br/>{data.get('client_company', '')}<br/>{data.get('client_email', '')}<br/>{data.get('client_phone', '')}<br/>{data.get('client_address', '')}", normal_style)
+            Paragraph(f"{quotation.created_by_name or 'N/A'}<br/>{quotation.created_by_email or ''}", normal_style),
+            Paragraph(f"<b>{quotation.client_name or 'N/A'}</b><br/>{quotation.client_company or ''}<br/>{quotation.client_email or ''}<br/>{quotation.client_phone or ''}<br/>{quotation.client_address or ''}", normal_style)
         ]
     ]
     
@@ -92,12 +105,12 @@ def create_quotation_pdf(data_path, output_path):
     # Quote Details
     quote_details = [
         [
-            Paragraph(f"<b>Quote Number:</b> {data.get('quote_number', 'N/A')}", normal_style),
-            Paragraph(f"<b>Date:</b> {datetime.fromisoformat(data.get('created_at', '')).strftime('%B %d, %Y') if data.get('created_at') else 'N/A'}", normal_style)
+            Paragraph(f"<b>Quote Number:</b> {quotation.quote_number or 'N/A'}", normal_style),
+            Paragraph(f"<b>Date:</b> {quotation.created_at.strftime('%B %d, %Y') if quotation.created_at else 'N/A'}", normal_style)
         ],
         [
-            Paragraph(f"<b>Status:</b> {data.get('status', 'N/A').upper()}", normal_style),
-            Paragraph(f"<b>Valid Until:</b> {datetime.fromisoformat(data.get('valid_until', '')).strftime('%B %d, %Y') if data.get('valid_until') else 'N/A'}", normal_style)
+            Paragraph(f"<b>Status:</b> {(quotation.status or 'N/A').upper()}", normal_style),
+            Paragraph(f"<b>Valid Until:</b> {quotation.valid_until.strftime('%B %d, %Y') if quotation.valid_until else 'N/A'}", normal_style)
         ]
     ]
     
@@ -122,13 +135,13 @@ def create_quotation_pdf(data_path, output_path):
     ]]
     
     # Add items
-    items = json.loads(data.get('items', '[]')) if isinstance(data.get('items'), str) else data.get('items', [])
-    for item in items:
+    totals = quotation.totals
+    for item in quotation.items:
         items_data.append([
-            Paragraph(f"{item.get('name', 'N/A')}<br/><i>{item.get('description', '')}</i>", normal_style),
-            Paragraph(str(item.get('quantity', 0)), normal_style),
-            Paragraph(f"${float(item.get('price', 0)):.2f}", normal_style),
-            Paragraph(f"${float(item.get('quantity', 0)) * float(item.get('price', 0)):.2f}", normal_style)
+            Paragraph(f"{item.name or 'N/A'}<br/><i>{item.description or ''}</i>", normal_style),
+            Paragraph(str(item.quantity), normal_style),
+            Paragraph(f"${money(item.price):.2f}", normal_style),
+            Paragraph(f"${item.total:.2f}", normal_style)
         ])
     
     items_table = Table(items_data, colWidths=[3*inch, 1*inch, 1.25*inch, 1.25*inch])
@@ -147,12 +160,12 @@ def create_quotation_pdf(data_path, output_path):
     elements.append(items_table)
     elements.append(Spacer(1, 0.2*inch))
     
-    # Totals
-    subtotal = float(data.get('subtotal', 0))
-    discount = float(data.get('discount', 0))
-    tax_rate = float(data.get('tax_rate', 0))
-    tax_amount = float(data.get('tax_amount', 0))
-    total = float(data.get('total', 0))
+    # Totals (priced exactly from the items, not read from the stored columns)
+    subtotal = totals.subtotal
+    discount = totals.discount
+    tax_rate = float(totals.tax_rate)
+    tax_amount = totals.tax_amount
+    total = totals.total
     
     totals_data = [
         ['', '', Paragraph('<b>Subtotal:</b>', normal_style), Paragraph(f'${subtotal:.2f}', normal_style)],
@@ -176,20 +189,18 @@ def create_quotation_pdf(data_path, output_path):
     elements.append(totals_table)
     
     # Notes
-    if data.get('notes'):
+    if quotation.notes:
         elements.append(Spacer(1, 0.3*inch))
         elements.append(Paragraph("Notes", heading_style))
-        elements.append(Paragraph(data.get('notes', ''), normal_style))
+        elements.append(Paragraph(quotation.notes, normal_style))
     
     # Terms
-    if data.get('terms'):
+    if quotation.terms:
         elements.append(Spacer(1, 0.3*inch))
         elements.append(Paragraph("Terms & Conditions", heading_style))
-        elements.append(Paragraph(data.get('terms', ''), normal_style))
+        elements.append(Paragraph(quotation.terms, normal_style))
     
-    # Build PDF
-    doc.build(elements)
-    print(f"PDF generated successfully: {output_path}")
+    return doc, elements
 
 if __name__ == "__main__":
     if len(sys.argv) != 3:
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Sales pipeline report.
+
+A monthly PDF of quotation value by status (draft, sent, accepted,
+rejected, expired), by month and by client, in the quotation house style:
+the header strip, logo, contact line and footer of generateQuotationPDF.py
+and tables in the template's primary_color.
+
+Quotations are read once into columns (PipelineColumns): per quotation a
+client index, a status index, a month number and the total in cents, as
+numpy arrays. PipelineCube turns those into quotation counts and values for
+every (client, month, status) with one bincount per measure, and every
+figure in the report (status totals, the monthly trend, the client ranking
+and the win rates) is a sum or a ratio over axes of that cube, never a loop
+over quotations. A quotation counts in the month of its created_at. The win
+rate is the share of decided quotations (accepted, rejected or expired)
+that were accepted.
+
+Quotations and clients are read from the COPY data of a pg_dump file (by
+default complete_database_with_data.sql), from a SQLite stand-in built by
+quotationDbSource.py, or from PostgreSQL (DB_* variables, needs psycopg2).
+
+Usage: python3 generatePipelineReport.py <output_pdf> [--month YYYY-MM]
+           [--sql PATH | --sqlite PATH | --postgres] [--months 12]
+           [--clients 20] [--json PATH]
+"""
+
+import sys
+import json
+import sqlite3
+import calendar
+import argparse
+from decimal import Decimal
+from datetime import date
+from xml.sax.saxutils import escape
+
+try:
+    import numpy as np
+except ImportError:  # only needed here; the quotation renderer works without it
+    np = None
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
+
+from pgDumpReader import SQL_DUMP, iter_copy_rows
+from quotationDbSource import psycopg2, connection_settings
+from quotationPricing import format_money, money, to_decimal
+from quotationTemplates import compile_template
+from generateQuotationPDF import DigestWriter, QuotationHeaderFooter
+
+STATUSES = ('draft', 'sent', 'accepted', 'rejected', 'expired')
+ACCEPTED = STATUSES.index('accepted')
+OPEN = [STATUSES.index('draft'), STATUSES.index('sent')]
+DECIDED = [STATUSES.index(status) for status in ('accepted', 'rejected', 'expired')]
+# One character longer than the longest status, so 'acceptedX' can't truncate to 'accepted'.
+STATUS_CHARS = max(map(len, STATUSES)) + 1
+# Integer sums of cents are exact in a float64 bincount below this.
+FLOAT_EXACT_SUM = 2 ** 53
+
+SQLITE_QUOTATIONS = "SELECT client_id, status, substr(created_at, 1, 7), total FROM quotations"
+POSTGRES_QUOTATIONS = "SELECT client_id, status, to_char(created_at, 'YYYY-MM'), total FROM quotations"
+CLIENTS_QUERY = "SELECT id, name FROM clients"
+
+
+def month_ordinal(label):
+    """'2025-11' -> year * 12 + month - 1, or -1 if label isn't a YYYY-MM month."""
+    year, _, month = label.partition('-')
+    if len(year) != 4 or not (year + month).isdigit() or not 1 <= int(month) <= 12:
+        return -1
+    return int(year) * 12 + int(month) - 1
+
+
+def month_label(ordinal):
+    return f"{ordinal // 12:04d}-{ordinal % 12 + 1:02d}"
+
+
+def month_title(ordinal):
+    return f"{calendar.month_name[ordinal % 12 + 1]} {ordinal // 12}"
+
+
+def cents_column(values):
+    """Money values (text, Decimal, numbers or None for 0) as an int64 array of cents."""
+    try:
+        floats = np.array(values, dtype=np.float64)
+        if np.isfinite(floats).all():
+            # numeric(10,2) totals have at most 10 digits, which float64 holds exactly.
+            return np.rint(floats * 100).astype(np.int64)
+    except (TypeError, ValueError):
+        pass
+    return np.array([int(money(to_decimal(value)).scaleb(2)) for value in values], dtype=np.int64)
+
+
+class PipelineColumns:
+    """
+    Quotations as parallel numpy arrays, one entry per quotation: client
+    (an index into client_ids and client_names), status (an index into
+    STATUSES), month (see month_ordinal) and total (cents). Quotations with
+    a status outside STATUSES or no created_at are left out and counted in
+    skipped.
+    """
+
+    def __init__(self, client_ids, statuses, months, totals, client_names=None):
+        if np is None:
+            raise RuntimeError("The pipeline report needs numpy (pip install numpy)")
+        client_names = client_names or {}
+
+        status = np.full(len(statuses), -1, dtype=np.int64)
+        status_text = np.array(statuses, dtype=f'U{STATUS_CHARS}')
+        for code, name in enumerate(STATUSES):
+            status[status_text == name] = code
+
+        # Only the distinct months and client ids are parsed one by one.
+        labels, month_index = np.unique(np.array(months, dtype='U7'), return_inverse=True)
+        month = np.array([month_ordinal(label) for label in labels], dtype=np.int64)[month_index]
+        ids, client = np.unique(np.array(client_ids, dtype='U20'), return_inverse=True)
+        self.client_ids = [int(i) if i.isdigit() else None for i in ids]
+        self.client_names = [self._client_name(i, client_names) for i in self.client_ids]
+
+        total = cents_column(totals)
+        keep = (status >= 0) & (month >= 0)
+        self.skipped = int(len(keep) - keep.sum())
+        self.client = client[keep]
+        self.status = status[keep]
+        self.month = month[keep]
+        self.total = total[keep]
+
+    @staticmethod
+    def _client_name(client_id, names):
+        if client_id is None:
+            return "No client"
+        return names.get(client_id) or f"Client #{client_id}"
+
+    def __len__(self):
+        return len(self.status)
+
+
+def load_dump(sql_path=SQL_DUMP):
+    """PipelineColumns from the quotations and clients COPY data of a pg_dump file, in one pass."""
+    client_ids, statuses, months, totals = [], [], [], []
+    names = {}
+    for table, row in iter_copy_rows(sql_path):
+        if table == 'quotations':
+            client_ids.append(row['client_id'])
+            statuses.append(row['status'])
+            months.append(row['created_at'])
+            totals.append(row['total'])
+        elif table == 'clients':
+            names[int(row['id'])] = row['name']
+    return PipelineColumns(client_ids, statuses, months, totals, names)
+
+
+def _columns_from_cursors(quotations, clients):
+    rows = quotations.fetchall()
+    columns = [list(column) for column in zip(*rows)] if rows else [[], [], [], []]
+    names = {int(client_id): name for client_id, name in clients.fetchall()}
+    return PipelineColumns(*columns, names)
+
+
+def load_sqlite(db_path):
+    """PipelineColumns from a SQLite stand-in built by quotationDbSource.build_sqlite_standin()."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return _columns_from_cursors(conn.execute(SQLITE_QUOTATIONS), conn.execute(CLIENTS_QUERY))
+    finally:
+        conn.close()
+
+
+def load_postgres(**settings):
+    """PipelineColumns straight from PostgreSQL, connected as config/database.js does."""
+    if psycopg2 is None:
+        raise RuntimeError("Reading quotations from PostgreSQL needs psycopg2 (pip install psycopg2-binary)")
+    conn = psycopg2.connect(**(settings or connection_settings()))
+    try:
+        with conn.cursor() as quotations, conn.cursor() as clients:
+            quotations.execute(POSTGRES_QUOTATIONS)
+            clients.execute(CLIENTS_QUERY)
+            return _columns_from_cursors(quotations, clients)
+    finally:
+        conn.close()
+
+
+def _sum_by_key(key, values, size):
+    """Integer sums of values per key in range(size)."""
+    if int(np.abs(values).sum()) < FLOAT_EXACT_SUM:
+        return np.rint(np.bincount(key, weights=values, minlength=size)).astype(np.int64)
+    sums = np.zeros(size, dtype=np.int64)
+    np.add.at(sums, key, values)
+    return sums
+
+
+def win_rate(counts):
+    """accepted / (accepted + rejected + expired) along the status axis; NaN where none were decided."""
+    accepted = counts[..., ACCEPTED].astype(np.float64)
+    decided = counts[..., DECIDED].sum(axis=-1)
+    return np.divide(accepted, decided, out=np.full(decided.shape, np.nan), where=decided > 0)
+
+
+class PipelineCube:
+    """
+    Quotation counts and values (cents) for every client, month and status,
+    as counts[client, month, status] and values[client, month, status],
+    where month 0 is first_month. One bincount per measure over a combined
+    key builds the whole cube.
+    """
+
+    def __init__(self, columns):
+        self.client_names = columns.client_names
+        self.skipped = columns.skipped
+        if len(columns):
+            self.first_month = int(columns.month.min())
+            n_months = int(columns.month.max()) - self.first_month + 1
+        else:
+            self.first_month, n_months = 0, 0
+        shape = (len(self.client_names), n_months, len(STATUSES))
+        size = shape[0] * shape[1] * shape[2]
+        key = (columns.client * n_months + (columns.month - self.first_month)) * len(STATUSES) + columns.status
+        self.counts = np.bincount(key, minlength=size).reshape(shape)
+        self.values = _sum_by_key(key, columns.total, size).reshape(shape)
+
+    @property
+    def last_month(self):
+        """Ordinal of the latest month with quotations, or None when there are none."""
+        return self.first_month + self.counts.shape[1] - 1 if self.counts.shape[1] else None
+
+    def months(self, start, stop):
+        """(counts, values) per month and status for the months [start, stop), zero outside the data."""
+        n_statuses = len(STATUSES)
+        counts = np.zeros((stop - start, n_statuses), dtype=np.int64)
+        values = np.zeros((stop - start, n_statuses), dtype=np.int64)
+        lo = max(start, self.first_month)
+        hi = min(stop, self.first_month + self.counts.shape[1])
+        if lo < hi:
+            window = slice(lo - self.first_month, hi - self.first_month)
+            counts[lo - start:hi - start] = self.counts[:, window].sum(axis=0)
+            values[lo - start:hi - start] = self.values[:, window].sum(axis=0)
+        return counts, values
+
+    def clients(self, month):
+        """(counts, values) per client and status for one month."""
+        index = month - self.first_month
+        if not 0 <= index < self.counts.shape[1]:
+            shape = (self.counts.shape[0], len(STATUSES))
+            return np.zeros(shape, dtype=np.int64), np.zeros(shape, dtype=np.int64)
+        return self.counts[:, index], self.values[:, index]
+
+
+def _money(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def report_rows(counts, values):
+    """
+    Report rows from status counts and values (cents), one per row of the
+    (rows, statuses) arrays; every figure is computed over the whole arrays
+    and only the results are converted to Python values.
+    """
+    columns = zip(
+        counts.sum(axis=1).tolist(),
+        counts.tolist(),
+        values.sum(axis=1).tolist(),
+        values.tolist(),
+        values[:, OPEN].sum(axis=1).tolist(),
+        np.round(win_rate(counts), 4).tolist(),
+    )
+    return [{
+        'count': count,
+        'counts': dict(zip(STATUSES, row_counts)),
+        'value': _money(value),
+        'values': {status: _money(cents) for status, cents in zip(STATUSES, row_values)},
+        'accepted_value': _money(row_values[ACCEPTED]),
+        'open_value': _money(open_value),
+        'win_rate': None if rate != rate else rate,  # NaN: nothing decided
+    } for count, row_counts, value, row_values, open_value, rate in columns]
+
+
+def pipeline_report(cube, month=None, n_months=12, top_clients=20):
+    """
+    The figures of the report for month (an ordinal, default the latest
+    month with quotations) as a JSON-ready dict: the month's totals by
+    status, the n_months months up to it and its top_clients clients by
+    value, with the rest of its clients summed under other_clients.
+    Money is in Decimal (json.dump it with default=str).
+    """
+    if month is None:
+        month = cube.last_month if cube.last_month is not None else month_ordinal(date.today().strftime('%Y-%m'))
+    month_counts, month_values = cube.months(month, month + 1)
+    total = report_rows(month_counts, month_values)[0]
+    value = int(month_values.sum())
+    shares = month_values[0] / value if value else np.zeros(len(STATUSES))
+
+    trend_counts, trend_values = cube.months(month - n_months + 1, month + 1)
+    trend = [{'month': month_label(month - n_months + 1 + i), **row}
+             for i, row in enumerate(report_rows(trend_counts, trend_values))]
+
+    client_counts, client_values = cube.clients(month)
+    totals = client_values.sum(axis=1)
+    active = np.flatnonzero(client_counts.sum(axis=1))
+    # By value, largest first; ties by name.
+    names = np.array(cube.client_names, dtype=str)[active]
+    ranked = active[np.lexsort((names, -totals[active]))]
+    top, rest = ranked[:top_clients], ranked[top_clients:]
+    clients = [{'client': cube.client_names[i], **row}
+               for i, row in zip(top.tolist(), report_rows(client_counts[top], client_values[top]))]
+    other_clients = None
+    if len(rest):
+        other_clients = {'clients': len(rest),
+                         **report_rows(client_counts[rest].sum(axis=0, keepdims=True),
+                                       client_values[rest].sum(axis=0, keepdims=True))[0]}
+
+    return {
+        'month': month_label(month),
+        'title': month_title(month),
+        'statuses': [{'status': status, 'count': total['counts'][status], 'value': total['values'][status],
+                      'share': share} for status, share in zip(STATUSES, np.round(shares, 4).tolist())],
+        'total': total,
+        'trend': trend,
+        'clients': clients,
+        'other_clients': other_clients,
+        'skipped': cube.skipped,
+    }
+
+
+class PipelineHeaderFooter(QuotationHeaderFooter):
+    """The quotation header and footer with the report's title and period in place of the quote's."""
+    FORM_NAME = 'PipelineHeaderFooter'
+
+    def __init__(self, report, template, generated=None):
+        header_info_data = [
+            ['REPORT', 'MONTH'],
+            ['Sales pipeline', report['title']],
+            ['GENERATED', 'QUOTATIONS'],
+            [(generated or date.today()).strftime('%d/%m/%Y'), str(report['total']['count'])],
+        ]
+        self.build_header(template, "SALES PIPELINE", header_info_data)
+
+
+def _percent(rate):
+    return "-" if rate is None else f"{rate * 100:.1f}%"
+
+
+def _report_table(title, header, rows, col_widths, styles, template, total_rows=1):
+    """
+    A summary table in the items table's house style (title bar, column
+    headings in primary_color, right-aligned figures), with the last
+    total_rows rows set off as totals.
+    """
+    table = Table([[title] + [''] * (len(header) - 1), header] + rows,
+                  colWidths=col_widths, repeatRows=2)
+    table.setStyle(styles.items_table)
+    commands = [('FONTSIZE', (0, 0), (-1, -1), 8), ('TOPPADDING', (0, 2), (-1, -1), 4),
+                ('BOTTOMPADDING', (0, 2), (-1, -1), 4)]
+    if total_rows:
+        commands += [('FONTNAME', (0, -total_rows), (-1, -1), styles.font_bold),
+                     ('TEXTCOLOR', (0, -total_rows), (-1, -1), template.primary_color),
+                     ('LINEABOVE', (0, -total_rows), (-1, -total_rows), 1, template.primary_color)]
+    table.setStyle(commands)
+    return table
+
+
+def build_report_story(report, template, total_width):
+    styles = template.styles
+    title = report['title'].upper()
+    elements = []
+
+    rows = [[status['status'].title(), str(status['count']), format_money(status['value']),
+             f"{status['share'] * 100:.1f}%"] for status in report['statuses']]
+    total = report['total']
+    rows.append(['Total', str(total['count']), format_money(total['value']), "100.0%" if total['count'] else "-"])
+    widths = [total_width * share for share in (0.34, 0.18, 0.30, 0.18)]
+    elements.append(_report_table(f"QUOTATIONS BY STATUS - {title}", ['Status', 'Quotations', 'Value', 'Share'],
+                                  rows, widths, styles, template))
+    if total['win_rate'] is None:
+        win_text = "No quotations decided yet"
+    else:
+        win_text = f"Win rate <b>{_percent(total['win_rate'])}</b> of decided quotations"
+    elements.append(Spacer(1, 2*mm))
+    elements.append(Paragraph(f"{win_text}; {format_money(total['open_value'])} still open (draft or sent).",
+                              styles.normal_style))
+    elements.append(Spacer(1, 6*mm))
+
+    header = ['Month', 'Quotes'] + [status.title() for status in STATUSES] + ['Value', 'Win rate']
+    rows = [[row['month'], str(row['count'])] + [str(row['counts'][status]) for status in STATUSES]
+            + [format_money(row['value']), _percent(row['win_rate'])] for row in report['trend']]
+    widths = [total_width * share for share in (0.11, 0.08) + (0.09,) * len(STATUSES) + (0.24, 0.12)]
+    elements.append(_report_table(f"MONTHLY TREND - {len(rows)} MONTHS TO {title}", header, rows, widths,
+                                  styles, template, total_rows=0))
+    elements.append(Spacer(1, 6*mm))
+
+    header = ['Client', 'Quotes', 'Value', 'Accepted', 'Open', 'Win rate']
+    name_style = styles.normal_style
+    rows = [[Paragraph(escape(row['client']), name_style), str(row['count']), format_money(row['value']),
+             format_money(row['accepted_value']), format_money(row['open_value']), _percent(row['win_rate'])]
+            for row in report['clients']]
+    other = report['other_clients']
+    if other:
+        rows.append([Paragraph(f"Other clients ({other['clients']})", name_style), str(other['count']),
+                     format_money(other['value']), format_money(other['accepted_value']),
+                     format_money(other['open_value']), _percent(other['win_rate'])])
+    rows.append(['Total', str(total['count']), format_money(total['value']), format_money(total['accepted_value']),
+                 format_money(total['open_value']), _percent(total['win_rate'])])
+    widths = [total_width * share for share in (0.28, 0.08, 0.18, 0.18, 0.18, 0.10)]
+    elements.append(_report_table(f"CLIENTS BY VALUE - {title}", header, rows, widths, styles, template))
+
+    if report['skipped']:
+        elements.append(Spacer(1, 4*mm))
+        elements.append(Paragraph(f"{report['skipped']} quotation(s) without a known status or creation date "
+                                  f"are not included.", styles.normal_style))
+    return elements
+
+
+def render_pipeline_report(report, output, generated=None):
+    """
+    Renders a pipeline_report() dict to output (a file path or a writable
+    binary file-like object) in the default template's house style and
+    returns (SHA-256 hex digest, page count).
+    """
+    template = compile_template({})
+    target = DigestWriter(output)
+    # Same page geometry as the quotation, with room above the footer rule.
+    doc = SimpleDocTemplate(target, pagesize=A4, rightMargin=15*mm, leftMargin=15*mm,
+                            topMargin=68*mm, bottomMargin=25*mm,
+                            title=f"Sales pipeline {report['month']}", author=template.company_name)
+    on_page = PipelineHeaderFooter(report, template, generated)
+    try:
+        doc.build(build_report_story(report, template, doc.width), onFirstPage=on_page, onLaterPages=on_page)
+    except BaseException:
+        target.abort()
+        raise
+    target.close()
+    return target.hexdigest(), doc.page
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monthly sales pipeline report: quotation value by status, "
+                                                 "month and client")
+    parser.add_argument('output', help="PDF path to write")
+    parser.add_argument('--month', help="Month to report, YYYY-MM (default: the latest month with quotations)")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--sql', default=SQL_DUMP, help="pg_dump file to read from (default: %(default)s)")
+    source.add_argument('--sqlite', help="Read from this SQLite stand-in instead of a dump")
+    source.add_argument('--postgres', action='store_true', help="Read from PostgreSQL (DB_* variables)")
+    parser.add_argument('--months', type=int, default=12, help="Months in the trend table (default: %(default)s)")
+    parser.add_argument('--clients', type=int, default=20,
+                        help="Clients listed before the rest are summed up (default: %(default)s)")
+    parser.add_argument('--json', help="Also write the report figures to this JSON file")
+    args = parser.parse_args()
+
+    month = None
+    if args.month:
+        month = month_ordinal(args.month)
+        if month < 0:
+            parser.error(f"--month must be YYYY-MM, not {args.month!r}")
+
+    try:
+        if args.postgres:
+            columns = load_postgres()
+        elif args.sqlite:
+            columns = load_sqlite(args.sqlite)
+        else:
+            columns = load_dump(args.sql)
+        report = pipeline_report(PipelineCube(columns), month, max(1, args.months), max(0, args.clients))
+        digest, pages = render_pipeline_report(report, args.output)
+    except Exception as e:
+        print(f"Error generating pipeline report: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+    print(f"Pipeline report for {report['month']} generated: {args.output} "
+          f"({len(columns)} quotations, {pages} page(s), sha256 {digest})")
+
+
+if __name__ == '__main__':
+    main()
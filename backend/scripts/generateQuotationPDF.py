@@ -1,102 +1,257 @@
 #!/usr/bin/env python3
 import sys
+import io
 import json
 import os
-from datetime import datetime
+import stat
+import hashlib
+import calendar
+import tempfile
+from functools import partial
+from contextlib import nullcontext
+from datetime import datetime, timezone
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
-from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from reportlab import rl_config
+from reportlab.lib.utils import TimeStamp
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFName, PDFStream, PDFZCompress, PDFBase85Encode
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
 
-def register_custom_fonts():
+from quotationAssets import ASSETS, binary_streams
+from quotationItemsTable import ItemRows, ItemsTable
+from quotationParagraphCache import PARAGRAPHS
+from quotationPrelaidPage import PrelaidPage
+from quotationTemplates import TEXT_LIGHT, compile_template, format_rate
+from quotationPricing import INVALID, stored_mismatches, format_money
+from quotationModel import Quotation, parse_quotation
+from quotationPdfSize import CATEGORIES, size_breakdown
+from quotationMetrics import (
+    RenderMetrics, NO_METRICS, metrics_enabled, profile_dir, profile_path_for, profiled
+)
+
+# Bump whenever a change alters the rendered output, so cached PDFs are not reused.
+RENDERER_VERSION = '9'
+
+DEFAULT_LOGO_DPI = 150
+
+def optimize_enabled():
     """
-    Attempts to register Oswald-Regular and Oswald-Bold.
-    Falls back to Helvetica if files are not found.
+    Output-optimized renders (PDF_OPTIMIZE_OUTPUT=1): the logo is embedded
+    downsampled to PDF_LOGO_DPI for the box it is drawn in, and streams are
+    written as binary Flate instead of ASCII85-wrapped Flate.
     """
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    font_dirs = [
-        os.path.join(script_dir, '..', 'fonts'),
-        os.path.join(script_dir, 'fonts'),
-        os.path.join(script_dir, 'assets', 'fonts'),
-    ]
-    
-    regular_font_path = None
-    bold_font_path = None
-    
-    for d in font_dirs:
-        r_path = os.path.join(d, 'Oswald-Regular.ttf')
-        b_path = os.path.join(d, 'Oswald-Bold.ttf')
-        if os.path.exists(r_path) and os.path.exists(b_path):
-            regular_font_path = r_path
-            bold_font_path = b_path
-            break
-            
+    return os.environ.get('PDF_OPTIMIZE_OUTPUT', '').lower() in ('1', 'true', 'yes', 'on')
+
+def invariant_enabled():
+    """
+    Reproducible renders (PDF_INVARIANT_OUTPUT=1): the document dates come
+    from the quotation and the document ID from its contents, so the same
+    payload, template and assets always give the same bytes.
+    """
+    return os.environ.get('PDF_INVARIANT_OUTPUT', '').lower() in ('1', 'true', 'yes', 'on')
+
+def issue_date(quotation, invariant=False):
+    """
+    The date a quotation is issued on: created_at, else today (or, for an
+    invariant render, ReportLab's fixed date, honouring SOURCE_DATE_EPOCH).
+    """
+    if quotation.created_at:
+        return quotation.created_at
+    return TimeStamp(invariant=1).datetime if invariant else datetime.now()
+
+def _process_umask():
+    # The umask can only be read by setting it, so read it once at import,
+    # before any render threads exist.
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+UMASK = _process_umask()
+
+def temp_file_beside(path):
+    """
+    Creates a temp file in path's directory, to be renamed over path, and
+    returns (fd, temp path). mkstemp makes it 0600, so it is given the mode
+    open() would have left path with (the existing file's, else 0666 less
+    the umask); otherwise the rename would make every output owner-only.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.pdf')
     try:
-        if regular_font_path and bold_font_path:
-            pdfmetrics.registerFont(TTFont('Oswald', regular_font_path))
-            pdfmetrics.registerFont(TTFont('Oswald-Bold', bold_font_path))
-            return 'Oswald', 'Oswald-Bold'
-        else:
-            pdfmetrics.registerFont(pdfmetrics.getFont('Helvetica'))
-            pdfmetrics.registerFont(pdfmetrics.getFont('Helvetica-Bold'))
-            return 'Helvetica', 'Helvetica-Bold'
-    except Exception:
-        return 'Helvetica', 'Helvetica-Bold'
-
-def create_quotation_pdf(data_path, output_path):
-    # --- 1. LOAD DATA ---
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        mode = 0o666 & ~UMASK
+    if hasattr(os, 'fchmod'):
+        os.fchmod(fd, mode)
+    return fd, tmp_path
+
+def logo_dpi():
     try:
-        with open(data_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except Exception as e:
-        print(f"Error loading JSON data: {e}")
-        sys.exit(1)
-    
-    items = data.get('items', [])
-    if isinstance(items, str):
-        try:
-            items = json.loads(items)
-        except:
-            items = []
+        return int(os.environ.get('PDF_LOGO_DPI', DEFAULT_LOGO_DPI))
+    except ValueError:
+        return DEFAULT_LOGO_DPI
 
-    # --- 2. SETUP GLOBALS & ASSETS ---
-    font_reg, font_bold = register_custom_fonts()
-    
-    # Colors
-    primary_color = colors.HexColor('#8B0000')
-    text_dark = colors.HexColor('#212121')
-    text_light = colors.HexColor('#757575')
-    header_bg_grey = colors.HexColor('#CCCCCC') 
-
-    # Header/Footer Vars
-    address = data.get('company_address', '165 West Street, Sandton, Johannesburg')
-    phone = data.get('company_phone', '+27 (0) 10 006 3999')
-    email = data.get('company_email', 'support@scarybyte.co.za')
-    company_name = data.get('company_name', 'ScaryByte (Pty) Ltd')
-    tagline = data.get('company_tagline', 'MILITARY GRADE CYBER SOLUTIONS')
-    website = data.get('company_website', 'www.scarybyte.co.za')
-    reg_num = data.get('company_reg_number', '2021/324782/07')
-    vat_num = data.get('company_vat_number', '4500299245')
-
-    # Logo Logic
-    logo_path = None
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    possible_paths = [
-        os.path.join(script_dir, '..', 'logos', 'scarybyte-logo.png'),
-        os.path.join(script_dir, 'logos', 'scarybyte-logo.png'),
-        os.path.join(script_dir, 'scarybyte-logo.png'), 
-    ]
-    for path in possible_paths:
-        if os.path.exists(path):
-            logo_path = path
-            break
-    
-    # --- 3. DEFINE HEADER & FOOTER CANVAS FUNCTION ---
-    def draw_header_footer(canvas, doc):
+class PinnedTimeStamp(TimeStamp):
+    """ReportLab TimeStamp for a given moment rather than the time of the render, in UTC."""
+
+    def __init__(self, moment):
+        TimeStamp.__init__(self, invariant=1)
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc)
+        self.lt = moment.timetuple()
+        self.t = calendar.timegm(self.lt)
+        self.YMDhms = tuple(self.lt)[:6]
+
+class PageFlushingCanvas(Canvas):
+    """
+    Canvas that compresses each page's content stream as soon as the page is
+    finished. ReportLab otherwise keeps every page as text until the PDF is
+    saved, so a quotation running to hundreds of pages holds all of them
+    uncompressed in memory. The bytes written are the same.
+    timestamp (a TimeStamp) replaces the render time as CreationDate/ModDate.
+    """
+
+    def __init__(self, *args, timestamp=None, **kwargs):
+        Canvas.__init__(self, *args, **kwargs)
+        if timestamp is not None:
+            self._doc._timeStamp = timestamp
+
+    def showPage(self):
+        Canvas.showPage(self)
+        page = self._doc.Pages.pages[-1]
+        if page.compression and page.stream:
+            # The filters PDFPage.check_format would apply at save time.
+            filters = [PDFBase85Encode, PDFZCompress] if rl_config.useA85 else [PDFZCompress]
+            content = page.stream
+            for f in reversed(filters):
+                content = f.encode(content)
+            contents = PDFStream(content=content)
+            contents.dictionary['Filter'] = PDFArray([PDFName(f.pdfname) for f in filters])
+            contents.__Comment__ = "page stream"
+            page.Contents = contents
+            page.stream = None
+
+class DigestWriter:
+    """
+    Binary write target that hashes (SHA-256) everything written on its way
+    to output: a writable file-like object, or a path. A path is written
+    through a uniquely named temp file beside it, created on first write and
+    renamed over the path by close(), so concurrent renders to one path never
+    interleave and readers never see a partial PDF; abort() discards it.
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.sha256 = hashlib.sha256()
+        self._file = None
+        self._tmp_path = None
+
+    def write(self, data):
+        if self._file is None:
+            if hasattr(self.output, 'write'):
+                self._file = self.output
+            else:
+                fd, self._tmp_path = temp_file_beside(self.output)
+                self._file = os.fdopen(fd, 'wb')
+        self.sha256.update(data)
+        return self._file.write(data)
+
+    def close(self):
+        if self._tmp_path is not None:
+            self._file.close()
+            os.replace(self._tmp_path, self.output)
+            self._tmp_path = None
+
+    def abort(self):
+        if self._tmp_path is not None:
+            self._file.close()
+            os.unlink(self._tmp_path)
+            self._tmp_path = None
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+class QuotationHeaderFooter:
+    """
+    onPage callback that draws the quotation header and footer.
+
+    The header/footer is identical on every page, so its tables and
+    paragraphs are built and wrapped once per document, drawn once into a
+    form XObject on the first page and then only referenced (doForm) on
+    each page. Anything page-dependent belongs after the doForm call.
+    """
+    FORM_NAME = 'QuotationHeaderFooter'
+    LOGO_BOX = (80*mm, 25*mm)
+
+    def __init__(self, quotation, template, optimize=False, issued=None):
+        # 3. HEADER TABLE (Top Right)
+        created_date = (issued or issue_date(quotation)).strftime('%d/%m/%Y')
+        valid_until = quotation.valid_until
+        valid_date = valid_until.strftime('%d/%m/%Y') if valid_until else "N/A"
+
+        header_info_data = [
+            ['QUOTE ID', 'DATE'],
+            [quotation.quote_number or '0000', created_date],
+            ['VALID UNTIL', 'PREPARED BY'],
+            [valid_date, quotation.prepared_by or 'R.Younuss']
+        ]
+        self.build_header(template, "QUOTATION", header_info_data, optimize)
+
+    def build_header(self, template, title, header_info_data, optimize=False):
+        """
+        Builds the header/footer parts: the 4-row info table at the top
+        right, the centred contact line and the strip with title on the
+        left and the registration numbers on the right.
+        """
+        styles = template.styles
+        self.font_reg = styles.font_reg
+        self.logo = template.logo
+        if optimize and template.logo_path:
+            self.logo = ASSETS.image(template.logo_path, fit=self.LOGO_BOX, dpi=logo_dpi()) or template.logo
+        self.tagline = template.tagline
+        self.company_name = template.company_name
+        self.website = template.website
+        self._form_canvas = None
+
+        side_margin = 15*mm
+        page_width = A4[0]
+
+        self.t_header_info = Table(header_info_data, colWidths=[35*mm, 35*mm])
+        self.t_header_info.setStyle(styles.header_info_table)
+        self.w_hi, self.h_hi = self.t_header_info.wrap(80*mm, 40*mm)
+
+        # 4. ADDRESS LINE (Centered)
+        contact_text = (f"<b>{template.company_name}</b> | {template.address} | "
+                        f"<b>Tel:</b> {template.phone} | <b>Email:</b> {template.email}")
+        self.p_contact = Paragraph(contact_text, styles.contact_style)
+        self.w_c, self.h_c = self.p_contact.wrap(page_width - 2*side_margin, 15*mm)
+
+        # 5. QUOTATION STRIP
+        p_title = Paragraph(title, styles.title_style)
+
+        reg_data = [
+            ["Company Registration", ":", template.reg_num],
+            ["VAT Registration", ":", template.vat_num]
+        ]
+        t_reg = Table(reg_data, colWidths=[40*mm, 5*mm, 35*mm])
+        t_reg.setStyle(styles.reg_table)
+
+        strip_data = [[p_title, t_reg]]
+        self.t_strip = Table(strip_data, colWidths=[100*mm, 80*mm])
+        self.t_strip.setStyle(styles.strip_table)
+
+    def __call__(self, canvas, doc):
+        # Forms belong to the canvas, so define it the first time each canvas is seen.
+        if self._form_canvas is not canvas:
+            canvas.beginForm(self.FORM_NAME)
+            self.draw_static(canvas)
+            canvas.endForm()
+            self._form_canvas = canvas
+        canvas.doForm(self.FORM_NAME)
+
+    def draw_static(self, canvas):
         canvas.saveState()
         side_margin = 15*mm
         page_width = A4[0]
@@ -105,381 +260,328 @@ def create_quotation_pdf(data_path, output_path):
         top_y = A4[1] - 10*mm 
         
         # 1. LOGO (Top Left)
-        logo_width = 80*mm
-        logo_height = 25*mm
+        logo_width, logo_height = self.LOGO_BOX
         logo_y = top_y - logo_height
         
-        if logo_path:
+        if self.logo:
             try:
-                canvas.drawImage(logo_path, side_margin, logo_y, width=logo_width, height=logo_height, preserveAspectRatio=True, mask='auto')
+                self.logo.draw(canvas, side_margin, logo_y, logo_width, logo_height, preserveAspectRatio=True)
             except Exception:
                 pass
         
         # 2. SLOGAN (Left - Under Logo)
         # UPDATED: Larger font size (11) and Black color
-        canvas.setFont(font_reg, 11) 
+        canvas.setFont(self.font_reg, 11) 
         canvas.setFillColor(colors.black)
         slogan_y = logo_y - 5*mm # Slightly more space for larger font
-        canvas.drawString(side_margin, slogan_y, tagline)
+        canvas.drawString(side_margin, slogan_y, self.tagline)
 
         # 3. HEADER TABLE (Top Right)
-        created_date = datetime.fromisoformat(data.get('created_at', datetime.now().isoformat()).replace('Z', '+00:00')).strftime('%d/%m/%Y')
-        valid_date_str = data.get('valid_until')
-        if valid_date_str:
-            try:
-                valid_date = datetime.fromisoformat(valid_date_str.replace('Z', '+00:00')).strftime('%d/%m/%Y')
-            except:
-                valid_date = valid_date_str[:10]
-        else:
-            valid_date = "N/A"
-
-        header_info_data = [
-            ['QUOTE ID', 'DATE'],
-            [data.get('quote_number', '0000'), created_date],
-            ['VALID UNTIL', 'PREPARED BY'],
-            [valid_date, data.get('prepared_by', 'R.Younuss')]
-        ]
-
-        t_header_info = Table(header_info_data, colWidths=[35*mm, 35*mm])
-        t_header_info.setStyle(TableStyle([
-            ('FONTNAME', (0,0), (-1,-1), font_reg),
-            ('FONTSIZE', (0,0), (-1,-1), 8),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('BACKGROUND', (0,0), (-1,0), header_bg_grey),
-            ('FONTNAME', (0,0), (-1,0), font_bold),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.black),
-            ('BACKGROUND', (0,1), (-1,1), colors.white),
-            ('TEXTCOLOR', (0,1), (-1,1), text_light),
-            ('BACKGROUND', (0,2), (-1,2), header_bg_grey),
-            ('FONTNAME', (0,2), (-1,2), font_bold),
-            ('TEXTCOLOR', (0,2), (-1,2), colors.black),
-            ('BACKGROUND', (0,3), (-1,3), colors.white),
-            ('TEXTCOLOR', (0,3), (-1,3), text_light),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('BOX', (0,0), (-1,-1), 0.5, colors.black),
-            ('TOPPADDING', (0,0), (-1,-1), 3), 
-            ('BOTTOMPADDING', (0,0), (-1,-1), 3),
-        ]))
-        
-        w_hi, h_hi = t_header_info.wrap(80*mm, 40*mm)
-        t_header_info.drawOn(canvas, page_width - side_margin - w_hi, top_y - h_hi)
+        self.t_header_info.drawOn(canvas, page_width - side_margin - self.w_hi, top_y - self.h_hi)
 
         # 4. ADDRESS LINE (Centered)
-        styles = getSampleStyleSheet()
-        contact_style = ParagraphStyle('Contact', parent=styles['Normal'], 
-                                     fontName=font_reg, fontSize=9, leading=11, 
-                                     alignment=TA_CENTER, textColor=text_dark)
-        
-        contact_text = f"<b>{company_name}</b> | {address} | <b>Tel:</b> {phone} | <b>Email:</b> {email}"
-        p_contact = Paragraph(contact_text, contact_style)
-        w_c, h_c = p_contact.wrap(page_width - 2*side_margin, 15*mm)
-        
-        lowest_y = min(slogan_y, top_y - h_hi)
-        contact_y = lowest_y - h_c - 3*mm
-        p_contact.drawOn(canvas, side_margin, contact_y)
+        lowest_y = min(slogan_y, top_y - self.h_hi)
+        contact_y = lowest_y - self.h_c - 3*mm
+        self.p_contact.drawOn(canvas, side_margin, contact_y)
 
         # --- 5. QUOTATION STRIP ---
         block_height = 15*mm 
         strip_y = contact_y - 2*mm - block_height
 
-        title_style = ParagraphStyle('QTitle', parent=styles['Heading1'], 
-                                   fontName=font_bold, fontSize=24, 
-                                   textColor=text_dark, alignment=TA_LEFT)
-        p_title = Paragraph("QUOTATION", title_style)
-
-        reg_data = [
-            ["Company Registration", ":", reg_num],
-            ["VAT Registration", ":", vat_num]
-        ]
-        t_reg = Table(reg_data, colWidths=[40*mm, 5*mm, 35*mm])
-        t_reg.setStyle(TableStyle([
-            ('FONTNAME', (0,0), (-1,-1), font_reg),
-            ('FONTSIZE', (0,0), (-1,-1), 8),
-            ('TEXTCOLOR', (0,0), (-1,-1), text_light),
-            ('ALIGN', (0,0), (0,-1), 'LEFT'),
-            ('ALIGN', (1,0), (1,-1), 'CENTER'),
-            ('ALIGN', (2,0), (2,-1), 'RIGHT'),
-            ('LEFTPADDING', (0,0), (-1,-1), 0),
-            ('RIGHTPADDING', (0,0), (-1,-1), 0),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ]))
-
-        strip_data = [[p_title, t_reg]]
-        t_strip = Table(strip_data, colWidths=[100*mm, 80*mm])
-        t_strip.setStyle(TableStyle([
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('ALIGN', (0,0), (0,0), 'LEFT'),
-            ('ALIGN', (1,0), (1,0), 'RIGHT'),
-            ('LINEABOVE', (0,0), (-1,0), 1, colors.grey),
-            ('LINEBELOW', (0,0), (-1,0), 1, colors.grey),
-            ('TOPPADDING', (0,0), (-1,-1), 0),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 0),
-            ('LEFTPADDING', (0,0), (-1,-1), 0),
-            ('RIGHTPADDING', (0,0), (-1,-1), 0),
-        ]))
-
-        t_strip.wrapOn(canvas, page_width - 2*side_margin, block_height)
-        t_strip.drawOn(canvas, side_margin, strip_y)
+        self.t_strip.wrapOn(canvas, page_width - 2*side_margin, block_height)
+        self.t_strip.drawOn(canvas, side_margin, strip_y)
 
         # --- FOOTER ---
         canvas.setStrokeColor(colors.lightgrey)
         canvas.setLineWidth(0.5)
         canvas.line(side_margin, 20*mm, page_width - side_margin, 20*mm)
         
-        canvas.setFont(font_reg, 8)
-        canvas.setFillColor(text_light)
-        canvas.drawString(side_margin, 15*mm, company_name)
-        canvas.drawRightString(page_width - side_margin, 15*mm, website.lower())
+        canvas.setFont(self.font_reg, 8)
+        canvas.setFillColor(TEXT_LIGHT)
+        canvas.drawString(side_margin, 15*mm, self.company_name)
+        canvas.drawRightString(page_width - side_margin, 15*mm, self.website.lower())
         canvas.restoreState()
 
+def load_quotation_data(source):
+    """
+    Reads the quotation payload written by the Node route from a path,
+    '-' for stdin, or a readable file-like object.
+    Raises ValueError if the payload cannot be read or parsed.
+    """
+    try:
+        if source == '-':
+            return json.load(sys.stdin)
+        if hasattr(source, 'read'):
+            return json.load(source)
+        with open(source, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        raise ValueError(f"Error loading JSON data: {e}") from e
+
+def create_quotation_pdf(data_path, output_path, metrics=False, profile_to=None):
+    """
+    Path-based entry point. Either argument may be '-' to read the payload
+    from stdin / write the PDF bytes to stdout.
+    With metrics, one render_metrics JSON line is written to stderr; with
+    profile_to (a directory), a cProfile dump of the render is saved there.
+    The status line carries the PDF's SHA-256.
+    """
+    recorder = RenderMetrics(source='cli') if metrics else NO_METRICS
+    ok = False
+    try:
+        # --- 1. LOAD DATA ---
+        with recorder.phase('load'):
+            data = load_quotation_data(data_path)
+        recorder.set(quote_number=data.get('quote_number'))
+        profile_path = profile_path_for(profile_to, data.get('quote_number') or 'quotation')
+        recorder.set(profile=profile_path)
+
+        with profiled(profile_path):
+            if output_path == '-':
+                digest = render_quotation_pdf(data, sys.stdout.buffer, recorder)
+                sys.stdout.buffer.flush()
+            else:
+                digest = render_quotation_pdf(data, output_path, recorder)
+        ok = True
+    except Exception as e:
+        recorder.set(error=str(e))
+        raise
+    finally:
+        recorder.set(ok=ok)
+        recorder.emit()
+
+    if output_path == '-':
+        # stdout carries the PDF, so the status line goes to stderr.
+        print(f"PDF generated successfully: <stdout> (sha256 {digest})", file=sys.stderr)
+    else:
+        print(f"PDF generated successfully: {output_path} (sha256 {digest})")
+
+def prepare_render_assets(data):
+    """
+    Returns the CompiledTemplate for data's template (quotationTemplates);
+    data is a payload or a Quotation. Compiled templates live in the
+    process-wide registry, so this is cheap once a template has been seen.
+    """
+    return compile_template(data.template if isinstance(data, Quotation) else data)
+
+def render_quotation_pdf(data, output, metrics=NO_METRICS, optimize=None, invariant=None):
+    """
+    Renders an already-loaded quotation payload to output, which is either a
+    file path or a writable binary file-like object (e.g. io.BytesIO), and
+    returns the SHA-256 hex digest of the PDF written.
+    Errors are raised to the caller so long-lived callers survive bad jobs.
+    Pass a RenderMetrics to record phase timings and story/output counts.
+    optimize selects the output-optimized mode and invariant the
+    reproducible one (see optimize_enabled and invariant_enabled, which are
+    the defaults). data may also be an already parsed Quotation; a
+    malformed payload raises QuotationError before anything is laid out.
+    """
+    if optimize is None:
+        optimize = optimize_enabled()
+    if invariant is None:
+        invariant = invariant_enabled()
+    with metrics.phase('parse'):
+        quotation = parse_quotation(data)
+    with metrics.phase('assets'):
+        template = prepare_render_assets(quotation)
+
+    # Measuring the output size and write time needs the bytes in hand first.
+    target = io.BytesIO() if metrics else DigestWriter(output)
+    paragraph_hits, paragraph_misses = PARAGRAPHS.hits, PARAGRAPHS.misses
+    with metrics.phase('build'):
+        doc, elements, on_page = build_quotation_story(quotation, target, template, optimize, invariant)
+    if metrics:
+        metrics.count('flowables', len(elements))
+        metrics.count('table_rows', count_table_rows(elements))
+
+    canvasmaker = PageFlushingCanvas
+    if invariant:
+        canvasmaker = partial(PageFlushingCanvas, timestamp=PinnedTimeStamp(issue_date(quotation, invariant)))
+    try:
+        with metrics.phase('layout'), (binary_streams() if optimize else nullcontext()):
+            doc.build(elements, onFirstPage=on_page, onLaterPages=on_page, canvasmaker=canvasmaker)
+    except BaseException:
+        if not metrics:
+            target.abort()
+        raise
+    if not metrics:
+        target.close()
+        return target.hexdigest()
+
+    pdf_bytes = target.getvalue()
+    with metrics.phase('write'):
+        writer = DigestWriter(output)
+        writer.write(pdf_bytes)
+        writer.close()
+    metrics.count('pages', doc.page)
+    metrics.count('pdf_bytes', len(pdf_bytes))
+    metrics.count('paragraph_hits', PARAGRAPHS.hits - paragraph_hits)
+    metrics.count('paragraph_misses', PARAGRAPHS.misses - paragraph_misses)
+    sizes = size_breakdown(pdf_bytes)
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    metrics.set(optimized=optimize, invariant=invariant, sha256=digest,
+                pdf_size={name: sizes[name] for name in CATEGORIES},
+                fonts_subset=all(font['subset'] for font in sizes['embedded_fonts']))
+    return digest
+
+def count_table_rows(elements):
+    """Rows across every table in a story, counting each line item once."""
+    rows = 0
+    for flowable in elements:
+        if isinstance(flowable, ItemsTable):
+            rows += flowable.rows.count or 0
+        elif isinstance(flowable, PrelaidPage):
+            rows += count_table_rows(flowable.flowables)
+        elif isinstance(flowable, Table):
+            rows += len(flowable._cellvalues)
+    return rows
+
+def warn_stored_totals(quotation, totals):
+    """Notes on stderr when the stored totals disagree with the totals being printed."""
+    try:
+        mismatches = stored_mismatches(quotation.stored_totals, totals)
+    except INVALID:
+        return
+    for mismatch in mismatches:
+        print(f"Warning: quotation {quotation.quote_number} has stored {mismatch['field']} "
+              f"{mismatch['stored']}, but its items give {mismatch['computed']}; printing the latter",
+              file=sys.stderr)
+
+def build_quotation_story(data, output, template=None, optimize=False, invariant=False):
+    """
+    Builds everything doc.build needs for data (a payload or a Quotation)
+    without laying it out.
+    Returns (doc, elements, on_page); template defaults to prepare_render_assets(data).
+    With optimize, the header uses the downsampled logo; doc.build must then
+    run inside binary_streams() as render_quotation_pdf does. With invariant,
+    doc.build needs a canvas pinned to issue_date() (render_quotation_pdf
+    makes one) for the output to be reproducible.
+    """
+    quotation = parse_quotation(data)
+
+    # --- 2. SETUP GLOBALS & ASSETS ---
+    # Styles, colours, toggles, logo and the acceptance page come precompiled
+    # from the quotation's template; only the quotation itself is built here.
+    template = template or prepare_render_assets(quotation)
+    styles = template.styles
+
+    # --- 3. HEADER & FOOTER (laid out once, stamped on every page) ---
+    issued = issue_date(quotation, invariant)
+    draw_header_footer = QuotationHeaderFooter(quotation, template, optimize, issued)
+
     # --- 4. BUILD CONTENT ---
 
     # Create PDF title in specified format
-    quote_id = data.get('quote_number', '0000')
-    client_company = data.get('client_company') or data.get('client_name', 'N/A')
-    created_date = datetime.fromisoformat(data.get('created_at', datetime.now().isoformat()).replace('Z', '+00:00')).strftime('%d-%m-%Y')
+    quote_id = quotation.quote_number or '0000'
+    client_company = quotation.client_company or quotation.client_name or 'N/A'
+    created_date = issued.strftime('%d-%m-%Y')
     pdf_title = f"ScaryByte Quotation - Quote ID_{quote_id} - {client_company} - {created_date}"
     
     doc = SimpleDocTemplate(
-        output_path,
+        output,
         pagesize=A4,
         rightMargin=15*mm,
         leftMargin=15*mm,
         topMargin=68*mm, 
         bottomMargin=15*mm,
-        title=pdf_title
+        title=pdf_title,
+        # None leaves it to rl_config; optimized output always compresses pages.
+        pageCompression=1 if optimize else None,
+        # Invariant renders get a document ID that doesn't depend on the time.
+        invariant=1 if invariant else None,
     )
     
     elements = []
-    styles = getSampleStyleSheet()
-    
-    normal_style = ParagraphStyle('NormalCustom', parent=styles['Normal'], fontName=font_reg, fontSize=9, leading=12)
-    header_style = ParagraphStyle('HeaderCustom', parent=styles['Heading3'], fontName=font_bold, fontSize=11, textColor=primary_color, spaceAfter=5, spaceBefore=10)
+    normal_style = styles.normal_style
     total_width = A4[0] - 30*mm
 
     # 1. Client Information
     # Use primary contact if available, otherwise fall back to client info
-    primary_contact_name = data.get('primary_contact_name') or data.get('client_name', 'N/A')
-    primary_contact_email = data.get('primary_contact_email') or data.get('client_email', 'N/A')
-    primary_contact_phone = data.get('primary_contact_phone') or data.get('client_phone', 'N/A')
-    primary_contact_position = data.get('primary_contact_position', '')
+    primary_contact_name = quotation.contact_name or 'N/A'
+    primary_contact_email = quotation.contact_email or 'N/A'
+    primary_contact_phone = quotation.contact_phone or 'N/A'
+    primary_contact_position = quotation.contact_position
 
     # Format contact person with position if available
     contact_person_display = primary_contact_name
     if primary_contact_position and primary_contact_position != 'N/A':
         contact_person_display = f"{primary_contact_name} [{primary_contact_position}]"
 
-    client_info_data = [
-        ["CLIENT INFORMATION", ""], # Header row
-        ["Organization:", data.get('client_company') or data.get('client_name', 'N/A')],
-        ["Contact Person:", contact_person_display],
-        ["Phone:", primary_contact_phone],
-        ["Physical Address:", data.get('client_address', 'N/A')],
-        ["Email:", primary_contact_email]
-    ]
-        
-    c_table = Table(client_info_data, colWidths=[total_width*0.25, total_width*0.75])
-    c_table.setStyle(TableStyle([
-        # Header Style
-        ('SPAN', (0,0), (1,0)), 
-        ('BACKGROUND', (0,0), (1,0), primary_color),
-        ('TEXTCOLOR', (0,0), (1,0), colors.white),
-        ('FONTNAME', (0,0), (1,0), font_bold),
-        ('ALIGN', (0,0), (1,0), 'LEFT'),
-        ('TOPPADDING', (0,0), (-1,0), 8), 
-        ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        # Content Style
-        ('FONTNAME', (0,1), (-1,-1), font_reg),
-        ('TEXTCOLOR', (0,1), (-1,-1), text_dark),
-        ('FONTNAME', (0,1), (0,-1), font_bold), 
-        ('VALIGN', (0,0), (-1,-1), 'TOP'),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.lightgrey),
-        ('BOTTOMPADDING', (0,1), (-1,-1), 8),
-        ('TOPPADDING', (0,1), (-1,-1), 8),
-    ]))
-    elements.append(c_table)
-    elements.append(Spacer(1, 8*mm))
+    if template.show_client_info:
+        client_info_data = [
+            ["CLIENT INFORMATION", ""], # Header row
+            ["Organization:", client_company],
+            ["Contact Person:", contact_person_display],
+            ["Phone:", primary_contact_phone],
+            ["Physical Address:", quotation.client_address or 'N/A'],
+            ["Email:", primary_contact_email]
+        ]
+            
+        c_table = Table(client_info_data, colWidths=[total_width*0.25, total_width*0.75])
+        c_table.setStyle(styles.client_table)
+        elements.append(c_table)
+        elements.append(Spacer(1, 8*mm))
     
     # 2. Description
-    if data.get('show_description', True) and data.get('description'):
+    if template.show_description and quotation.description:
         desc_data = [
             ["DESCRIPTION OF SERVICES"],
-            [Paragraph(data['description'], normal_style)]
+            [Paragraph(quotation.description, normal_style)]
         ]
         t_desc = Table(desc_data, colWidths=[total_width])
-        t_desc.setStyle(TableStyle([
-            # Header Style
-            ('BACKGROUND', (0,0), (-1,0), primary_color),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-            ('FONTNAME', (0,0), (-1,0), font_bold),
-            ('ALIGN', (0,0), (-1,0), 'LEFT'),
-            ('TOPPADDING', (0,0), (-1,0), 8), 
-            ('BOTTOMPADDING', (0,0), (-1,0), 8),
-            # Content Style
-            ('VALIGN', (0,1), (-1,-1), 'TOP'),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.lightgrey),
-            ('TOPPADDING', (0,1), (-1,-1), 8),
-            ('BOTTOMPADDING', (0,1), (-1,-1), 8),
-        ]))
+        t_desc.setStyle(styles.desc_table)
         elements.append(t_desc)
         elements.append(Spacer(1, 8*mm))
         
     # 3. Items
-    item_data = [
-        ["ITEMIZED COSTS", "", "", ""], # Title Row
-        ["DESCRIPTION", "QTY", "UNIT PRICE", "AMOUNT"] # Column Headers
-    ]
-    
-    for item in items:
-        name = item.get('name', 'Item')
-        desc = item.get('description', '')
-        qty = float(item.get('quantity', 0))
-        price = float(item.get('price', 0))
-        total_line = qty * price
-        
-        desc_txt = f"<font fontName='{font_bold}'>{name}</font>"
-        if desc:
-            desc_txt += f"<br/><font fontName='{font_reg}' color='grey' size=8>{desc}</font>"
-            
-        item_data.append([
-            Paragraph(desc_txt, normal_style),
-            f"{qty:g}",
-            f"R {price:,.2f}",
-            f"R {total_line:,.2f}"
-        ])
-
+    # Laid out in page-sized chunks with repeated headers and carried subtotals,
+    # so quotations with thousands of lines paginate in linear time.
+    # Every printed amount is priced exactly from the items, so the lines,
+    # subtotal, VAT and total on the page always add up. Rows are measured
+    # only as pages reach them, so no row's flowables outlive its page.
+    # A quotation without a tax_rate is charged the template's VAT rate.
+    totals = quotation.effective_totals(template.vat_rate)
+    warn_stored_totals(quotation, totals)
     w_d, w_q, w_p, w_a = total_width*0.45, total_width*0.15, total_width*0.20, total_width*0.20
-    t_items = Table(item_data, colWidths=[w_d, w_q, w_p, w_a])
-    t_items.setStyle(TableStyle([
-        # -- Title Row --
-        ('SPAN', (0,0), (-1,0)),
-        ('BACKGROUND', (0,0), (-1,0), colors.black), # Changed to BLACK
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('FONTNAME', (0,0), (-1,0), font_bold),
-        ('ALIGN', (0,0), (-1,0), 'LEFT'),
-        ('TOPPADDING', (0,0), (-1,0), 8),
-        ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        
-        # -- Column Headers --
-        ('BACKGROUND', (0,1), (-1,1), primary_color),
-        ('TEXTCOLOR', (0,1), (-1,1), colors.white),
-        ('FONTNAME', (0,1), (-1,1), font_bold),
-        ('ALIGN', (1,1), (-1,1), 'RIGHT'), 
-        ('ALIGN', (0,1), (0,1), 'LEFT'),
-        ('TOPPADDING', (0,1), (-1,1), 8),
-        ('BOTTOMPADDING', (0,1), (-1,1), 8),
-        
-        # -- Data --
-        ('FONTNAME', (0,2), (-1,-1), font_reg),
-        ('FONTNAME', (0,2), (0,-1), font_bold), 
-        ('ALIGN', (1,2), (-1,-1), 'RIGHT'),
-        ('ALIGN', (0,2), (0,-1), 'LEFT'),
-        ('VALIGN', (0,0), (-1,-1), 'TOP'),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.lightgrey),
-        ('TOPPADDING', (0,2), (-1,-1), 8),
-        ('BOTTOMPADDING', (0,2), (-1,-1), 8),
-    ]))
-    elements.append(t_items)
+    item_rows = ItemRows(quotation.items, styles, [w_d, w_q, w_p, w_a])
+    elements.append(ItemsTable(item_rows))
     
     # 4. Totals
-    subtotal = float(data.get('subtotal', 0))
-    tax = float(data.get('tax_amount', 0))
-    total = float(data.get('total', 0))
+    # The rate tax_amount was computed with.
+    vat_rate = format_rate(totals.tax_rate, template.vat_rate)
     
-    total_data = [
-        ["Subtotal (Excl. VAT):", f"R {subtotal:,.2f}"],
-        ["VAT (15%):", f"R {tax:,.2f}"],
-        ["TOTAL (Incl. VAT):", f"R {total:,.2f}"]
+    total_data = [["Subtotal (Excl. VAT):", format_money(totals.subtotal)]]
+    if totals.discount:
+        total_data.append(["Discount:", f"-{format_money(totals.discount)}"])
+    total_data += [
+        [f"VAT ({vat_rate}%):", format_money(totals.tax_amount)],
+        ["TOTAL (Incl. VAT):", format_money(totals.total)]
     ]
     
     t_total = Table(total_data, colWidths=[total_width - w_a, w_a])
-    t_total.setStyle(TableStyle([
-        ('ALIGN', (0,0), (-1,-1), 'RIGHT'),
-        ('FONTNAME', (0,0), (-1,-1), font_bold),
-        ('TEXTCOLOR', (-1,-1), (-1,-1), primary_color),
-        ('LINEABOVE', (0,-1), (-1,-1), 1, primary_color),
-        ('TOPPADDING', (0,0), (-1,-1), 6),
-    ]))
+    t_total.setStyle(styles.totals_table)
     elements.append(t_total)
     
     # ==================== PAGE 2 ====================
-    elements.append(PageBreak())
-    elements.append(Spacer(1, 1*mm))
-    
-    accept_style = ParagraphStyle('AcceptTitle', parent=styles['Heading1'], fontName=font_bold, fontSize=18, textColor=primary_color, alignment=TA_CENTER, spaceAfter=10)
-    elements.append(Paragraph("CUSTOMER ACCEPTANCE", accept_style))
-    
-    # Terms & Conditions Section
-    terms_title_style = ParagraphStyle('TermsTitle', parent=styles['Heading2'], fontName=font_bold, fontSize=12, textColor=colors.white, alignment=TA_LEFT, spaceAfter=8)
-    terms_item_style = ParagraphStyle('TermsItem', parent=styles['Normal'], fontName=font_reg, fontSize=6, leading=8, leftIndent=0, spaceBefore=2)
-    
-    terms_conditions = [
-        ("Inclusive of VAT", "All prices quoted include a 15% Value Added Tax (VAT)."),
-        ("Validity of Quotation", "This quotation is valid for 7 (seven) working days from the date of issue, unless otherwise specified in writing by ScaryByte."),
-        ("Payment Terms", "Payment is due within 1 (one) working week / 7 (seven) working days from the date of invoice following acceptance of this quotation."),
-        ("Currency", "All amounts quoted are in South African Rand (ZAR)."),
-        ("Acceptance of Quotation", "Acceptance of this quotation constitutes agreement to ScaryByte's standard invoicing terms and conditions, including payment terms, ownership terms, and surcharge conditions."),
-        ("Late Payment", "In the event of late or overdue payment, the customer agrees to cover all costs reasonably incurred by ScaryByte, including any applicable and approved additional fees."),
-        ("Credit Authorisation", "Any credit notes, discounts, or adjustments remain subject to the approval and discretion of ScaryByte's management team."),
-        ("Ownership of Goods", "All goods and deliverables remain the property of ScaryByte until full and final payment has been made."),
-        ("Overdue Payments & Surcharges", "Payments not received within 15 (fifteen) days from the invoice date will be deemed overdue. ScaryByte reserves the right to suspend or terminate services or apply a surcharge calculated at an interest rate of 2% for every 10 (ten) days of delayed payment."),
-        ("Amendments", "ScaryByte reserves the right to revise or update these terms and conditions at any time. Any changes affecting an already accepted quotation will be communicated in writing.")
-    ]
-    
-    # Create Terms & Conditions table
-    tc_data = [["Terms & Conditions (Applicable to This Quotation)"]]
-    
-    for idx, (title, content) in enumerate(terms_conditions, 1):
-        term_text = f"<b>{idx}. {title}</b><br/>{content}"
-        tc_data.append([Paragraph(term_text, terms_item_style)])
-    
-    t_terms = Table(tc_data, colWidths=[total_width])
-    t_terms.setStyle(TableStyle([
-        # Header Style
-        ('BACKGROUND', (0,0), (-1,0), colors.black),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('FONTNAME', (0,0), (-1,0), font_bold),
-        ('FONTSIZE', (0,0), (-1,0), 11),
-        ('ALIGN', (0,0), (-1,0), 'LEFT'),
-        ('TOPPADDING', (0,0), (-1,0), 6),
-        ('BOTTOMPADDING', (0,0), (-1,0), 6),
-        # Content Style
-        ('VALIGN', (0,1), (-1,-1), 'TOP'),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.lightgrey),
-        ('TOPPADDING', (0,1), (-1,-1), 6),
-        ('BOTTOMPADDING', (0,1), (-1,-1), 6),
-        ('LEFTPADDING', (0,1), (-1,-1), 8),
-        ('RIGHTPADDING', (0,1), (-1,-1), 8),
-    ]))
-    elements.append(t_terms)
-    elements.append(Spacer(1, 10*mm))
+    elements.extend(template.acceptance_story(total_width))
     
-    sig_data = [
-        ["SIGNED AT: _______________________", "DATE: ______________________________"],
-        ["", ""],
-        ["FULL NAME: _______________________", "DESIGNATION: _______________________"],
-        ["", ""],
-        ["SIGNATURE: _______________________", "STAMP:"] 
-    ]
-    
-    t_sig = Table(sig_data, colWidths=[total_width/2, total_width/2])
-    t_sig.setStyle(TableStyle([
-        ('FONTNAME', (0,0), (-1,-1), font_bold),
-        ('FONTSIZE', (0,0), (-1,-1), 10),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 10),
-    ]))
-    elements.append(t_sig)
-    elements.append(Spacer(1, 20*mm))
-    
-    
-    # Build
-    doc.build(elements, onFirstPage=draw_header_footer, onLaterPages=draw_header_footer)
-    print(f"PDF generated successfully: {output_path}")
+    return doc, elements, draw_header_footer
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--db':
+        # Bulk mode: quotations are read straight from the database.
+        from quotationDbSource import main as render_from_db
+        render_from_db(sys.argv[2:], prog='generateQuotationPDF.py --db')
+        sys.exit(0)
+
     if len(sys.argv) != 3:
-        print("Usage: python generateQuotationPDF.py <data_json> <output_pdf>")
+        print("Usage: python generateQuotationPDF.py <data_json|-> <output_pdf|->\n"
+              "       python generateQuotationPDF.py --db <output_dir> [--ids 1,2,3] [--sqlite PATH] (see --db --help)")
         sys.exit(1)
     
-    create_quotation_pdf(sys.argv[1], sys.argv[2])
\ No newline at end of file
+    try:
+        create_quotation_pdf(sys.argv[1], sys.argv[2],
+                             metrics=metrics_enabled(), profile_to=profile_dir())
+    except Exception as e:
+        print(f"Error generating PDF: {str(e)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Reader for the COPY blocks of a plain-text pg_dump file, such as
+complete_database_with_data.sql. Rows come back as dicts of text values
+(None for NULL), exactly as they appear in the dump.
+"""
+
+import os
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SQL_DUMP = os.path.join(BACKEND_DIR, '..', 'complete_database_with_data.sql')
+
+COPY_PREFIX = 'COPY public.'
+COPY_ESCAPES = {'t': '\t', 'n': '\n', 'r': '\r', '\\': '\\'}
+
+
+def copy_value(value):
+    """Decodes one field of a pg_dump COPY text row."""
+    if value == '\\N':
+        return None
+    if '\\' not in value:
+        return value
+    out, i = [], 0
+    while i < len(value):
+        if value[i] == '\\' and i + 1 < len(value):
+            out.append(COPY_ESCAPES.get(value[i + 1], value[i + 1]))
+            i += 2
+        else:
+            out.append(value[i])
+            i += 1
+    return ''.join(out)
+
+
+def _copy_header(line):
+    """(table, columns) for a COPY line, or None for any other line."""
+    if not line.startswith(COPY_PREFIX):
+        return None
+    name, _, rest = line[len(COPY_PREFIX):].partition(' (')
+    return name, [c.strip().strip('"') for c in rest.split(')')[0].split(',')]
+
+
+def iter_copy_rows(sql_path=SQL_DUMP, table=None):
+    """
+    Yields (table, row dict) for every COPY row in the dump, or only those
+    of one table. Streams the file, so memory stays flat for large dumps.
+    """
+    current = columns = None
+    with open(sql_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if current is None:
+                header = _copy_header(line)
+                if header:
+                    current, columns = header
+                continue
+            if line == '\\.':
+                current = None
+                continue
+            if table is None or current == table:
+                yield current, dict(zip(columns, map(copy_value, line.split('\t'))))
+
+
+def read_copy_tables(sql_path=SQL_DUMP):
+    """Returns {table: [row dict]} for every COPY block in a pg_dump file."""
+    tables = {}
+    for name, row in iter_copy_rows(sql_path):
+        tables.setdefault(name, []).append(row)
+    return tables
+
+
+def _create_table_name(line):
+    """Table name for a CREATE TABLE line, or None for any other line."""
+    prefix = 'CREATE TABLE public.'
+    if not line.startswith(prefix):
+        return None
+    return line[len(prefix):].split(' (')[0]
+
+
+def read_table_columns(sql_path=SQL_DUMP):
+    """
+    Returns {table: [(column, type)]} from the dump's CREATE TABLE
+    statements, with types as written (e.g. 'numeric(10,2)', 'timestamp
+    without time zone') and defaults and constraints left out.
+    """
+    tables = {}
+    current = None
+    with open(sql_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if current is None:
+                current = _create_table_name(line)
+                if current:
+                    tables[current] = []
+                continue
+            if line.startswith(')'):
+                current = None
+                continue
+            if line.startswith('CONSTRAINT '):
+                continue
+            name, _, rest = line.rstrip(',').partition(' ')
+            for end in (' DEFAULT ', ' NOT NULL'):
+                rest = rest.split(end)[0]
+            tables[current].append((name.strip('"'), rest))
+    return tables
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Precompiled asset bundle for fast cold starts.
+
+A fresh render process parses both Oswald TTFs, decodes and Flate-encodes
+the logo (full size, and downsampled for optimized output) and builds the
+style sheets before its first render. build_bundle() does that work once
+and saves the results to PDF_ASSET_BUNDLE; the asset registry (see
+quotationAssets.py) loads them from there instead of from the sources.
+
+The file is a JSON header line followed by the pickled assets. The header
+records the bundle format, the Python, ReportLab and Pillow versions, the
+path, size, mtime and SHA-256 of every source file, and the SHA-256 of the
+pickled part. load_bundle() returns None (and the registry falls back to
+the sources) if any of them no longer match, so a bundle is never stale,
+only unused. Rebuild it as part of each deploy, after the fonts and logo are
+in place. Since unpickling can run code, a bundle file that is group- or
+world-writable, or not owned by the user loading it, is refused too; keep
+PDF_ASSET_BUNDLE out of reach of anything untrusted.
+
+Usage: python3 quotationAssetBundle.py [output] [--check]
+"""
+
+import os
+import io
+import sys
+import json
+import stat
+import pickle
+import hashlib
+import argparse
+import platform
+from weakref import WeakKeyDictionary
+
+import PIL
+import reportlab
+from reportlab.lib.styles import StyleSheet1
+from reportlab.pdfbase.ttfonts import TTFont, TTFontFace
+
+from quotationAssets import SCRIPT_DIR, bundle_path, find_font_paths, find_logo_path, file_key
+
+# Bump whenever the pickled layout or anything it holds changes shape.
+BUNDLE_FORMAT = 1
+# Permission bits that let someone other than the owner rewrite a bundle.
+UNSAFE_MODE = stat.S_IWGRP | stat.S_IWOTH
+
+DEFAULT_BUNDLE_PATH = os.path.join(SCRIPT_DIR, '..', 'temp', 'quotation-assets.bundle')
+
+
+def environment():
+    """What the pickled assets depend on besides their source files."""
+    return {
+        'format': BUNDLE_FORMAT,
+        'python': platform.python_version(),
+        'reportlab': reportlab.Version,
+        'pillow': PIL.__version__,
+    }
+
+
+def source_record(path):
+    """[size, mtime_ns, sha256] of a source file."""
+    st = os.stat(path)
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return [st.st_size, st.st_mtime_ns, digest]
+
+
+def _restore_font(state):
+    font = TTFont.__new__(TTFont)
+    font.__dict__.update(state)
+    font.state = WeakKeyDictionary()
+    return font
+
+
+def _restore_face(state):
+    face = TTFontFace.__new__(TTFontFace)
+    face.__dict__.update(state)
+    # Same scaling TTFontFile sets up while reading the head table.
+    factor = 1000 / face.unitsPerEm
+    face._pdfScale = (lambda x: x) if face.unitsPerEm == 1000 else (lambda x: x * factor)
+    return face
+
+
+def _reduce_font(font):
+    # The per-document subset state is keyed by live documents.
+    state = {name: value for name, value in vars(font).items() if name != 'state'}
+    return _restore_font, (state,)
+
+
+def _reduce_face(face):
+    state = {name: value for name, value in vars(face).items() if name != '_pdfScale'}
+    return _restore_face, (state,)
+
+
+def dumps(assets):
+    """Pickles assets, including the TTFonts they hold."""
+    out = io.BytesIO()
+    pickler = pickle.Pickler(out, protocol=pickle.HIGHEST_PROTOCOL)
+    pickler.dispatch_table = {TTFont: _reduce_font, TTFontFace: _reduce_face}
+    pickler.dump(assets)
+    return out.getvalue()
+
+
+def collect_assets():
+    """
+    Loads every asset a default render needs, straight from the sources,
+    and returns (assets, source paths). The assets are a dict of
+    fonts: {(regular key, bold key): (regular TTFont, bold TTFont)},
+    images: {(path, fit, dpi): (file key, PreparedImage)},
+    stylesheet: ([styles], {alias: style name}) of the sample style sheet,
+    and styles: the registry's cached() entries, i.e. the QuotationStyles
+    for the default template colours.
+    """
+    from reportlab.pdfbase import pdfmetrics
+    from quotationAssets import ASSETS
+    from generateQuotationPDF import QuotationHeaderFooter, logo_dpi
+    from quotationTemplates import get_quotation_styles
+
+    ASSETS.use_bundle = False
+    ASSETS.clear()
+    regular_path, bold_path = find_font_paths()
+    logo_path = find_logo_path()
+    font_reg, font_bold = ASSETS.fonts()
+    get_quotation_styles(font_reg, font_bold)
+
+    fonts = {}
+    if regular_path and bold_path and font_reg == 'Oswald':
+        fonts[(file_key(regular_path), file_key(bold_path))] = (
+            pdfmetrics.getFont(font_reg), pdfmetrics.getFont(font_bold))
+    images = {}
+    if logo_path:
+        for fit, dpi in ((None, None), (QuotationHeaderFooter.LOGO_BOX, logo_dpi())):
+            image = ASSETS.image(logo_path, fit, dpi)
+            if image is not None:
+                images[(logo_path, fit, dpi)] = (file_key(logo_path), image)
+    stylesheet = ASSETS.stylesheet()
+    aliases = {alias: style.name for alias, style in stylesheet.byAlias.items()}
+
+    assets = {
+        'fonts': fonts,
+        'images': images,
+        'stylesheet': (list(stylesheet.byName.values()), aliases),
+        'styles': dict(ASSETS._cache),
+    }
+    sources = [path for path in (regular_path, bold_path, logo_path) if path]
+    return assets, sources
+
+
+def build_bundle(path):
+    """Writes the bundle to path (atomically) and returns its header."""
+    assets, sources = collect_assets()
+    body = dumps(assets)
+    header = dict(environment(),
+                  sources={source: source_record(source) for source in sources},
+                  body_sha256=hashlib.sha256(body).hexdigest())
+
+    path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        if hasattr(os, 'fchmod'):
+            # read_header() refuses a bundle others can write to, whatever the umask.
+            os.fchmod(f.fileno(), stat.S_IMODE(os.fstat(f.fileno()).st_mode) & ~UNSAFE_MODE)
+        f.write(json.dumps(header, sort_keys=True).encode('utf-8') + b'\n')
+        f.write(body)
+    os.replace(tmp_path, path)
+    return header
+
+
+def unsafe_reason(st):
+    """Why a bundle file with os.stat() result st can't be trusted, or None if it can."""
+    if st.st_mode & UNSAFE_MODE:
+        return "file is group- or world-writable"
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        return f"file is owned by uid {st.st_uid}, not {os.getuid()}"
+    return None
+
+
+def read_header(path):
+    """
+    (header, body bytes) of a bundle file; raises ValueError if it is
+    malformed or fails unsafe_reason().
+    """
+    with open(path, 'rb') as f:
+        reason = unsafe_reason(os.fstat(f.fileno()))
+        if reason:
+            raise ValueError(reason)
+        header = json.loads(f.readline())
+        body = f.read()
+    if not isinstance(header, dict):
+        raise ValueError("bundle header is not an object")
+    return header, body
+
+
+def stale_reason(header, body):
+    """Why a bundle can't be used here, or None if it can."""
+    current = environment()
+    for name, value in current.items():
+        if header.get(name) != value:
+            return f"built for {name} {header.get(name)}, running {value}"
+    if hashlib.sha256(body).hexdigest() != header.get('body_sha256'):
+        return "checksum mismatch"
+    for source, record in header.get('sources', {}).items():
+        try:
+            if source_record(source) != record:
+                return f"{source} changed since the bundle was built"
+        except OSError:
+            return f"{source} is missing"
+    return None
+
+
+def load_bundle(path):
+    """
+    The assets dict saved at path (see collect_assets), or None if there is
+    no bundle there or it is stale; a stale bundle is reported on stderr.
+    """
+    try:
+        header, body = read_header(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ignoring asset bundle {path}: {e}", file=sys.stderr)
+        return None
+    reason = stale_reason(header, body)
+    if reason:
+        print(f"Ignoring asset bundle {path}: {reason}", file=sys.stderr)
+        return None
+    try:
+        assets = pickle.loads(body)
+    except Exception as e:
+        print(f"Ignoring asset bundle {path}: {e}", file=sys.stderr)
+        return None
+    assets['stylesheet'] = _stylesheet(*assets['stylesheet'])
+    return assets
+
+
+def _stylesheet(styles, aliases):
+    # StyleSheet1 itself does not survive a pickle round trip.
+    names = {name: alias for alias, name in aliases.items()}
+    stylesheet = StyleSheet1()
+    for style in styles:
+        stylesheet.add(style, alias=names.get(style.name))
+    return stylesheet
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precompiled quotation asset bundle")
+    parser.add_argument('output', nargs='?',
+                        help="Bundle path (default: PDF_ASSET_BUNDLE, else temp/quotation-assets.bundle)")
+    parser.add_argument('--check', action='store_true',
+                        help="Only report whether the existing bundle is usable (exit status 1 if not)")
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.output or bundle_path() or DEFAULT_BUNDLE_PATH)
+    if args.check:
+        try:
+            header, body = read_header(path)
+            reason = stale_reason(header, body)
+        except (OSError, ValueError) as e:
+            reason = str(e)
+        if reason:
+            raise SystemExit(f"Asset bundle {path} is not usable: {reason}")
+        print(f"Asset bundle {path} is up to date")
+        return
+
+    header = build_bundle(path)
+    size = os.path.getsize(path)
+    print(f"Asset bundle written to {path} ({size} bytes, {len(header['sources'])} sources)")
+
+
+if __name__ == '__main__':
+    # Through the importable module, so the pickle names its functions rather than __main__'s.
+    import quotationAssetBundle
+    quotationAssetBundle.main()
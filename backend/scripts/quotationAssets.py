@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Process-wide registry of the assets every quotation render needs.
+
+Fonts, the logo and the base stylesheet are resolved and decoded once per
+process and handed to every render. File-backed assets are keyed by path
+plus mtime, so replacing a font or the logo on disk is picked up on the
+next render without restarting a long-lived worker.
+
+With PDF_ASSET_BUNDLE set, a fresh process takes its fonts, logo and styles
+from the precompiled bundle at that path (see quotationAssetBundle.py)
+instead of parsing and encoding the sources, for every asset whose source
+file is still the one the bundle was built from.
+"""
+
+import os
+import copy
+import zlib
+import hashlib
+from contextlib import contextmanager
+
+from PIL import Image
+
+from reportlab import rl_config
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.utils import ImageReader
+from reportlab.lib.boxstuff import aspectRatioFix
+from reportlab.pdfbase import pdfmetrics, pdfdoc
+from reportlab.pdfbase.ttfonts import TTFont
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def find_font_paths():
+    """
+    Returns (regular, bold) paths of the Oswald TTFs, or (None, None).
+    """
+    font_dirs = [
+        os.path.join(SCRIPT_DIR, '..', 'fonts'),
+        os.path.join(SCRIPT_DIR, 'fonts'),
+        os.path.join(SCRIPT_DIR, 'assets', 'fonts'),
+    ]
+
+    for d in font_dirs:
+        r_path = os.path.join(d, 'Oswald-Regular.ttf')
+        b_path = os.path.join(d, 'Oswald-Bold.ttf')
+        if os.path.exists(r_path) and os.path.exists(b_path):
+            return r_path, b_path
+    return None, None
+
+
+def find_logo_path():
+    """
+    Returns the first scarybyte-logo.png found next to the scripts, or None.
+    """
+    possible_paths = [
+        os.path.join(SCRIPT_DIR, '..', 'logos', 'scarybyte-logo.png'),
+        os.path.join(SCRIPT_DIR, 'logos', 'scarybyte-logo.png'),
+        os.path.join(SCRIPT_DIR, 'scarybyte-logo.png'),
+    ]
+    for path in possible_paths:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def bundle_path():
+    """PDF_ASSET_BUNDLE, or None when the asset bundle is turned off (unset or empty)."""
+    return os.environ.get('PDF_ASSET_BUNDLE') or None
+
+
+def file_key(path):
+    """(path, mtime) identity of a file, or None if it is missing."""
+    if not path:
+        return None
+    try:
+        return path, os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+@contextmanager
+def binary_streams():
+    """
+    Writes PDF streams as plain Flate while active. ReportLab is configured
+    to wrap every compressed stream in ASCII85 as well, which keeps the file
+    7-bit clean at the cost of a quarter more bytes per stream.
+    """
+    previous = rl_config.useA85
+    rl_config.useA85 = 0
+    try:
+        yield
+    finally:
+        rl_config.useA85 = previous
+
+
+def fitted_pixels(image_size, box, dpi):
+    """
+    Pixel size of an image drawn into box (width, height in points) with its
+    aspect ratio kept, at dpi. Never larger than the image itself.
+    """
+    width, height = image_size
+    scale = min(box[0] / width, box[1] / height) * dpi / 72
+    if scale >= 1:
+        return width, height
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _recompress(xobject):
+    """Flate-encodes an image XObject's pixels again at the best compression level."""
+    xobject.streamContent = zlib.compress(zlib.decompress(xobject.streamContent), 9)
+
+
+class PreparedImage:
+    """
+    An image decoded and Flate-encoded once, then registered into each
+    document as a ready-made image XObject instead of re-encoding it.
+
+    Given fit (a box in points) and dpi, the image is downsampled to what
+    that box can show at dpi and stored as binary Flate at the best level,
+    for output-optimized renders; otherwise it is embedded as is.
+    """
+
+    def __init__(self, path, fit=None, dpi=None):
+        self.path = path
+        # XObject names end up as PDF names, so keep them to hex characters.
+        identity = f"{path}:{os.stat(path).st_mtime_ns}:{fit}:{dpi}".encode('utf-8')
+        self.name = 'QuotationImage' + hashlib.md5(identity).hexdigest()
+        if fit is None:
+            self._image = pdfdoc.PDFImageXObject(self.name, ImageReader(path), mask='auto')
+        else:
+            with Image.open(path) as source:
+                source.load()
+                size = fitted_pixels(source.size, fit, dpi)
+                # Area averaging: logos are flat artwork, and sharper filters
+                # ring around edges into colours that Flate compresses badly.
+                resized = source if size == source.size else source.resize(size, Image.BOX)
+                with binary_streams():
+                    self._image = pdfdoc.PDFImageXObject(self.name, ImageReader(resized), mask='auto')
+        self._smask = getattr(self._image, '_smask', None)
+        if self._smask is not None:
+            del self._image._smask
+        if fit is not None:
+            _recompress(self._image)
+            if self._smask is not None:
+                _recompress(self._smask)
+        self.width = self._image.width
+        self.height = self._image.height
+
+    def _register(self, canvas):
+        doc = canvas._doc
+        reg_name = doc.getXObjectName(self.name)
+        if not doc.idToObject.get(reg_name):
+            image = copy.copy(self._image)
+            canvas._setXObjects(image)
+            doc.Reference(image, reg_name)
+            doc.addForm(self.name, image)
+            if self._smask is not None:
+                smask = copy.copy(self._smask)
+                canvas._setXObjects(smask)
+                image.smask = doc.Reference(smask, doc.getXObjectName(smask.name))
+        return reg_name
+
+    def draw(self, canvas, x, y, width, height, preserveAspectRatio=True, anchor='c'):
+        """Same placement rules as canvas.drawImage."""
+        reg_name = self._register(canvas)
+        canvas._currentPageHasImages = 1
+        x, y, width, height, _ = aspectRatioFix(preserveAspectRatio, anchor, x, y, width, height,
+                                                self.width, self.height)
+        canvas.saveState()
+        canvas.translate(x, y)
+        canvas.scale(width, height)
+        canvas._code.append(f"/{reg_name} Do")
+        canvas.restoreState()
+        canvas._formsinuse.append(self.name)
+
+
+class AssetRegistry:
+    """Resolves fonts, logo and styles once per process and shares them across renders."""
+
+    def __init__(self, use_bundle=True):
+        self.use_bundle = use_bundle
+        self.clear()
+
+    def clear(self):
+        """Forgets everything, so the next render loads its assets from scratch."""
+        self._bundle = None
+        self._bundle_loaded = False
+        self._fonts_key = None
+        self._fonts = None
+        self._stylesheet = None
+        self._cache = {}
+        self._versioned = {}
+
+    def fonts(self):
+        """(regular, bold) font names; the TTFs are parsed again only if they change on disk."""
+        regular_font_path, bold_font_path = find_font_paths()
+        key = (file_key(regular_font_path), file_key(bold_font_path))
+        if self._fonts is None or key != self._fonts_key:
+            bundle = self.bundle()
+            fonts = bundle['fonts'].get(key) if bundle else None
+            self._fonts = self._register_fonts(regular_font_path, bold_font_path, fonts)
+            self._fonts_key = key
+            # Styles embed font names, so they go stale with the fonts.
+            self._cache.clear()
+            if bundle:
+                self._cache.update(bundle['styles'])
+        return self._fonts
+
+    @staticmethod
+    def _register_fonts(regular_font_path, bold_font_path, fonts=None):
+        try:
+            if fonts:
+                for font in fonts:
+                    pdfmetrics.registerFont(font)
+                return 'Oswald', 'Oswald-Bold'
+            if regular_font_path and bold_font_path:
+                pdfmetrics.registerFont(TTFont('Oswald', regular_font_path))
+                pdfmetrics.registerFont(TTFont('Oswald-Bold', bold_font_path))
+                return 'Oswald', 'Oswald-Bold'
+            else:
+                pdfmetrics.registerFont(pdfmetrics.getFont('Helvetica'))
+                pdfmetrics.registerFont(pdfmetrics.getFont('Helvetica-Bold'))
+                return 'Helvetica', 'Helvetica-Bold'
+        except Exception:
+            return 'Helvetica', 'Helvetica-Bold'
+
+    def image(self, path, fit=None, dpi=None):
+        """
+        A PreparedImage for path, re-read when the file changes; None if it
+        is missing or unreadable. fit and dpi ask for a downsampled copy
+        (see PreparedImage), cached separately from the full-size one.
+        """
+        key = file_key(path)
+        if key is None:
+            return None
+
+        def prepare():
+            bundle = self.bundle()
+            bundled = bundle['images'].get((path, fit, dpi)) if bundle else None
+            if bundled and bundled[0] == key:
+                return bundled[1]
+            try:
+                return PreparedImage(path, fit, dpi)
+            except Exception:
+                return None
+        return self.versioned(('image', path, fit, dpi), key, prepare)
+
+    def logo(self):
+        """The PreparedImage for the default logo, or None if there is no usable logo."""
+        return self.image(find_logo_path())
+
+    def stylesheet(self):
+        """Shared getSampleStyleSheet(); treat it as read-only."""
+        if self._stylesheet is None:
+            bundle = self.bundle()
+            self._stylesheet = bundle['stylesheet'] if bundle else getSampleStyleSheet()
+        return self._stylesheet
+
+    def bundle(self):
+        """
+        The precompiled assets from PDF_ASSET_BUNDLE, loaded on first use;
+        None if it is off, missing or stale.
+        """
+        if not self._bundle_loaded:
+            self._bundle_loaded = True
+            path = bundle_path()
+            if self.use_bundle and path:
+                from quotationAssetBundle import load_bundle
+                self._bundle = load_bundle(path)
+        return self._bundle
+
+    def cached(self, key, factory):
+        """Returns factory() memoized under key until the fonts change."""
+        try:
+            return self._cache[key]
+        except KeyError:
+            value = self._cache[key] = factory()
+            return value
+
+    def versioned(self, key, version, factory):
+        """
+        Returns factory() memoized under key, rebuilt only when version
+        differs from the one it was built for. Other keys are untouched.
+        """
+        entry = self._versioned.get(key)
+        if entry is None or entry[0] != version:
+            entry = self._versioned[key] = (version, factory())
+        return entry[1]
+
+
+ASSETS = AssetRegistry()
+
+
+def register_custom_fonts():
+    """
+    Attempts to register Oswald-Regular and Oswald-Bold.
+    Falls back to Helvetica if files are not found.
+    """
+    return ASSETS.fonts()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Database source for bulk quotation renders.
+
+Runs the same quotation/client/primary contact/user/template JOIN as the
+GET /api/quotations/:id/pdf route and streams the rows straight into
+rendering, skipping the Node round trip (db.query -> JSON.stringify ->
+temp file -> json.load) per quotation. Values are normalized to what the
+route hands the renderer after JSON encoding: timestamps as ISO strings in
+UTC, numerics as strings, items already decoded.
+
+PostgresSource reads from a server-side (named) cursor, itersize rows per
+round trip, on a connection borrowed from a small psycopg2 pool configured
+from the same DB_* variables as config/database.js. SqliteSource runs the
+query against a SQLite stand-in with the same schema, built from
+complete_database_with_data.sql by build_sqlite_standin(), for testing
+without a Postgres server.
+
+Usage: python3 generateQuotationPDF.py --db <output_dir> [--ids 1,2,3]
+           [--sqlite PATH [--load-dump [SQL]]] [--workers N] [--summary PATH]
+"""
+
+import os
+import sys
+import json
+import uuid
+import sqlite3
+import argparse
+from decimal import Decimal
+from datetime import date, datetime, timezone
+
+try:
+    import psycopg2
+    import psycopg2.pool
+    import psycopg2.extras
+except ImportError:  # only needed for Postgres; the SQLite stand-in works without it
+    psycopg2 = None
+
+from pgDumpReader import SQL_DUMP, iter_copy_rows, read_table_columns
+from batchRenderQuotations import render_batch, write_summary
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_ITERSIZE = 200
+
+# The GET /api/quotations/:id/pdf query (routes/quotations.js), minus its
+# WHERE clause. {contact_name} is the one expression the dialects spell
+# differently: Postgres CONCAT skips NULLs, so it never returns NULL.
+ROUTE_QUERY = """
+SELECT q.*,
+       c.name as client_name,
+       c.email as client_email,
+       c.phone as client_phone,
+       c.company as client_company,
+       c.address as client_address,
+       c.city as client_city,
+       c.country as client_country,
+       COALESCE({contact_name}, c.name) as primary_contact_name,
+       COALESCE(pc.email, c.email) as primary_contact_email,
+       COALESCE(pc.phone, c.phone) as primary_contact_phone,
+       pc.position as primary_contact_position,
+       u.full_name as created_by_name,
+       u.email as created_by_email,
+       t.name as template_name,
+       t.company_name,
+       t.company_tagline,
+       t.company_address,
+       t.company_phone,
+       t.company_email,
+       t.company_website,
+       t.company_reg_number,
+       t.company_vat_number,
+       t.primary_color,
+       t.secondary_color,
+       t.accent_color,
+       t.show_logo,
+       t.show_tagline,
+       t.show_client_info,
+       t.show_description,
+       t.show_terms,
+       t.show_signature,
+       t.default_terms,
+       t.default_notes,
+       t.vat_rate,
+       t.logo_url,
+       t.updated_at as template_updated_at
+FROM quotations q
+LEFT JOIN clients c ON q.client_id = c.id
+LEFT JOIN contacts pc ON c.id = pc.client_id AND pc.is_primary = true
+LEFT JOIN users u ON q.created_by = u.id
+LEFT JOIN quotation_templates t ON q.template_id = t.id
+"""
+POSTGRES_CONTACT_NAME = "CONCAT(pc.first_name, ' ', pc.last_name)"
+SQLITE_CONTACT_NAME = "COALESCE(pc.first_name, '') || ' ' || COALESCE(pc.last_name, '')"
+
+
+def route_value(value):
+    """A column value as node-postgres renders it once the row is JSON-encoded."""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return f"{value:%Y-%m-%dT%H:%M:%S}.{value.microsecond // 1000:03d}Z"
+    if isinstance(value, date):
+        return f"{value.isoformat()}T00:00:00.000Z"
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def route_payload(row):
+    return {name: route_value(value) for name, value in row.items()}
+
+
+class QuotationSource:
+    """
+    Mixin that streams route payloads for quotations, in id order, from the
+    rows(ids) generator of the class it is mixed into.
+    """
+
+    def payloads(self, ids=None):
+        for row in self.rows(ids):
+            yield route_payload(row)
+
+    def records(self, ids=None):
+        """(source, payload, error) records, as batchRenderQuotations.render_batch takes them."""
+        for payload in self.payloads(ids):
+            yield f"quotations.id={payload.get('id')}", payload, None
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def connection_settings():
+    """psycopg2 connect() arguments from the DB_* variables, defaulted like config/database.js."""
+    settings = {
+        'user': os.environ.get('DB_USER', 'postgres'),
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'dbname': os.environ.get('DB_NAME', 'crm_db'),
+        'password': os.environ.get('DB_PASSWORD', 'postgres'),
+        'port': int(os.environ.get('DB_PORT') or 5432),
+    }
+    if os.environ.get('NODE_ENV') == 'production':
+        settings['sslmode'] = 'require'
+    return settings
+
+
+class PostgresSource(QuotationSource):
+    """Route payloads from PostgreSQL through a pooled connection and a server-side cursor."""
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, itersize=DEFAULT_ITERSIZE, **settings):
+        if psycopg2 is None:
+            raise RuntimeError("Reading quotations from PostgreSQL needs psycopg2 (pip install psycopg2-binary)")
+        self.itersize = itersize
+        self.pool = psycopg2.pool.ThreadedConnectionPool(1, pool_size, **(settings or connection_settings()))
+
+    def rows(self, ids=None):
+        query = ROUTE_QUERY.format(contact_name=POSTGRES_CONTACT_NAME)
+        params = ()
+        if ids is not None:
+            query += "WHERE q.id = ANY(%s)\n"
+            params = (list(ids),)
+        query += "ORDER BY q.id"
+
+        conn = self.pool.getconn()
+        try:
+            # A named cursor lives on the server; rows arrive itersize at a time.
+            name = f"quotation_pdf_{uuid.uuid4().hex}"
+            with conn.cursor(name=name, cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.itersize = self.itersize
+                cursor.execute(query, params)
+                for row in cursor:
+                    yield dict(row)
+        finally:
+            conn.rollback()
+            self.pool.putconn(conn)
+
+    def close(self):
+        self.pool.closeall()
+
+
+# Declared types of the SQLite stand-in's columns. Each converts back to
+# the Python type psycopg2 returns for the Postgres column, so both
+# sources go through the same route_value().
+STANDIN_TYPES = {
+    'boolean': 'PG_BOOLEAN',
+    'date': 'PG_DATE',
+    'json': 'PG_JSONB',
+    'jsonb': 'PG_JSONB',
+    'numeric': 'PG_NUMERIC_TEXT',   # TEXT affinity keeps '15.00' as written
+    'timestamp': 'PG_TIMESTAMP',
+    'integer': 'INTEGER',
+    'bigint': 'INTEGER',
+    'smallint': 'INTEGER',
+}
+
+sqlite3.register_converter('PG_BOOLEAN', lambda value: value not in (b'0', b'f'))
+sqlite3.register_converter('PG_DATE', lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter('PG_JSONB', json.loads)
+sqlite3.register_converter('PG_NUMERIC_TEXT', lambda value: Decimal(value.decode()))
+sqlite3.register_converter('PG_TIMESTAMP', lambda value: datetime.fromisoformat(value.decode()))
+
+
+def standin_type(pg_type):
+    return STANDIN_TYPES.get(pg_type.split('(')[0].split(' ')[0], 'TEXT')
+
+
+def build_sqlite_standin(db_path, sql_path=SQL_DUMP):
+    """
+    (Re)creates db_path as a SQLite copy of the dump: every table, with the
+    dump's columns and their data. Written to a temp file and moved into
+    place, so a reader never sees a half-built database.
+    """
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.unlink(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        tables = read_table_columns(sql_path)
+        for table, columns in tables.items():
+            definition = ', '.join(f'"{name}" {standin_type(pg_type)}' for name, pg_type in columns)
+            conn.execute(f'CREATE TABLE "{table}" ({definition})')
+        booleans = {table: {name for name, pg_type in columns if pg_type == 'boolean'}
+                    for table, columns in tables.items()}
+        for table, row in iter_copy_rows(sql_path):
+            for name in booleans.get(table, ()):
+                if row.get(name) is not None:
+                    row[name] = 1 if row[name] == 't' else 0
+            names = ', '.join(f'"{name}"' for name in row)
+            marks = ', '.join('?' for _ in row)
+            conn.execute(f'INSERT INTO "{table}" ({names}) VALUES ({marks})', list(row.values()))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+
+
+class SqliteSource(QuotationSource):
+    """Route payloads from a SQLite stand-in built by build_sqlite_standin()."""
+
+    def __init__(self, db_path, itersize=DEFAULT_ITERSIZE):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"No SQLite stand-in at {db_path} (build one with --load-dump)")
+        self.itersize = itersize
+        self.conn = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+        self.conn.row_factory = sqlite3.Row
+
+    def rows(self, ids=None):
+        query = ROUTE_QUERY.format(contact_name=SQLITE_CONTACT_NAME)
+        params = []
+        if ids is not None:
+            params = list(ids)
+            query += f"WHERE q.id IN ({', '.join('?' for _ in params)})\n"
+        query += "ORDER BY q.id"
+
+        cursor = self.conn.execute(query, params)
+        try:
+            while True:
+                batch = cursor.fetchmany(self.itersize)
+                if not batch:
+                    return
+                for row in batch:
+                    yield dict(row)
+        finally:
+            cursor.close()
+
+    def close(self):
+        self.conn.close()
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Render quotation PDFs straight from the database")
+    parser.add_argument('output_dir', help="Directory the PDFs are written to")
+    parser.add_argument('--ids', help="Comma-separated quotation ids (default: every quotation)")
+    parser.add_argument('--sqlite', help="Read from this SQLite stand-in instead of PostgreSQL")
+    parser.add_argument('--load-dump', nargs='?', const=SQL_DUMP, metavar='SQL',
+                        help="Build the --sqlite stand-in from a pg_dump file first (default: %(const)s)")
+    parser.add_argument('--itersize', type=int, default=DEFAULT_ITERSIZE,
+                        help="Rows fetched per round trip (default: %(default)s)")
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE,
+                        help="Most PostgreSQL connections held (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes to render with (default: 1, 0 = one per CPU)")
+    parser.add_argument('--summary', help="Summary JSON path (default: <output_dir>/summary.json)")
+    args = parser.parse_args(argv)
+
+    if args.load_dump and not args.sqlite:
+        parser.error("--load-dump needs --sqlite")
+    if not args.sqlite and psycopg2 is None:
+        parser.error("reading from PostgreSQL needs psycopg2 (pip install psycopg2-binary); "
+                     "use --sqlite for the stand-in")
+    ids = [int(i) for i in args.ids.split(',')] if args.ids else None
+
+    if args.sqlite:
+        if args.load_dump:
+            build_sqlite_standin(args.sqlite, args.load_dump)
+        source = SqliteSource(args.sqlite, itersize=args.itersize)
+    else:
+        source = PostgresSource(pool_size=args.pool_size, itersize=args.itersize)
+
+    workers = args.workers or os.cpu_count() or 1
+    with source:
+        summary = render_batch(source.records(ids), args.output_dir, workers=workers)
+    summary_path = args.summary or os.path.join(args.output_dir, 'summary.json')
+    write_summary(summary, summary_path)
+
+    print(f"Rendered {summary['succeeded']}/{summary['total']} quotations "
+          f"in {summary['elapsed_ms'] / 1000:.1f}s, summary: {summary_path}")
+    if summary['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Itemized costs table for quotations, laid out in page-sized chunks.
+
+A single platypus Table re-measures every remaining row each time it is
+split across a page, so layout time grows quadratically with the number
+of line items, and holding every row's Paragraph at once makes memory
+grow with it too. ItemsTable instead pulls rows from the items as the
+pages need them, measures each once, builds a Table for only the rows
+that fit on the current page and carries a running subtotal forward, so
+time is linear and memory flat. Each chunk repeats the title and
+column headers. Chunks after the first open with the subtotal brought
+forward, and every chunk but the last closes with the subtotal carried
+forward.
+"""
+
+from collections import deque
+
+from reportlab.lib import colors
+from reportlab.platypus import Table, TableStyle
+from reportlab.platypus.flowables import Flowable
+
+from quotationPricing import ZERO, format_money, format_quantity
+from quotationParagraphCache import PARAGRAPHS
+
+TITLE = "ITEMIZED COSTS"
+CONTINUED_TITLE = "ITEMIZED COSTS (CONTINUED)"
+COLUMN_HEADERS = ["DESCRIPTION", "QTY", "UNIT PRICE", "AMOUNT"]
+BROUGHT_FORWARD = "Subtotal brought forward"
+CARRIED_FORWARD = "Subtotal carried forward"
+CARRY_BG = colors.HexColor('#F2F2F2')
+
+# Cell padding the items TableStyle gives data rows (see QuotationStyles.items_table).
+CELL_PADDING_X = 6 + 6
+CELL_PADDING_Y = 8 + 8
+# Height of a one-line plain string cell at the default Table font size.
+STRING_CELL_HEIGHT = 10 * 1.2
+
+
+class ItemRows:
+    """
+    Line items measured and handed out page by page.
+    Rows are built from the items only when pagination reaches them, and a
+    row's cells are released once its chunk has been drawn, so a document
+    holds about one page of item flowables whatever its length. Chunks are
+    taken in order, by the ItemsTable that wraps this.
+    items are quotationModel LineItems, from any iterable; count is its
+    length, taken from items when it has one.
+    """
+
+    def __init__(self, items, styles, col_widths, count=None):
+        self.styles = styles
+        self.col_widths = col_widths
+        if count is None and hasattr(items, '__len__'):
+            count = len(items)
+        self.count = count
+        self._source = iter(items)
+        self.exhausted = False
+        self.buffer = deque()        # measured rows not yet placed: (cells, height, line total)
+        self.buffered_height = 0
+        self.placed = 0              # rows handed out in chunks so far
+        self.subtotal = ZERO         # sum of their line totals
+
+        # Title, column header and carry rows are single-line strings, so
+        # one measurement covers every chunk.
+        probe = Table([[TITLE, "", "", ""], COLUMN_HEADERS, [CARRIED_FORWARD, "", "", ""]],
+                      colWidths=col_widths)
+        probe.setStyle(styles.items_table)
+        probe.wrap(sum(col_widths), 1 << 20)
+        self.title_height, self.header_height, self.carry_height = probe._rowHeights
+
+    def measure(self, item):
+        """The cells of one LineItem and the height of its table row."""
+        styles = self.styles
+        name = item.name or 'Item'
+        desc = item.description
+
+        desc_txt = f"<font fontName='{styles.font_bold}'>{name}</font>"
+        if desc:
+            desc_txt += f"<br/><font fontName='{styles.font_reg}' color='grey' size=8>{desc}</font>"
+
+        # Catalogue items repeat across quotations; reuse their parsed, wrapped paragraphs.
+        paragraph, h = PARAGRAPHS.wrapped(desc_txt, styles.normal_style,
+                                          self.col_widths[0] - CELL_PADDING_X)
+        cells = [
+            paragraph,
+            format_quantity(item.quantity),
+            format_money(item.price),
+            format_money(item.total)
+        ]
+        return cells, max(h, STRING_CELL_HEIGHT) + CELL_PADDING_Y
+
+    def _fill(self, height):
+        """Measures rows until more than height of them is buffered or the items run out."""
+        while self.buffered_height <= height and not self.exhausted:
+            try:
+                item = next(self._source)
+            except StopIteration:
+                self.exhausted = True
+                break
+            cells, row_height = self.measure(item)
+            self.buffer.append((cells, row_height, item.total))
+            self.buffered_height += row_height
+
+    @property
+    def done(self):
+        return self.exhausted and not self.buffer
+
+    def head_height(self):
+        """Height of a chunk's title, headers and (after the first) brought-forward row."""
+        height = self.title_height + self.header_height
+        if self.placed:
+            height += self.carry_height
+        return height
+
+    def remaining_height(self, avail_height):
+        """
+        Height of one chunk holding every row not yet placed, once the items
+        have run out; until then a lower bound that exceeds avail_height.
+        """
+        self._fill(avail_height)
+        return self.head_height() + self.buffered_height
+
+    def fit(self, avail_height):
+        """How many of the next rows fit in avail_height as one chunk (0 if none do)."""
+        self._fill(avail_height)
+        head = self.head_height()
+        if self.exhausted and head + self.buffered_height <= avail_height:
+            return len(self.buffer)
+        # Not the last chunk: leave room for the carried-forward row.
+        limit = avail_height - head - self.carry_height
+        used = fitted = 0
+        for _, row_height, _ in self.buffer:
+            if used + row_height > limit:
+                break
+            used += row_height
+            fitted += 1
+        if self.exhausted:
+            fitted = min(fitted, len(self.buffer) - 1)
+        return fitted
+
+    def _carry_row(self, label, amount):
+        return [label, "", "", format_money(amount)]
+
+    def take(self, n):
+        """A Table of the next n rows plus title, headers and carry rows."""
+        data = [[CONTINUED_TITLE if self.placed else TITLE, "", "", ""], COLUMN_HEADERS]
+        heights = [self.title_height, self.header_height]
+        carry_rows = []
+        if self.placed:
+            carry_rows.append(len(data))
+            data.append(self._carry_row(BROUGHT_FORWARD, self.subtotal))
+            heights.append(self.carry_height)
+        for _ in range(n):
+            cells, row_height, total_line = self.buffer.popleft()
+            data.append(cells)
+            heights.append(row_height)
+            self.buffered_height -= row_height
+            self.subtotal += total_line
+        self.placed += n
+        if not self.done:
+            carry_rows.append(len(data))
+            data.append(self._carry_row(CARRIED_FORWARD, self.subtotal))
+            heights.append(self.carry_height)
+
+        table = Table(data, colWidths=self.col_widths, rowHeights=heights)
+        table.setStyle(self.styles.items_table)
+        if carry_rows:
+            commands = []
+            for row in carry_rows:
+                commands.extend([
+                    ('SPAN', (0, row), (2, row)),
+                    ('BACKGROUND', (0, row), (-1, row), CARRY_BG),
+                    ('FONTNAME', (0, row), (-1, row), self.styles.font_bold),
+                ])
+            table.setStyle(TableStyle(commands))
+        return table
+
+
+class ItemsTable(Flowable):
+    """
+    Flowable for the rows of an ItemRows not placed yet. Each split measures
+    and builds only the rows that land on the current page.
+    """
+
+    def __init__(self, rows):
+        Flowable.__init__(self)
+        # Tables centre themselves in the frame; match them so chunks line up.
+        self.hAlign = 'CENTER'
+        self.rows = rows
+        self._table = None
+
+    def wrap(self, availWidth, availHeight):
+        self.width = sum(self.rows.col_widths)
+        self.height = self.rows.remaining_height(availHeight)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        fitted = self.rows.fit(availHeight)
+        if not fitted:
+            return []
+        chunk = self.rows.take(fitted)
+        if self.rows.done:
+            return [chunk]
+        return [chunk, ItemsTable(self.rows)]
+
+    def draw(self):
+        if self._table is None:
+            self._table = self.rows.take(len(self.rows.buffer))
+            self._table.wrap(self.width, self.height)
+        self._table.drawOn(self.canv, 0, 0)
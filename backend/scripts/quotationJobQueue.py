@@ -0,0 +1,623 @@
+#!/usr/bin/env python3
+"""
+Quotation PDF Job Queue
+A durable, SQLite-backed queue of quotation renders and the workers that
+drain it, so a burst of PDF requests is accepted at once and rendered at
+the pace the machine allows instead of holding HTTP requests open.
+
+Jobs carry the same payload the /api/quotations/:id/pdf route builds. A
+job is queued -> running -> done, and its PDF lands in the output store as
+<output_dir>/<job id>.pdf. Each attempt renders into its own staging file
+beside it, which complete() renames into place only while the worker still
+holds the job, so a worker that lost its lease can't overwrite the PDF of
+the worker that took the job over. A job whose render fails is retried
+after an exponential backoff, up to --max-attempts times, and then
+dead-lettered; a payload that is itself invalid (parse_quotation raises
+QuotationError) goes straight to dead, since rendering it again can't
+succeed. A worker renews its job's lease from a heartbeat thread while it
+renders, so a long render keeps its job; a worker that dies mid-render
+stops renewing, loses the lease after --lease seconds and the job is
+handed to another worker (or dead-lettered if it has no attempts left).
+Dead jobs stay in the queue for inspection until requeued or pruned.
+
+Submitting a job id that is already queued replaces its payload and keeps
+its place, and a done or dead one is queued again. Resubmitting a running
+job stores the new payload and marks the job resubmitted; when the
+render in progress (of the old payload) ends, the job is queued again
+instead of being marked done, so a poller never sees done with stale
+content. So repeated requests for one quotation collapse into one render
+of its latest payload.
+
+Usage:
+  python3 quotationJobQueue.py --db PATH submit <data_json|-> [--id ID] [--max-attempts N]
+  python3 quotationJobQueue.py --db PATH status <id>
+  python3 quotationJobQueue.py --db PATH work [--workers N] [--drain] [--max-jobs N]
+                                              [--output-dir DIR] [--cache-dir DIR]
+  python3 quotationJobQueue.py --db PATH stats | dead [--limit N] | requeue <id>
+  python3 quotationJobQueue.py --db PATH prune --older-than SECONDS
+
+--db defaults to $PDF_JOB_QUEUE_DB and the output store to a pdfs/
+directory next to it ($PDF_JOB_OUTPUT_DIR). status prints the absolute
+output_path of a done job and exits with NO_JOB_EXIT for an unknown id.
+The API submits and polls jobs through this CLI
+(services/quotationJobs.js); run the workers with npm run pdf-job-workers.
+"""
+
+import sys
+import os
+import io
+import re
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+from generateQuotationPDF import load_quotation_data, render_quotation_pdf
+from quotationModel import QuotationError
+from quotationPdfCache import PdfCache, DEFAULT_MAX_BYTES, atomic_write
+from quotationRenderServer import warm_up, DEFAULT_MAX_JOBS
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_LEASE_S = 120.0
+DEFAULT_POLL_S = 0.05
+RETRY_BASE_S = 1.0
+RETRY_MAX_S = 60.0
+# A worker that rendered --max-jobs exits with this code so the supervisor starts a fresh one.
+RECYCLE_EXIT = 75
+# status exits with this code for an unknown job id, so callers can tell it from a failure.
+NO_JOB_EXIT = 66
+# A worker that fails within this many seconds of starting failed at start-up;
+# it is restarted after a backoff, and the supervisor gives up after
+# MAX_STARTUP_FAILURES of those in a row.
+STARTUP_GRACE_S = 5.0
+MAX_STARTUP_FAILURES = 5
+
+# Failures caused by the payload itself (parse_quotation rejecting it);
+# retrying them can't help. Anything else, renderer bugs included, is retried.
+PERMANENT_ERRORS = (QuotationError,)
+
+JOB_ID = re.compile(r'[A-Za-z0-9_-][A-Za-z0-9_.-]{0,127}')
+# Characters of a worker name (host:pid) not used in its staging file names.
+STAGING_UNSAFE = re.compile(r'[^A-Za-z0-9_.-]')
+STATUSES = ('queued', 'running', 'done', 'dead')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS render_jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after REAL NOT NULL,
+    submitted_at REAL NOT NULL,
+    first_started_at REAL,
+    started_at REAL,
+    finished_at REAL,
+    lease_expires REAL,
+    worker TEXT,
+    output_path TEXT,
+    render_ms REAL,
+    error TEXT,
+    resubmitted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS render_jobs_due ON render_jobs (status, run_after);
+CREATE INDEX IF NOT EXISTS render_jobs_lease ON render_jobs (status, lease_expires);
+"""
+
+STATUS_COLUMNS = ('id, status, attempts, max_attempts, submitted_at, first_started_at, '
+                  'started_at, finished_at, worker, output_path, render_ms, error')
+
+
+def default_output_dir(db_path):
+    return os.environ.get('PDF_JOB_OUTPUT_DIR') or os.path.join(
+        os.path.dirname(os.path.abspath(db_path)), 'pdfs')
+
+
+def job_summary(row):
+    """Status dict for a render_jobs row, with queue and end-to-end latency in ms."""
+    job = dict(row)
+    submitted = job['submitted_at']
+    job['queue_ms'] = (round((job['first_started_at'] - submitted) * 1000, 2)
+                       if job['first_started_at'] is not None else None)
+    job['total_ms'] = (round((job['finished_at'] - submitted) * 1000, 2)
+                       if job['finished_at'] is not None else None)
+    return job
+
+
+def discard(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class JobQueue:
+    """
+    The render_jobs table of one SQLite database. Every process opens its
+    own JobQueue; state changes run in IMMEDIATE transactions, so workers
+    never claim the same job twice.
+    """
+
+    def __init__(self, db_path, lease_s=DEFAULT_LEASE_S, retry_base_s=RETRY_BASE_S):
+        self.db_path = db_path
+        self.lease_s = lease_s
+        self.retry_base_s = retry_base_s
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        # Databases created before a column was added to SCHEMA.
+        columns = {row['name'] for row in self.db.execute('PRAGMA table_info(render_jobs)')}
+        if 'resubmitted' not in columns:
+            try:
+                self.db.execute('ALTER TABLE render_jobs ADD COLUMN resubmitted INTEGER NOT NULL DEFAULT 0')
+            except sqlite3.OperationalError:
+                pass  # another process added it first
+
+    def close(self):
+        self.db.close()
+
+    @contextmanager
+    def _transaction(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.db
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        self.db.execute('COMMIT')
+
+    def retry_delay(self, attempts):
+        return min(RETRY_MAX_S, self.retry_base_s * 2 ** max(0, attempts - 1))
+
+    def submit(self, data, job_id=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Queues a render of data (a payload dict) and returns the job id."""
+        if not isinstance(data, dict):
+            raise ValueError("Quotation payload must be a JSON object")
+        if job_id is None:
+            job_id = uuid.uuid4().hex
+        elif not JOB_ID.fullmatch(str(job_id)):
+            raise ValueError(f"Invalid job id: {job_id!r}")
+        job_id = str(job_id)
+        payload = json.dumps(data, default=str)
+        now = time.time()
+
+        with self._transaction() as db:
+            row = db.execute('SELECT status FROM render_jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                db.execute(
+                    'INSERT INTO render_jobs (id, status, payload, max_attempts, run_after, submitted_at) '
+                    "VALUES (?, 'queued', ?, ?, ?, ?)",
+                    (job_id, payload, max_attempts, now, now))
+            elif row['status'] == 'queued':
+                db.execute('UPDATE render_jobs SET payload = ? WHERE id = ?', (payload, job_id))
+            elif row['status'] == 'running':
+                # The worker holds the old payload; complete() or fail() queues the new one.
+                db.execute('UPDATE render_jobs SET payload = ?, resubmitted = 1 WHERE id = ?', (payload, job_id))
+            else:
+                db.execute(
+                    "UPDATE render_jobs SET status = 'queued', payload = ?, attempts = 0, max_attempts = ?, "
+                    'run_after = ?, submitted_at = ?, first_started_at = NULL, started_at = NULL, '
+                    'finished_at = NULL, lease_expires = NULL, worker = NULL, output_path = NULL, '
+                    'render_ms = NULL, error = NULL, resubmitted = 0 WHERE id = ?',
+                    (payload, max_attempts, now, now, job_id))
+        return job_id
+
+    def _requeue_resubmitted(self, db, job_id, now):
+        """Queues a running job's resubmitted payload with a fresh set of attempts."""
+        db.execute(
+            "UPDATE render_jobs SET status = 'queued', resubmitted = 0, attempts = 0, run_after = ?, "
+            'first_started_at = NULL, started_at = NULL, finished_at = NULL, lease_expires = NULL, '
+            'worker = NULL, output_path = NULL, render_ms = NULL, error = NULL WHERE id = ?',
+            (now, job_id))
+
+    def _reclaim_expired(self, db, now):
+        """
+        Requeues (or dead-letters) running jobs whose lease ran out before they
+        finished. A resubmitted one is queued with fresh attempts, since its
+        new payload was never tried.
+        """
+        db.execute(
+            "UPDATE render_jobs SET "
+            "status = CASE WHEN attempts >= max_attempts AND NOT resubmitted THEN 'dead' ELSE 'queued' END, "
+            "finished_at = CASE WHEN attempts >= max_attempts AND NOT resubmitted THEN ? ELSE NULL END, "
+            "attempts = CASE WHEN resubmitted THEN 0 ELSE attempts END, resubmitted = 0, "
+            "run_after = ?, lease_expires = NULL, "
+            "error = 'worker ' || worker || ' stopped before finishing' "
+            "WHERE status = 'running' AND lease_expires < ?",
+            (now, now, now))
+
+    def claim(self, worker):
+        """
+        Marks the next due job as running for worker and returns
+        {'id', 'data', 'attempt'}, or None when nothing is due.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            self._reclaim_expired(db, now)
+            row = db.execute(
+                "SELECT id, attempts, payload FROM render_jobs WHERE status = 'queued' AND run_after <= ? "
+                'ORDER BY run_after, rowid LIMIT 1', (now,)).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE render_jobs SET status = 'running', attempts = attempts + 1, started_at = ?, "
+                'first_started_at = COALESCE(first_started_at, ?), lease_expires = ?, worker = ? '
+                'WHERE id = ?',
+                (now, now, now + self.lease_s, worker, row['id']))
+        return {'id': row['id'], 'data': json.loads(row['payload']), 'attempt': row['attempts'] + 1}
+
+    def renew(self, job_id, worker):
+        """Extends worker's lease on a running job. Returns False if it no longer holds it."""
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE render_jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time() + self.lease_s, job_id, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker, output_path, render_ms, staged_path=None):
+        """
+        Marks a job done, or queues it again if it was resubmitted while it
+        rendered. Returns False if worker no longer holds it. staged_path,
+        the attempt's own render, is renamed to output_path in the same
+        transaction once worker is known to hold the job, and deleted
+        otherwise (or when the job was resubmitted, as it is out of date).
+        """
+        now = time.time()
+        published = False
+        try:
+            with self._transaction() as db:
+                row = db.execute(
+                    "SELECT resubmitted FROM render_jobs WHERE id = ? AND worker = ? AND status = 'running'",
+                    (job_id, worker)).fetchone()
+                if row is None:
+                    return False
+                if row['resubmitted']:
+                    self._requeue_resubmitted(db, job_id, now)
+                    return True
+                if staged_path is not None:
+                    os.replace(staged_path, output_path)
+                    published = True
+                db.execute(
+                    "UPDATE render_jobs SET status = 'done', finished_at = ?, lease_expires = NULL, "
+                    'output_path = ?, render_ms = ?, error = NULL WHERE id = ?',
+                    (now, output_path, render_ms, job_id))
+        finally:
+            if staged_path is not None and not published:
+                discard(staged_path)
+        return True
+
+    def fail(self, job_id, worker, error, permanent=False):
+        """
+        Records a failed attempt: the job is queued again after a backoff, or
+        dead-lettered when permanent or out of attempts. A job resubmitted
+        while it rendered is queued at once with fresh attempts, since the
+        failure was the old payload's. Returns the new status, or None if
+        worker no longer holds the job.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT attempts, max_attempts, resubmitted FROM render_jobs '
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (job_id, worker)).fetchone()
+            if row is None:
+                return None
+            if row['resubmitted']:
+                self._requeue_resubmitted(db, job_id, now)
+                return 'queued'
+            if permanent or row['attempts'] >= row['max_attempts']:
+                db.execute(
+                    "UPDATE render_jobs SET status = 'dead', finished_at = ?, lease_expires = NULL, error = ? "
+                    'WHERE id = ?', (now, error, job_id))
+                return 'dead'
+            db.execute(
+                "UPDATE render_jobs SET status = 'queued', run_after = ?, lease_expires = NULL, error = ? "
+                'WHERE id = ?', (now + self.retry_delay(row['attempts']), error, job_id))
+            return 'queued'
+
+    def requeue(self, job_id):
+        """Gives a dead job a fresh set of attempts. Returns False if it isn't dead."""
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE render_jobs SET status = 'queued', attempts = 0, run_after = ?, finished_at = NULL, "
+                "worker = NULL, error = NULL WHERE id = ? AND status = 'dead'", (now, job_id))
+        return cursor.rowcount == 1
+
+    def status(self, job_id):
+        """Returns the job's status dict (see job_summary), or None for an unknown id."""
+        row = self.db.execute(f'SELECT {STATUS_COLUMNS} FROM render_jobs WHERE id = ?', (job_id,)).fetchone()
+        return job_summary(row) if row is not None else None
+
+    def jobs(self, status, limit=100):
+        """Status dicts of the most recently submitted jobs with the given status."""
+        rows = self.db.execute(
+            f'SELECT {STATUS_COLUMNS} FROM render_jobs WHERE status = ? ORDER BY submitted_at DESC LIMIT ?',
+            (status, limit))
+        return [job_summary(row) for row in rows]
+
+    def pending(self):
+        """Jobs not yet done or dead, including retries waiting out their backoff."""
+        return self.db.execute(
+            "SELECT COUNT(*) FROM render_jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def stats(self):
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(self.db.execute('SELECT status, COUNT(*) FROM render_jobs GROUP BY status'))
+        oldest = self.db.execute(
+            "SELECT MIN(submitted_at) FROM render_jobs WHERE status = 'queued'").fetchone()[0]
+        return {
+            'jobs': counts,
+            'oldest_queued_s': round(time.time() - oldest, 3) if oldest is not None else None,
+        }
+
+    def prune(self, older_than_s):
+        """Deletes done and dead jobs that finished over older_than_s ago, with their PDFs."""
+        cutoff = time.time() - older_than_s
+        with self._transaction() as db:
+            rows = db.execute(
+                "SELECT id, output_path FROM render_jobs WHERE status IN ('done', 'dead') AND finished_at < ?",
+                (cutoff,)).fetchall()
+            db.execute("DELETE FROM render_jobs WHERE status IN ('done', 'dead') AND finished_at < ?", (cutoff,))
+        for row in rows:
+            if row['output_path'] and os.path.exists(row['output_path']):
+                os.unlink(row['output_path'])
+        return len(rows)
+
+
+class LeaseHeartbeat:
+    """
+    Context manager that renews worker's lease on a job every lease_s / 3
+    seconds while the job renders, so a render that outlasts the lease isn't
+    reclaimed and rendered a second time (costing an attempt) while it is
+    still progressing. The thread opens its own JobQueue, since a SQLite
+    connection belongs to the thread that opened it.
+    """
+
+    def __init__(self, db_path, job_id, worker, lease_s):
+        self.db_path = db_path
+        self.job_id = job_id
+        self.worker = worker
+        self.lease_s = lease_s
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        queue = JobQueue(self.db_path, self.lease_s)
+        try:
+            while not self._stop.wait(self.lease_s / 3):
+                if not queue.renew(self.job_id, self.worker):
+                    return
+        finally:
+            queue.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def output_paths(output_dir, job_id, worker):
+    """(PDF path in the output store, worker's staging path beside it) for a job."""
+    output_path = os.path.join(output_dir, f"{job_id}.pdf")
+    return output_path, f"{output_path[:-4]}.{STAGING_UNSAFE.sub('_', worker)}.pdf.tmp"
+
+
+def render_job(job, staged_path, cache=None):
+    """Renders a claimed job into staged_path, for complete() to move into the output store."""
+    if cache is not None:
+        pdf_bytes, _ = cache.get_or_render(job['data'])
+    else:
+        buffer = io.BytesIO()
+        render_quotation_pdf(job['data'], buffer)
+        pdf_bytes = buffer.getvalue()
+    atomic_write(staged_path, pdf_bytes)
+
+
+def work(db_path, output_dir, max_jobs=0, drain=False, poll_s=DEFAULT_POLL_S,
+         cache_dir=None, stop=None, lease_s=DEFAULT_LEASE_S, retry_base_s=RETRY_BASE_S):
+    """
+    Claims and renders jobs in this process. Returns 'recycle' after max_jobs
+    jobs, 'drained' once (with drain) no job is queued or running, and
+    'stopped' when the stop event is set.
+    """
+    warm_up()
+    os.makedirs(output_dir, exist_ok=True)
+    queue = JobQueue(db_path, lease_s, retry_base_s)
+    cache = PdfCache(cache_dir, DEFAULT_MAX_BYTES) if cache_dir else None
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    try:
+        while not (stop is not None and stop.is_set()):
+            job = queue.claim(worker)
+            if job is None:
+                if drain and not queue.pending():
+                    return 'drained'
+                time.sleep(poll_s)
+                continue
+
+            started = time.perf_counter()
+            output_path, staged_path = output_paths(output_dir, job['id'], worker)
+            try:
+                with LeaseHeartbeat(db_path, job['id'], worker, lease_s):
+                    render_job(job, staged_path, cache)
+            except PERMANENT_ERRORS as e:
+                queue.fail(job['id'], worker, str(e), permanent=True)
+            except Exception as e:
+                queue.fail(job['id'], worker, str(e))
+            else:
+                queue.complete(job['id'], worker, output_path,
+                               round((time.perf_counter() - started) * 1000, 2), staged_path)
+
+            processed += 1
+            if max_jobs and processed >= max_jobs:
+                return 'recycle'
+        return 'stopped'
+    finally:
+        queue.close()
+
+
+def _worker_main(options):
+    if work(**options) == 'recycle':
+        sys.exit(RECYCLE_EXIT)
+
+
+def run_workers(db_path, output_dir, workers=1, max_jobs=DEFAULT_MAX_JOBS, drain=False,
+                poll_s=DEFAULT_POLL_S, cache_dir=None, stop=None,
+                lease_s=DEFAULT_LEASE_S, retry_base_s=RETRY_BASE_S):
+    """
+    Keeps `workers` worker processes draining the queue, starting a fresh one
+    whenever one recycles or dies, until they drain (with drain) or stop is set.
+    A worker that fails at start-up (a bad output directory, an import
+    error) is restarted after an exponential backoff; after
+    MAX_STARTUP_FAILURES such failures in a row, the remaining workers are
+    stopped and RuntimeError is raised.
+    Workers are spawned rather than forked: a forked child inherits the
+    parent's SQLite lock state, which can leave it waiting on locks that
+    nobody holds. Pass stop as an Event from multiprocessing.get_context('spawn').
+    """
+    context = multiprocessing.get_context('spawn')
+    stop = stop if stop is not None else context.Event()
+    options = {'db_path': db_path, 'output_dir': output_dir, 'max_jobs': max_jobs, 'drain': drain,
+               'poll_s': poll_s, 'cache_dir': cache_dir, 'stop': stop,
+               'lease_s': lease_s, 'retry_base_s': retry_base_s}
+    # Create the schema once, before the workers race to.
+    JobQueue(db_path, lease_s, retry_base_s).close()
+
+    def start():
+        process = context.Process(target=_worker_main, args=(options,))
+        process.start()
+        return process
+
+    # One slot per worker: its process (None while waiting out a restart
+    # backoff), when it started and its start-up failures in a row.
+    slots = [{'process': start(), 'started': time.monotonic(), 'failures': 0} for _ in range(workers)]
+    try:
+        while slots:
+            time.sleep(poll_s)
+            now = time.monotonic()
+            running = []
+            for slot in slots:
+                process = slot['process']
+                if process is None:
+                    if not stop.is_set():
+                        if now >= slot['restart_at']:
+                            slot.update(process=start(), started=now)
+                        running.append(slot)
+                elif process.is_alive():
+                    running.append(slot)
+                elif process.exitcode == 0 or stop.is_set():
+                    continue
+                elif process.exitcode == RECYCLE_EXIT or now - slot['started'] >= STARTUP_GRACE_S:
+                    slot.update(process=start(), started=now, failures=0)
+                    running.append(slot)
+                else:
+                    slot['failures'] += 1
+                    if slot['failures'] >= MAX_STARTUP_FAILURES:
+                        raise RuntimeError(f"worker exited with status {process.exitcode} at start-up "
+                                           f"{slot['failures']} times in a row; giving up")
+                    delay = min(RETRY_MAX_S, RETRY_BASE_S * 2 ** (slot['failures'] - 1))
+                    slot.update(process=None, restart_at=now + delay)
+                    running.append(slot)
+            slots = running
+    except KeyboardInterrupt:
+        stop.set()
+    finally:
+        stop.set()
+        for slot in slots:
+            if slot['process'] is not None:
+                slot['process'].join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Durable queue of quotation PDF renders")
+    parser.add_argument('--db', default=os.environ.get('PDF_JOB_QUEUE_DB'),
+                        help="SQLite queue database (default: $PDF_JOB_QUEUE_DB)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    submit = commands.add_parser('submit', help="Queue a render and print its job id")
+    submit.add_argument('data', help="Quotation payload JSON file, or - for stdin")
+    submit.add_argument('--id', help="Job id (default: a random one)")
+    submit.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS)
+
+    status = commands.add_parser('status', help="Print a job's status as JSON")
+    status.add_argument('id')
+
+    work_cmd = commands.add_parser('work', help="Render queued jobs")
+    work_cmd.add_argument('--workers', type=int, default=1,
+                          help="Worker processes (default: 1, 0 = one per CPU)")
+    work_cmd.add_argument('--output-dir', help="Where PDFs are stored (default: pdfs/ next to the database)")
+    work_cmd.add_argument('--drain', action='store_true', help="Exit once no job is queued or running")
+    work_cmd.add_argument('--max-jobs', type=int,
+                          default=int(os.environ.get('PDF_RENDER_MAX_JOBS', DEFAULT_MAX_JOBS)),
+                          help="Restart a worker after this many jobs (0 = never)")
+    work_cmd.add_argument('--poll', type=float, default=DEFAULT_POLL_S, help="Idle poll interval in seconds")
+    work_cmd.add_argument('--lease', type=float, default=DEFAULT_LEASE_S,
+                          help="Seconds without a heartbeat before a worker's job is given to another")
+    work_cmd.add_argument('--cache-dir', default=os.environ.get('PDF_CACHE_DIR'),
+                          help="Serve unchanged quotations from this PDF cache directory")
+
+    commands.add_parser('stats', help="Print job counts by status")
+    dead = commands.add_parser('dead', help="List dead-lettered jobs")
+    dead.add_argument('--limit', type=int, default=100)
+    requeue = commands.add_parser('requeue', help="Queue a dead job again")
+    requeue.add_argument('id')
+    prune = commands.add_parser('prune', help="Delete old done/dead jobs and their PDFs")
+    prune.add_argument('--older-than', type=float, required=True, help="Age in seconds")
+    args = parser.parse_args()
+
+    if not args.db:
+        parser.error("--db (or PDF_JOB_QUEUE_DB) is required")
+    if args.command == 'work' and args.lease <= 0:
+        parser.error("--lease must be a positive number of seconds")
+
+    if args.command == 'work':
+        try:
+            run_workers(args.db, os.path.abspath(args.output_dir or default_output_dir(args.db)),
+                        workers=args.workers or os.cpu_count() or 1, max_jobs=args.max_jobs,
+                        drain=args.drain, poll_s=args.poll, cache_dir=args.cache_dir, lease_s=args.lease)
+        except RuntimeError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    queue = JobQueue(args.db)
+    if args.command == 'submit':
+        try:
+            data = load_quotation_data(args.data)
+            result = {'id': queue.submit(data, args.id, args.max_attempts)}
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+    elif args.command == 'status':
+        result = queue.status(args.id)
+        if result is None:
+            print(f"Error: no job {args.id}", file=sys.stderr)
+            sys.exit(NO_JOB_EXIT)
+    elif args.command == 'stats':
+        result = queue.stats()
+    elif args.command == 'dead':
+        result = queue.jobs('dead', args.limit)
+    elif args.command == 'requeue':
+        result = {'id': args.id, 'requeued': queue.requeue(args.id)}
+    else:
+        result = {'pruned': queue.prune(args.older_than)}
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Layout-only dry run of a quotation.
+
+layout_quotation() paginates a payload exactly as render_quotation_pdf
+does, with the same story and the same SimpleDocTemplate geometry (A4, 68 mm
+top margin, 15 mm sides), but places the flowables without drawing them:
+no header/footer, no images, no page streams and no file. It returns what
+the pages will hold as a JSON-ready dict:
+
+    {"page_count": 3, "quotation_pages": 2, "acceptance_pages": 1,
+     "pages": [{"page": 1, "flowables": [0, 4], "items": [1, 18], "free_height": 3.1}, ...],
+     "story": [{"index": 4, "type": "ItemsTable", "role": "items", "pages": [1, 2]}, ...],
+     "warnings": [{"type": "totals_alone", "page": 2, "message": "..."}],
+     "complete": true}
+
+flowables are the first and last story indexes placed on a page and items
+the first and last line item numbers (from 1) of the itemized table on it.
+free_height is the space in points left at the bottom of the frame.
+Warnings flag content running into the page margins (too_wide), totals pushed onto
+a page without any line items (totals_alone), an acceptance page that
+spills over (acceptance_overflow) and content that cannot be laid out at
+all (layout_error, with complete false).
+
+Usage: python3 quotationLayout.py <data_json|->
+"""
+
+import sys
+import json
+from functools import partial
+
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Frame, PageTemplate, SimpleDocTemplate
+from reportlab.platypus.doctemplate import BaseDocTemplate, LayoutError
+
+from generateQuotationPDF import build_quotation_story, load_quotation_data, prepare_render_assets
+from quotationItemsTable import ItemsTable
+from quotationModel import parse_quotation
+from quotationPrelaidPage import PrelaidPage
+
+# Width overruns smaller than this are rounding, not overflow.
+FUZZ = 1e-6
+
+
+class LayoutCanvas(Canvas):
+    """A canvas that keeps page numbering but never builds or saves a page."""
+
+    def showPage(self):
+        self._startPage()
+
+    def save(self):
+        pass
+
+
+class LayoutFrame(Frame):
+    """
+    A Frame that places flowables without drawing them, noting how far the
+    last one placed overran the frame's width including its padding, i.e.
+    into the page margins (overflow, in points).
+    """
+    overflow = 0
+
+    def add(self, flowable, canv, trySplit=0):
+        flowable.drawOn = partial(self._placed, flowable)
+        try:
+            return Frame._add(self, flowable, canv, trySplit)
+        finally:
+            del flowable.drawOn
+
+    def _placed(self, flowable, canv, x, y, _sW=0):
+        # Tables are centred, so they use the padding on both sides before the margins.
+        overflow = -_sW - self._leftPadding - self._rightPadding
+        self.overflow = overflow if overflow > FUZZ else 0
+
+
+class LayoutDocTemplate(SimpleDocTemplate):
+    """
+    SimpleDocTemplate that lays a story out in LayoutFrames and records,
+    per page, the story indexes and line items placed on it. Pieces split
+    off a flowable count as the story element they came from.
+    """
+
+    def __init__(self, geometry, story):
+        SimpleDocTemplate.__init__(self, None, pagesize=geometry.pagesize,
+                                   leftMargin=geometry.leftMargin, rightMargin=geometry.rightMargin,
+                                   topMargin=geometry.topMargin, bottomMargin=geometry.bottomMargin)
+        self.pages = []
+        self.warnings = []
+        self.placements = []         # (page, story index) for each flowable placed
+        self._origins = {}           # id(flowable) -> story index
+        self._keep = list(story)     # keeps those ids from being reused
+        self._origin = None
+        for index, flowable in enumerate(story):
+            self._origins[id(flowable)] = index
+        self.items_index = next((i for i, f in enumerate(story) if isinstance(f, ItemsTable)), None)
+        self.item_rows = story[self.items_index].rows if self.items_index is not None else None
+        self.items_placed = 0
+
+    def build(self, flowables):
+        self._calc()
+        frame = LayoutFrame(self.leftMargin, self.bottomMargin, self.width, self.height, id='normal')
+        self.addPageTemplates([PageTemplate(id='First', frames=frame, pagesize=self.pagesize),
+                               PageTemplate(id='Later', frames=frame, pagesize=self.pagesize)])
+        BaseDocTemplate.build(self, flowables, canvasmaker=LayoutCanvas)
+
+    def handle_pageBegin(self):
+        SimpleDocTemplate.handle_pageBegin(self)
+        self.pages.append({'page': self.page, 'flowables': None, 'items': None, 'free_height': None})
+
+    def handle_flowable(self, flowables):
+        self._origin = self._origins.get(id(flowables[0]))
+        remaining = len(flowables) - 1
+        SimpleDocTemplate.handle_flowable(self, flowables)
+        # Whatever now sits in front of the untouched rest came from that flowable.
+        for piece in flowables[:len(flowables) - remaining]:
+            self._origins.setdefault(id(piece), self._origin)
+            self._keep.append(piece)
+
+    def afterFlowable(self, flowable):
+        index = self._origin
+        if index is None or not self.pages:
+            return
+        page = self.pages[-1]
+        first = page['flowables'][0] if page['flowables'] else index
+        page['flowables'] = [first, index]
+        page['free_height'] = round(self.frame._y - self.frame._y1p, 2)
+        self.placements.append((self.page, index))
+
+        overflow, self.frame.overflow = self.frame.overflow, 0
+        if overflow:
+            self.warnings.append({
+                'type': 'too_wide', 'page': self.page, 'index': index,
+                'message': f"{type(flowable).__name__} runs {overflow:.1f} pt into the page margins",
+            })
+        if index == self.items_index:
+            self._place_items(page, flowable)
+
+    def _place_items(self, page, flowable):
+        rows = self.item_rows
+        # A chunk has taken its rows already; a whole ItemsTable would take the rest when drawn.
+        end = rows.placed
+        if isinstance(flowable, ItemsTable):
+            end += len(rows.buffer)
+        if end > self.items_placed:
+            first = page['items'][0] if page['items'] else self.items_placed + 1
+            page['items'] = [first, end]
+            self.items_placed = end
+
+
+def story_entries(story, placements):
+    """One entry per story element: its type, role and first/last page (None if never placed)."""
+    pages = {}
+    for page, index in placements:
+        first, _ = pages.get(index, (page, page))
+        pages[index] = (first, page)
+    items_index = next((i for i, f in enumerate(story) if isinstance(f, ItemsTable)), None)
+    entries = []
+    for index, flowable in enumerate(story):
+        role = None
+        if index == items_index:
+            role = 'items'
+        elif items_index is not None and index == items_index + 1:
+            role = 'totals'
+        elif isinstance(flowable, PrelaidPage):
+            role = 'acceptance'
+        span = pages.get(index)
+        entries.append({'index': index, 'type': type(flowable).__name__, 'role': role,
+                        'pages': list(span) if span else None})
+    return entries
+
+
+def layout_quotation(data):
+    """
+    Paginates data (a payload or a Quotation) without rendering it and
+    returns the layout dict described in the module docstring. A malformed
+    payload raises QuotationError, as render_quotation_pdf does.
+    """
+    quotation = parse_quotation(data)
+    template = prepare_render_assets(quotation)
+    geometry, story, _ = build_quotation_story(quotation, None, template)
+    doc = LayoutDocTemplate(geometry, story)
+
+    complete = True
+    try:
+        doc.build(list(story))
+    except LayoutError as e:
+        complete = False
+        doc.warnings.append({'type': 'layout_error', 'page': doc.page, 'message': str(e)})
+
+    entries = story_entries(story, doc.placements)
+    by_role = {entry['role']: entry for entry in entries if entry['role']}
+    warnings = doc.warnings
+    items, totals = by_role.get('items'), by_role.get('totals')
+    if items and totals and items['pages'] and totals['pages'] and totals['pages'][0] > items['pages'][1]:
+        warnings.append({'type': 'totals_alone', 'page': totals['pages'][0],
+                         'message': "the totals start a page after the last line item"})
+    acceptance = by_role.get('acceptance')
+    acceptance_pages = 0
+    if acceptance and acceptance['pages']:
+        acceptance_pages = acceptance['pages'][1] - acceptance['pages'][0] + 1
+        if acceptance_pages > 1:
+            warnings.append({'type': 'acceptance_overflow', 'page': acceptance['pages'][1],
+                             'message': f"the acceptance page runs over {acceptance_pages} pages"})
+
+    page_count = len(doc.pages)
+    return {
+        'page_count': page_count,
+        'quotation_pages': page_count - acceptance_pages,
+        'acceptance_pages': acceptance_pages,
+        'pages': doc.pages,
+        'story': entries,
+        'warnings': warnings,
+        'complete': complete,
+    }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("Usage: python quotationLayout.py <data_json|->")
+        sys.exit(1)
+    try:
+        print(json.dumps(layout_quotation(load_quotation_data(sys.argv[1])), indent=2))
+    except Exception as e:
+        print(f"Error laying out quotation: {str(e)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Opt-in instrumentation for quotation renders.
+
+A RenderMetrics collects phase timings and counts for one render and emits
+them as a single JSON line on stderr:
+
+    {"event": "render_metrics", "ok": true, "quote_number": "...",
+     "phases_ms": {"load": 0.4, "parse": 0.2, "assets": 0.1, "build": 6.2, "layout": 30.5, "write": 0.3},
+     "total_ms": 37.5, "pages": 2, "flowables": 9, "table_rows": 31,
+     "pdf_bytes": 31551, "paragraph_hits": 28, "paragraph_misses": 3,
+     "optimized": false, "invariant": false, "fonts_subset": true, "sha256": "9bda...",
+     "pdf_size": {"images": 25034, "fonts": 180, "content": 3712, "other": 1528},
+     "peak_rss_kb": 61234}
+
+Renders take NO_METRICS by default, which records nothing. Set
+PDF_RENDER_METRICS=1 to turn metrics on for the CLI and the render server.
+Set PDF_RENDER_PROFILE_DIR to also write a cProfile .pstats dump per render
+(inspect with python3 -m pstats <file>).
+"""
+
+import os
+import sys
+import json
+import time
+import cProfile
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+METRICS_EVENT = 'render_metrics'
+
+
+def metrics_enabled():
+    return os.environ.get('PDF_RENDER_METRICS', '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def profile_dir():
+    return os.environ.get('PDF_RENDER_PROFILE_DIR') or None
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KB, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and KB everywhere else.
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class RenderMetrics:
+    """Phase timers and counters for one render."""
+
+    def __init__(self, **fields):
+        self.fields = dict(fields)
+        self.phases_ms = {}
+        self.counts = {}
+
+    def __bool__(self):
+        return True
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.phases_ms[name] = round(self.phases_ms.get(name, 0) + elapsed, 3)
+
+    def count(self, name, value):
+        self.counts[name] = value
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def to_dict(self):
+        return {
+            'event': METRICS_EVENT,
+            **self.fields,
+            'phases_ms': self.phases_ms,
+            'total_ms': round(sum(self.phases_ms.values()), 3),
+            **self.counts,
+            'peak_rss_kb': peak_rss_kb(),
+        }
+
+    def emit(self, stream=None):
+        stream = stream or sys.stderr
+        stream.write(json.dumps(self.to_dict(), default=str) + '\n')
+        stream.flush()
+
+
+class NullMetrics:
+    """Stand-in for RenderMetrics when instrumentation is off; records nothing."""
+
+    def __bool__(self):
+        return False
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def count(self, name, value):
+        pass
+
+    def set(self, **fields):
+        pass
+
+    def emit(self, stream=None):
+        pass
+
+
+NO_METRICS = NullMetrics()
+
+
+def profile_path_for(directory, label):
+    """Where to dump the profile for one render, or None when profiling is off."""
+    if not directory:
+        return None
+    safe_label = ''.join(c if c.isalnum() or c in '-_' else '_' for c in str(label))
+    return os.path.join(directory, f"{safe_label}-{time.time_ns()}.pstats")
+
+
+@contextmanager
+def profiled(path):
+    """Runs the block under cProfile and dumps pstats to path; a no-op if path is None."""
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        profiler.dump_stats(path)
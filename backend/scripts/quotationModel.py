@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Typed quotation model shared by the PDF generators.
+
+parse_quotation() turns a route payload (the row the PDF route's JOIN
+returns, JSON-decoded) into a Quotation in one pass: items decoded from
+their JSONB text form if need be, quantities and prices parsed to Decimal
+and every line priced exactly, dates parsed, contact fallbacks resolved
+and the template columns set aside for quotationTemplates. The generators
+then read attributes instead of going back to the dict.
+
+Malformed input raises QuotationError, naming the field:
+
+    QuotationError: items[3].price: Not a number: 'twelve'
+
+Text fields are None when absent or null; the placeholder each generator
+prints in their place ('N/A', '0000', ...) is its own business.
+"""
+
+import json
+from datetime import datetime
+
+from quotationPricing import STORED_FIELDS, to_decimal, price_line, totals_for_lines
+
+TEMPLATE_FIELDS = (
+    'template_id', 'template_name', 'template_updated_at', 'logo_url', 'vat_rate',
+    'default_terms', 'default_notes',
+)
+TEMPLATE_PREFIXES = ('company_', 'show_')
+TEMPLATE_SUFFIXES = ('_color',)
+
+
+def is_template_field(name):
+    return (name in TEMPLATE_FIELDS
+            or name.startswith(TEMPLATE_PREFIXES)
+            or name.endswith(TEMPLATE_SUFFIXES))
+
+
+class QuotationError(ValueError):
+    """A quotation payload that can't be rendered; the message names the field."""
+
+    def __init__(self, field, problem):
+        super().__init__(f"{field}: {problem}" if field else problem)
+        self.field = field
+
+
+def _text(data, field, name=None):
+    """A text field as str, or None when it is absent or null."""
+    value = data.get(field)
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        raise QuotationError(name or field, f"expected text, got {type(value).__name__}")
+    return str(value)
+
+
+def _number(data, field, name=None):
+    """A numeric field as Decimal (absent, null and '' are 0)."""
+    try:
+        return to_decimal(data.get(field))
+    except ValueError as e:
+        raise QuotationError(name or field, str(e)) from None
+
+
+def _datetime(data, field):
+    """An ISO date or timestamp field as datetime, or None when it is absent or empty."""
+    value = data.get(field)
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        raise QuotationError(field, f"expected an ISO date, got {value!r}")
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise QuotationError(field, f"not an ISO date: {value!r}") from None
+
+
+class LineItem:
+    """One line of a quotation, with its exact amount."""
+
+    __slots__ = ('name', 'description', 'quantity', 'price', 'total')
+
+    def __init__(self, name, description, quantity, price, total=None):
+        self.name = name
+        self.description = description
+        self.quantity = quantity
+        self.price = price
+        self.total = price_line(quantity, price) if total is None else total
+
+    def __repr__(self):
+        return f"LineItem({self.name!r}, quantity={self.quantity}, price={self.price})"
+
+
+def parse_items(items):
+    """LineItems for a payload's items: a list of objects or its JSON text."""
+    if items is None or items == '':
+        return ()
+    if isinstance(items, str):
+        try:
+            items = json.loads(items)
+        except ValueError as e:
+            raise QuotationError('items', f"not valid JSON: {e}") from None
+    if not isinstance(items, list):
+        raise QuotationError('items', f"expected a list, got {type(items).__name__}")
+
+    # Quantities and catalogue prices repeat from line to line, so equal
+    # values share one Decimal (and one priced amount) across the items.
+    numbers, amounts = {}, {}
+
+    def number(item, field, name):
+        value = item.get(field)
+        try:
+            key = (type(value), value)
+            shared = numbers.get(key)
+        except TypeError:  # unhashable, and so not a number either
+            key = shared = None
+        if shared is None:
+            shared = _number(item, field, name)
+            if key is not None:
+                numbers[key] = shared
+        return shared
+
+    lines = []
+    for index, item in enumerate(items):
+        field = f"items[{index}]"
+        if not isinstance(item, dict):
+            raise QuotationError(field, f"expected an object, got {type(item).__name__}")
+        quantity = number(item, 'quantity', f"{field}.quantity")
+        price = number(item, 'price', f"{field}.price")
+        total = amounts.get((quantity, price))
+        if total is None:
+            total = amounts[quantity, price] = price_line(quantity, price)
+        lines.append(LineItem(
+            _text(item, 'name', f"{field}.name"),
+            _text(item, 'description', f"{field}.description"),
+            quantity, price, total,
+        ))
+    return tuple(lines)
+
+
+class Quotation:
+    """A validated quotation payload; build one with parse_quotation()."""
+
+    __slots__ = (
+        'id', 'quote_number', 'status', 'created_at', 'valid_until', 'prepared_by',
+        'description', 'notes', 'terms',
+        'client_name', 'client_company', 'client_email', 'client_phone', 'client_address',
+        'contact_name', 'contact_email', 'contact_phone', 'contact_position',
+        'created_by_name', 'created_by_email',
+        'items', 'discount', 'tax_rate', 'totals', 'stored_totals', 'template',
+    )
+
+    def __repr__(self):
+        return f"Quotation({self.quote_number!r}, {len(self.items)} items)"
+
+    def effective_totals(self, default_rate):
+        """
+        totals, but priced at default_rate (the template's VAT rate) when the
+        quotation has no tax_rate of its own, so the VAT charged and the rate
+        printed beside it are always the same one. totals itself is computed
+        before any template is known and charges no VAT in that case.
+        """
+        if self.tax_rate is not None:
+            return self.totals
+        return totals_for_lines(self.totals.line_totals, self.discount, default_rate)
+
+
+def parse_quotation(data):
+    """
+    The Quotation for a route payload. A Quotation is returned as is, so
+    callers can take either.
+    """
+    if isinstance(data, Quotation):
+        return data
+    if not isinstance(data, dict):
+        raise QuotationError(None, "Quotation payload must be a JSON object")
+
+    q = Quotation()
+    q.id = data.get('id')
+    q.quote_number = _text(data, 'quote_number')
+    q.status = _text(data, 'status')
+    q.created_at = _datetime(data, 'created_at')
+    q.valid_until = _datetime(data, 'valid_until')
+    q.prepared_by = _text(data, 'prepared_by')
+    q.description = _text(data, 'description')
+    q.notes = _text(data, 'notes')
+    q.terms = _text(data, 'terms')
+
+    q.client_name = _text(data, 'client_name')
+    q.client_company = _text(data, 'client_company')
+    q.client_email = _text(data, 'client_email')
+    q.client_phone = _text(data, 'client_phone')
+    q.client_address = _text(data, 'client_address')
+    # The primary contact, falling back to the client's own details.
+    q.contact_name = _text(data, 'primary_contact_name') or q.client_name
+    q.contact_email = _text(data, 'primary_contact_email') or q.client_email
+    q.contact_phone = _text(data, 'primary_contact_phone') or q.client_phone
+    q.contact_position = _text(data, 'primary_contact_position')
+    q.created_by_name = _text(data, 'created_by_name')
+    q.created_by_email = _text(data, 'created_by_email')
+
+    q.items = parse_items(data.get('items'))
+    q.discount = _number(data, 'discount')
+    # None (not 0) when absent, so a generator can print the template's rate instead.
+    q.tax_rate = None if data.get('tax_rate') in (None, '') else _number(data, 'tax_rate')
+    q.totals = totals_for_lines(tuple(item.total for item in q.items), q.discount, q.tax_rate)
+    q.stored_totals = {'id': q.id, 'quote_number': q.quote_number,
+                       **{field: data.get(field) for field in STORED_FIELDS}}
+    q.template = {name: value for name, value in data.items() if is_template_field(name)}
+    return q
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Cross-document cache of parsed and wrapped paragraphs.
+
+Most line items come from the products catalog, so quotation after
+quotation carries the same name/description markup, laid out at the same
+column width. Parsing that markup into a Paragraph and breaking it into
+lines is most of what an items table row costs, and a Table wraps each
+cell again while sizing its rows and once more while drawing them.
+
+ParagraphCache keeps the most recently used paragraphs, keyed by markup,
+style and width, as WrappedParagraphs: Paragraphs that remember their
+line breaking and only break again when wrapped at a different width. A
+hit reuses both the parsed fragments and the lines. The cache is bounded
+(PDF_PARAGRAPH_CACHE_SIZE entries, 0 turns it off) and shared by every
+render in the process, which renders one document at a time.
+"""
+
+import os
+from collections import OrderedDict
+
+from reportlab.platypus import Paragraph
+
+DEFAULT_MAX_ENTRIES = 2048
+
+
+def paragraph_cache_size():
+    try:
+        return max(0, int(os.environ.get('PDF_PARAGRAPH_CACHE_SIZE', DEFAULT_MAX_ENTRIES)))
+    except ValueError:
+        return DEFAULT_MAX_ENTRIES
+
+
+class WrappedParagraph(Paragraph):
+    """A Paragraph that reuses its line breaking when wrapped again at the same width."""
+
+    _wrapped_width = None
+
+    def wrap(self, availWidth, availHeight):
+        if availWidth == self._wrapped_width:
+            return self.width, self.height
+        size = Paragraph.wrap(self, availWidth, availHeight)
+        self._wrapped_width = availWidth
+        return size
+
+
+class ParagraphCache:
+    """Bounded LRU of WrappedParagraphs keyed by (markup, style, width)."""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = paragraph_cache_size() if max_entries is None else max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def wrapped(self, text, style, width):
+        """(paragraph, height): text in style, wrapped at width, parsed only on a miss."""
+        key = (text, style, width)
+        paragraph = self._entries.get(key)
+        if paragraph is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return paragraph, paragraph.height
+
+        self.misses += 1
+        paragraph = WrappedParagraph(text, style)
+        _, height = paragraph.wrap(width, 1 << 20)
+        if self.max_entries:
+            self._entries[key] = paragraph
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return paragraph, height
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+PARAGRAPHS = ParagraphCache()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for rendered quotation PDFs.
+
+The key is a SHA-256 over the normalized quotation payload, the template
+fields (company_*, colours, vat_rate, show_*), the default logo, template
+logo (logo_url) and font fingerprints, RENDERER_VERSION and, for optimized output
+(PDF_OPTIMIZE_OUTPUT), the logo DPI, so any change that could alter the
+PDF produces a new key. Entries are stored as <key>.pdf under the cache
+directory, written atomically, and evicted least-recently-used once the
+directory grows past max_bytes.
+
+The key doubles as the digest of a render's inputs. With invariant output
+(PDF_INVARIANT_OUTPUT) equal keys mean byte-identical PDFs, so the key
+serves as an ETag that can be checked (etag_matches) without rendering.
+
+Usage: python3 quotationPdfCache.py <cache_dir> [--max-bytes N]   (prints stats)
+"""
+
+import os
+import io
+import json
+import hashlib
+import argparse
+
+from generateQuotationPDF import (
+    RENDERER_VERSION, render_quotation_pdf, optimize_enabled, logo_dpi, invariant_enabled, temp_file_beside
+)
+from quotationAssets import find_logo_path, find_font_paths
+from quotationMetrics import NO_METRICS
+from quotationModel import is_template_field
+from quotationTemplates import resolve_logo_path
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Puts between full directory scans, which pick up entries other processes
+# sharing the directory wrote or removed.
+RESCAN_PUTS = 100
+# An eviction triggered by put() trims the directory to this share of
+# max_bytes, so a full cache isn't rescanned on every put.
+EVICT_TO = 0.9
+
+def normalize_payload(data):
+    """Splits a route payload into (quotation, template) dicts with items decoded."""
+    quotation, template = {}, {}
+    for name, value in data.items():
+        if name == 'items' and isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        (template if is_template_field(name) else quotation)[name] = value
+    return quotation, template
+
+
+def file_fingerprint(path):
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [os.path.abspath(path), st.st_size, st.st_mtime_ns]
+
+
+def asset_fingerprints(logo_url=None):
+    """Fingerprints of the files a render reads: fonts, default logo and the template's own logo."""
+    regular, bold = find_font_paths()
+    return {
+        'logo': file_fingerprint(find_logo_path()),
+        'template_logo': file_fingerprint(resolve_logo_path(logo_url)),
+        'font_regular': file_fingerprint(regular),
+        'font_bold': file_fingerprint(bold),
+    }
+
+
+def cache_key(data):
+    quotation, template = normalize_payload(data)
+    material = {
+        'quotation': quotation,
+        'template': template,
+        'assets': asset_fingerprints(template.get('logo_url')),
+        'renderer': RENDERER_VERSION,
+    }
+    if optimize_enabled():
+        material['optimized_logo_dpi'] = logo_dpi()
+    if invariant_enabled():
+        material['invariant'] = True
+    blob = json.dumps(material, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def etag_matches(if_none_match, key):
+    """Whether an If-None-Match header value is * or lists the ETag "<key>" (weak or strong)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return True
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag.strip('"') == key:
+            return True
+    return False
+
+
+def atomic_write(path, data):
+    """Writes bytes to path via a temp file in the same directory and os.replace."""
+    fd, tmp_path = temp_file_beside(path)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class PdfCache:
+    """LRU, size-bounded, on-disk store of rendered PDFs keyed by cache_key()."""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Running size of the directory since the last scan (None until the first).
+        self._bytes = None
+        self._puts_since_scan = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def get(self, key):
+        """Returns the cached PDF bytes for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                pdf_bytes = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        # mtime doubles as the LRU clock.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return pdf_bytes
+
+    def put(self, key, pdf_bytes):
+        """
+        Stores pdf_bytes under key. The directory is only rescanned for
+        eviction once the running size passes max_bytes, or every RESCAN_PUTS.
+        """
+        path = self._path(key)
+        try:
+            replaced = os.stat(path).st_size
+        except OSError:
+            replaced = 0
+        atomic_write(path, pdf_bytes)
+        self._puts_since_scan += 1
+        if self._bytes is None or self._puts_since_scan >= RESCAN_PUTS:
+            self.evict(int(self.max_bytes * EVICT_TO))
+            return
+        self._bytes += len(pdf_bytes) - replaced
+        if self._bytes > self.max_bytes:
+            self.evict(int(self.max_bytes * EVICT_TO))
+
+    def entries(self):
+        """Returns [(mtime, size, path)] for every cached PDF, oldest first."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.pdf') and not entry.name.startswith('.tmp-'):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        entries.sort()
+        return entries
+
+    def evict(self, target=None):
+        """
+        Once the directory is over max_bytes, removes least-recently-used
+        entries until it is within target (default max_bytes).
+        """
+        if target is None:
+            target = self.max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+        self._bytes = total
+        self._puts_since_scan = 0
+
+    def stats(self):
+        entries = self.entries()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+        }
+
+    def get_or_render(self, data, metrics=NO_METRICS, key=None):
+        """
+        Returns (pdf_bytes, hit) for data, rendering only on a cache miss.
+        key is cache_key(data), when the caller has it already.
+        """
+        with metrics.phase('cache_lookup'):
+            if key is None:
+                key = cache_key(data)
+            pdf_bytes = self.get(key)
+        if pdf_bytes is not None:
+            return pdf_bytes, True
+
+        buffer = io.BytesIO()
+        render_quotation_pdf(data, buffer, metrics)
+        pdf_bytes = buffer.getvalue()
+        with metrics.phase('cache_store'):
+            self.put(key, pdf_bytes)
+        return pdf_bytes, False
+
+    def render(self, data, output_path):
+        """
+        Writes the PDF for data to output_path, rendering only on a cache miss.
+        Returns True on a hit.
+        """
+        pdf_bytes, hit = self.get_or_render(data)
+        atomic_write(output_path, pdf_bytes)
+        return hit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or trim the quotation PDF cache")
+    parser.add_argument('cache_dir')
+    parser.add_argument('--max-bytes', type=int, default=DEFAULT_MAX_BYTES)
+    args = parser.parse_args()
+
+    cache = PdfCache(args.cache_dir, args.max_bytes)
+    cache.evict()
+    print(json.dumps(cache.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
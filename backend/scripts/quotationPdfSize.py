@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Size breakdown of rendered quotation PDFs.
+
+Splits a PDF's bytes into images, fonts, content streams (page and form
+streams) and everything else (page tree, resources, xref), using the
+offsets in its cross-reference table, and checks every embedded TrueType
+font is a subset (BaseFont carries an XXXXXX+ tag). Works on any PDF with
+a classic xref table, which is what ReportLab writes.
+
+Usage: python3 quotationPdfSize.py <file.pdf> [<file.pdf> ...] [--json]
+"""
+
+import re
+import sys
+import json
+import argparse
+
+CATEGORIES = ('images', 'fonts', 'content', 'other')
+
+REF = rb'(\d+) \d+ R'
+FONT_REFS = re.compile(rb'/(?:FontFile[23]?|ToUnicode|FontDescriptor|Encoding|DescendantFonts) \[?' + REF)
+CONTENT_REFS = re.compile(rb'/Contents ' + REF)
+BASE_FONT = re.compile(rb'/BaseFont /([^\s/>\]]+)')
+SUBSET_TAG = re.compile(r'[A-Z]{6}\+')
+
+
+def iter_objects(pdf_bytes):
+    """Yields (object number, object bytes) for every in-use object, via the xref table."""
+    startxref = pdf_bytes.rindex(b'startxref')
+    xref_at = int(pdf_bytes[startxref + len(b'startxref'):].split()[0])
+    lines = iter(pdf_bytes[xref_at:].split(b'\n')[1:])
+    offsets = []
+    for line in lines:
+        header = line.split()
+        if not header or header[0] == b'trailer':
+            break
+        first, count = int(header[0]), int(header[1])
+        for number in range(first, first + count):
+            entry = next(lines).split()
+            if entry[2] == b'n':
+                offsets.append((int(entry[0]), number))
+    offsets.sort()
+    ends = [offset for offset, _ in offsets[1:]] + [xref_at]
+    for (offset, number), end in zip(offsets, ends):
+        yield number, pdf_bytes[offset:end]
+
+
+def _dictionary(body):
+    """An object's dictionary part (everything before its stream data)."""
+    stream = body.find(b'stream')
+    return body if stream < 0 else body[:stream]
+
+
+def size_breakdown(pdf_bytes):
+    """
+    {'total', 'images', 'fonts', 'content', 'other', 'embedded_fonts'}:
+    byte counts per category, plus one {'name', 'subset', 'bytes'} entry per
+    embedded font file.
+    """
+    objects = {number: body for number, body in iter_objects(pdf_bytes)}
+    heads = {number: _dictionary(body) for number, body in objects.items()}
+
+    font_objects, content_objects = set(), set()
+    for number, head in heads.items():
+        if b'/Type /Font' in head or b'/Type /FontDescriptor' in head:
+            font_objects.add(number)
+        font_objects.update(int(ref) for ref in FONT_REFS.findall(head))
+        content_objects.update(int(ref) for ref in CONTENT_REFS.findall(head))
+
+    sizes = dict.fromkeys(CATEGORIES, 0)
+    for number, body in objects.items():
+        head = heads[number]
+        if b'/Subtype /Image' in head:
+            category = 'images'
+        elif number in font_objects:
+            category = 'fonts'
+        elif number in content_objects or b'/Subtype /Form' in head:
+            category = 'content'
+        else:
+            category = 'other'
+        sizes[category] += len(body)
+    sizes['other'] += len(pdf_bytes) - sum(sizes.values())
+
+    embedded = []
+    for number, head in heads.items():
+        if b'/Type /FontDescriptor' not in head:
+            continue
+        file_ref = re.search(rb'/FontFile[23]? ' + REF, head)
+        name = BASE_FONT.search(head) or re.search(rb'/FontName /([^\s/>\]]+)', head)
+        if file_ref:
+            name = name.group(1).decode('latin-1') if name else '?'
+            embedded.append({
+                'name': name,
+                'subset': bool(SUBSET_TAG.match(name)),
+                'bytes': len(objects.get(int(file_ref.group(1)), b'')),
+            })
+
+    sizes['total'] = len(pdf_bytes)
+    sizes['embedded_fonts'] = embedded
+    return sizes
+
+
+def format_breakdown(sizes):
+    total = sizes['total'] or 1
+    parts = '  '.join(f"{name} {sizes[name] / 1024:.1f} KiB ({sizes[name] / total:.0%})" for name in CATEGORIES)
+    lines = [f"{sizes['total'] / 1024:.1f} KiB: {parts}"]
+    for font in sizes['embedded_fonts']:
+        subset = 'subset' if font['subset'] else 'NOT SUBSET'
+        lines.append(f"  font {font['name']}: {font['bytes'] / 1024:.1f} KiB, {subset}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Break PDF sizes down into images, fonts and content streams")
+    parser.add_argument('pdfs', nargs='+')
+    parser.add_argument('--json', action='store_true', help="Print JSON instead of text")
+    args = parser.parse_args()
+
+    results = {}
+    for path in args.pdfs:
+        with open(path, 'rb') as f:
+            results[path] = size_breakdown(f.read())
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for path, sizes in results.items():
+            print(f"{path}: {format_breakdown(sizes)}")
+    if any(not font['subset'] for sizes in results.values() for font in sizes['embedded_fonts']):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
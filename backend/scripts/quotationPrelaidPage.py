@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Pages whose content is laid out once and replayed into every PDF.
+
+The customer acceptance page (terms table and signature block) is the same
+in every quotation that uses a template. PrelaidPage lays its flowables
+out once, on a scratch canvas in a frame of the same geometry as the
+document's, and keeps the resulting page content stream. Every later
+document just appends that stream to its own page, with the font resource
+names rewritten to the ones that document uses, so no Paragraph or Table
+is wrapped or drawn again.
+
+A stream can only be replayed if it means the same thing in any PDF. Text
+in the ASCII range is encoded identically in every document (TrueType
+subset 0 keeps those codes fixed), but other characters are numbered in
+order of first use, and graphics states and XObjects are named per
+document. So a stream is only replayed if its text is ASCII and every
+operator in it is one the acceptance page is known to emit (PORTABLE_OPS:
+text, paths, device colours and font selection); pages that need anything
+else are laid out normally instead, with exactly the same result.
+
+Laying out and replaying reads ReportLab internals (the canvas's code list
+and document, frame padding, TrueType subset state), so replay is only used
+on the ReportLab releases in REPLAY_VERSIONS. On any other release the page
+is always laid out normally.
+"""
+
+import io
+import re
+
+import reportlab
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Frame
+from reportlab.platypus.flowables import Flowable
+
+# ReportLab major.minor releases the replay has been checked against.
+REPLAY_VERSIONS = ('5.0',)
+REPLAY_SUPPORTED = '.'.join(reportlab.Version.split('.')[:2]) in REPLAY_VERSIONS
+
+# Operators a replayed stream may use: none of them names a per-document
+# resource except Tf, whose font names are rewritten for each document.
+PORTABLE_OPS = frozenset((
+    'q', 'Q', 'cm', 'w', 'J', 'j', 'M', 'd',
+    'm', 'l', 'c', 'v', 'y', 'h', 're', 'S', 's', 'f', 'F', 'f*', 'B', 'B*', 'b', 'b*', 'n', 'W', 'W*',
+    'g', 'G', 'rg', 'RG', 'k', 'K',
+    'BT', 'ET', 'Td', 'TD', 'Tm', 'T*', 'Tc', 'Tw', 'Tz', 'TL', 'Tf', 'Tr', 'Ts', 'Tj', 'TJ', "'", '"',
+))
+# One content stream token other than a literal string: whitespace or a
+# comment (unnamed), a name, a hex string, an array bracket or a word
+# (a number, keyword or operator).
+TOKEN = re.compile(r'\s+|%[^\r\n]*|(?P<name>/[^\s()<>\[\]{}/%]*)|(?P<hex><[0-9A-Fa-f\s]*>)'
+                   r'|(?P<bracket>[\[\]])|(?P<word>[^\s()<>\[\]{}/%]+)')
+OPERAND_WORD = re.compile(r'[+-]?(?:\d+\.?\d*|\.\d+)|true|false|null')
+# Font resource names: /F1, or /F1+0 for a TrueType subset.
+FONT_NAME = re.compile(r'/F\d+(?:\+\d+)?')
+
+
+def _string_end(stream, start):
+    """Index just past the literal string opening at start, allowing for nesting and escapes."""
+    depth = 0
+    i = start
+    while i < len(stream):
+        c = stream[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise ValueError("unterminated string")
+
+
+def parse_content(stream):
+    """
+    The operators of a content stream as [(operator, operands)], each
+    operand a (kind, text, offset) token. Raises ValueError on anything it
+    can't tokenize (dictionaries, inline image data).
+    """
+    operators, operands, pos = [], [], 0
+    while pos < len(stream):
+        if stream[pos] == '(':
+            end = _string_end(stream, pos)
+            operands.append(('string', stream[pos:end], pos))
+            pos = end
+            continue
+        match = TOKEN.match(stream, pos)
+        if match is None:
+            raise ValueError(f"unexpected {stream[pos]!r} at offset {pos}")
+        pos = match.end()
+        kind, text = match.lastgroup, match.group()
+        if kind is None:
+            continue
+        if kind == 'word' and not OPERAND_WORD.fullmatch(text):
+            operators.append((text, operands))
+            operands = []
+        else:
+            operands.append((kind, text, match.start()))
+    if operands:
+        raise ValueError("operands after the last operator")
+    return operators
+
+
+def font_name_spans(operators):
+    """
+    (start, end) offsets of the internal font name (/F1, without a subset's
+    +0) of every Tf, or None if an operator isn't in PORTABLE_OPS or a Tf
+    doesn't name a font the way ReportLab does.
+    """
+    spans = []
+    for operator, operands in operators:
+        if operator not in PORTABLE_OPS:
+            return None
+        if operator == 'Tf':
+            if len(operands) != 2 or operands[0][0] != 'name' or not FONT_NAME.fullmatch(operands[0][1]):
+                return None
+            _, text, offset = operands[0]
+            spans.append((offset, offset + len(text.split('+')[0])))
+    return spans
+
+
+def frame_geometry(frame):
+    return (frame._x1, frame._y1, frame._width, frame._height, frame._leftPadding,
+            frame._bottomPadding, frame._rightPadding, frame._topPadding, frame.showBoundary)
+
+
+class PrelaidContent:
+    """
+    The content stream one frame's worth of flowables produced on a scratch
+    canvas, split around its font names so they can be swapped per document.
+    portable is False when the stream can't be replayed elsewhere.
+    """
+
+    def __init__(self, flowables, geometry):
+        x1, y1, width, height, left, bottom, right, top, boundary = geometry
+        canvas = Canvas(io.BytesIO())
+        frame = Frame(x1, y1, width, height, leftPadding=left, bottomPadding=bottom,
+                      rightPadding=right, topPadding=top, showBoundary=boundary)
+        pending = list(flowables)
+        frame.addFromList(pending, canvas)
+
+        self.height = frame._y2 - frame._topPadding - frame._y
+        self.bottom = frame._y
+        self.fits = not pending
+        stream = '\n'.join(canvas._code)
+        doc = canvas._doc
+        try:
+            spans = font_name_spans(parse_content(stream))
+        except ValueError:
+            spans = None
+        # The stream cut around its font names: text, name, text, ..., text.
+        self.segments, last = [], 0
+        for start, end in spans or ():
+            self.segments += [stream[last:start], stream[start:end]]
+            last = end
+        self.segments.append(stream[last:])
+        # Internal name (/F1) -> font name, for every font the stream selects.
+        used = set(self.segments[1::2])
+        self.fonts = {internal: name for name, internal in doc.fontMapping.items() if internal in used}
+        self.portable = (self.fits and spans is not None and set(self.fonts) == used
+                         and all(self._ascii_only(name, doc) for name in self.fonts.values()))
+
+    @staticmethod
+    def _ascii_only(font_name, doc):
+        # True if the stream only used codes a TrueType font pre-assigns in every
+        # document, i.e. none were handed out since its subset state was created.
+        font = pdfmetrics.getFont(font_name)
+        state = getattr(font, 'state', {}).get(doc)
+        return state is None or state.nextCode == font.State(font._asciiReadable, font).nextCode
+
+    def stream_for(self, canvas):
+        """The stream with its font names mapped to canvas's document (registering the fonts there)."""
+        doc = canvas._doc
+        names = {}
+        for internal, font_name in self.fonts.items():
+            font = pdfmetrics.getFont(font_name)
+            if getattr(font, '_dynamicFont', False):
+                names[internal] = font.getSubsetInternalName(0, doc).split('+')[0]
+            else:
+                names[internal] = doc.getInternalFontName(font_name)
+        segments = list(self.segments)
+        segments[1::2] = [names[internal] for internal in segments[1::2]]
+        return ''.join(segments)
+
+
+class PrelaidPage(Flowable):
+    """
+    A whole page of static flowables, laid out once per frame geometry and
+    replayed as a content stream (see the module docstring). Put it at the
+    top of a page, after a PageBreak.
+    """
+
+    def __init__(self, flowables):
+        Flowable.__init__(self)
+        self.flowables = list(flowables)
+        self._content = {}
+        self._current = None
+
+    def _content_for(self, frame):
+        geometry = frame_geometry(frame)
+        if geometry not in self._content:
+            self._content[geometry] = PrelaidContent(self.flowables, geometry)
+        return self._content[geometry]
+
+    def wrap(self, availWidth, availHeight):
+        frame = getattr(self, '_frame', None) if REPLAY_SUPPORTED else None
+        self._current = self._content_for(frame) if frame is not None else None
+        if self._current is None or not self._current.fits:
+            # Too long for one page (or no replay on this ReportLab): hand the
+            # flowables to the frame as they are.
+            return availWidth, availHeight + 1
+        return availWidth, self._current.height
+
+    def split(self, availWidth, availHeight):
+        # The flowables are shared by every document using the template, and
+        # platypus marks one it had to move to the next page as _postponed
+        # (failing if it won't fit there either) without ever clearing it.
+        for flowable in self.flowables:
+            flowable.__dict__.pop('_postponed', None)
+        return list(self.flowables)
+
+    def drawOn(self, canvas, x, y, _sW=0):
+        content = self._current
+        dy = y - content.bottom
+        canvas.saveState()
+        if dy:
+            canvas.translate(0, dy)
+        if content.portable:
+            canvas._code.append(content.stream_for(canvas))
+        else:
+            frame = self._frame
+            x1, y1, width, height = frame_geometry(frame)[:4]
+            Frame(x1, y1, width, height, leftPadding=frame._leftPadding,
+                  bottomPadding=frame._bottomPadding, rightPadding=frame._rightPadding,
+                  topPadding=frame._topPadding).addFromList(list(self.flowables), canvas)
+        canvas.restoreState()
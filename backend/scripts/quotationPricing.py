@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Quotation pricing with exact decimal semantics.
+
+compute_totals() prices one quotation with the formula routes/quotations.js
+uses (VAT is charged on the subtotal less the discount), but in Decimal and
+rounded half-up to the cent wherever a printed figure comes from, so the
+line amounts on a PDF add up to its subtotal and subtotal, VAT and total
+always agree:
+
+    line      = round(quantity * price)
+    subtotal  = sum(line)
+    taxable   = subtotal - round(discount)
+    tax       = round(taxable * tax_rate / 100)
+    total     = taxable + tax
+
+TotalsBatch prices many quotations at once. Quantities, prices, discounts
+and rates are parsed into fixed-point integer columns and the formula is
+evaluated over whole columns in exact integer arithmetic, with numpy when
+it is installed and plain lists otherwise. A quotation whose values don't
+fit those scales (a price with fractions of a cent, an exponent, a
+non-number) is left to compute_totals(), so both paths always agree.
+
+audit_batch() and audit_rows() compare the stored subtotal, tax_amount
+and total columns against the items; auditQuotationTotals.py is the
+command-line front end.
+"""
+
+import json
+from decimal import Context, Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import NamedTuple
+
+try:
+    import numpy as np
+except ImportError:  # optional; TotalsBatch falls back to plain lists
+    np = None
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+# Products and roundings run in this context so they never lose digits,
+# whatever the thread's decimal context is.
+EXACT = Context(prec=100, rounding=ROUND_HALF_UP)
+STORED_FIELDS = ('subtotal', 'tax_amount', 'total')
+# What a malformed quotation raises while being priced.
+INVALID = (ValueError, TypeError, AttributeError)
+
+# Fixed-point scales of the batched path: quantities in 1/10000ths,
+# money in cents and rates in hundredths of a percent.
+QTY_PLACES = 4
+MONEY_PLACES = 2
+RATE_PLACES = 2
+# Products at or above this are priced by compute_totals() so int64 never overflows.
+INT64_SAFE = 2 ** 62
+
+
+def to_decimal(value):
+    """Decimal for a numeric column or JSON value; None and '' count as 0."""
+    if value is None or value == '':
+        return ZERO
+    if isinstance(value, float):
+        value = repr(value)
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"Not a number: {value!r}") from None
+    if not number.is_finite():
+        raise ValueError(f"Not a number: {value!r}")
+    return number
+
+
+def money(value):
+    """value rounded half-up to the cent, the way a numeric(10,2) column stores it."""
+    # Adding zero turns a -0.00 from rounding a small negative into 0.00.
+    return EXACT.add(value.quantize(CENT, context=EXACT), ZERO)
+
+
+def format_money(value):
+    return f"R {value:,.2f}"
+
+
+def format_quantity(value):
+    """A quantity as printed: 12, 1.5 (no exponent, no trailing zeros)."""
+    text = f"{value:f}"
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return text
+
+
+class QuotationTotals(NamedTuple):
+    line_totals: tuple
+    subtotal: Decimal
+    discount: Decimal
+    taxable: Decimal
+    tax_rate: Decimal
+    tax_amount: Decimal
+    total: Decimal
+
+
+def quotation_items(data):
+    """The items of a payload or quotations row, decoding the JSONB text form."""
+    items = data.get('items') or []
+    if isinstance(items, str):
+        items = json.loads(items)
+    return items
+
+
+def price_line(quantity, price):
+    """A line's amount from Decimal quantity and price."""
+    return money(EXACT.multiply(quantity, price))
+
+
+def line_total(item):
+    return price_line(to_decimal(item.get('quantity')), to_decimal(item.get('price')))
+
+
+def compute_totals(items, discount=None, tax_rate=None):
+    """Exact totals for one quotation's items."""
+    return totals_for_lines(tuple(line_total(item) for item in items), discount, tax_rate)
+
+
+def totals_for_lines(lines, discount=None, tax_rate=None):
+    """Exact totals from already priced line amounts."""
+    subtotal = ZERO
+    for line in lines:
+        subtotal = EXACT.add(subtotal, line)
+    discount = money(to_decimal(discount))
+    taxable = EXACT.subtract(subtotal, discount)
+    rate = to_decimal(tax_rate)
+    tax = money(EXACT.multiply(taxable, rate).scaleb(-2, EXACT))
+    return QuotationTotals(lines, subtotal, discount, taxable, rate, tax, EXACT.add(taxable, tax))
+
+
+def quotation_totals(data):
+    """compute_totals() for a payload or quotations row."""
+    return compute_totals(quotation_items(data), data.get('discount'), data.get('tax_rate'))
+
+
+def _mismatch(data, field, stored=None, computed=None, error=None):
+    mismatch = {'id': data.get('id'), 'quote_number': data.get('quote_number'), 'field': field}
+    if error:
+        mismatch['error'] = error
+    else:
+        mismatch.update(stored=str(stored), computed=str(computed),
+                        difference=str(EXACT.subtract(computed, stored)))
+    return mismatch
+
+
+def stored_mismatches(data, totals):
+    """Mismatch dicts for the stored totals of data that differ from totals."""
+    computed = {'subtotal': totals.subtotal, 'tax_amount': totals.tax_amount, 'total': totals.total}
+    mismatches = []
+    for field in STORED_FIELDS:
+        stored = money(to_decimal(data.get(field)))
+        if stored != computed[field]:
+            mismatches.append(_mismatch(data, field, stored, computed[field]))
+    return mismatches
+
+
+def audit_quotation(data):
+    """Stored totals that disagree with the items, as a list of mismatch dicts."""
+    try:
+        return stored_mismatches(data, quotation_totals(data))
+    except INVALID as e:
+        return [_mismatch(data, None, error=str(e))]
+
+
+def audit_rows(rows):
+    """audit_quotation() over every row, one at a time."""
+    return [mismatch for row in rows for mismatch in audit_quotation(row)]
+
+
+def _scaled(value, places):
+    """value as a whole number of 10**-places; ValueError if that isn't exact or won't fit int64."""
+    if value is None or value == '':
+        return 0
+    if type(value) is str:
+        text = value
+    else:
+        text = str(value) if type(value) is int else repr(value)
+    whole, _, frac = text.partition('.')
+    if not (whole + frac).lstrip('+-'):
+        raise ValueError(f"Not a number: {value!r}")
+    if len(frac) > places:
+        frac = frac.rstrip('0')
+        if len(frac) > places:
+            raise ValueError(f"More than {places} decimal places: {value!r}")
+    scaled = int(whole + frac.ljust(places, '0'))
+    if not -INT64_SAFE < scaled < INT64_SAFE:
+        raise ValueError(f"Out of range: {value!r}")
+    return scaled
+
+
+def _round_div(value, divisor):
+    """value / divisor rounded half away from zero (divisor a positive power of ten)."""
+    quotient = (abs(value) + divisor // 2) // divisor
+    return quotient if value >= 0 else -quotient
+
+
+def _cents(value):
+    return Decimal(int(value)).scaleb(-MONEY_PLACES, EXACT)
+
+
+class TotalsBatch:
+    """
+    Totals for many quotations at once, as integer cent columns in row
+    order. Rows listed in fallback could not be put in columns and are
+    zero here; price those with quotation_totals(). With stored=True the
+    rows' own subtotal/tax_amount/total columns are read too (see audit_batch).
+    """
+
+    def __init__(self, rows, stored=False):
+        self.rows = rows
+        self.fallback = set()
+        self.stored = stored
+        names = ('discount', 'tax_rate') + (STORED_FIELDS if stored else ())
+        self.columns = {name: [row.get(name) for row in rows] for name in names}
+
+        item_lists = _decode_item_lists(rows)
+        try:
+            items = [item for row_items in item_lists for item in row_items]
+            self.quantities = [item.get('quantity') for item in items]
+            self.prices = [item.get('price') for item in items]
+            self.counts = list(map(len, item_lists))
+        except INVALID:
+            self._split_items(item_lists)
+
+    def _split_items(self, item_lists):
+        """Per-row version of the column build in __init__, for batches with malformed items."""
+        self.counts, self.quantities, self.prices = [], [], []
+        for index, row_items in enumerate(item_lists):
+            try:
+                quantities = [item.get('quantity') for item in row_items]
+                prices = [item.get('price') for item in row_items]
+            except INVALID:
+                self.fallback.add(index)
+                quantities = prices = []
+            self.counts.append(len(quantities))
+            self.quantities.extend(quantities)
+            self.prices.extend(prices)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def totals(self):
+        """
+        {'subtotal', 'tax_amount', 'total'} as integer cents per row (numpy
+        arrays or lists), plus the rows' stored values under 'stored' when
+        the batch was built with stored=True.
+        """
+        if np is not None:
+            return self._totals_numpy()
+        return self._totals_python()
+
+    def _totals_python(self):
+        results = {'subtotal': [], 'tax_amount': [], 'total': []}
+        stored = {field: [] for field in STORED_FIELDS} if self.stored else None
+        line_scale, tax_scale = 10 ** QTY_PLACES, 10 ** (RATE_PLACES + 2)
+        position = 0
+        for index, count in enumerate(self.counts):
+            end = position + count
+            try:
+                if index in self.fallback:
+                    raise ValueError
+                subtotal = 0
+                for quantity, price in zip(self.quantities[position:end], self.prices[position:end]):
+                    subtotal += _round_div(_scaled(quantity, QTY_PLACES) * _scaled(price, MONEY_PLACES),
+                                           line_scale)
+                taxable = subtotal - _scaled(self.columns['discount'][index], MONEY_PLACES)
+                tax = _round_div(taxable * _scaled(self.columns['tax_rate'][index], RATE_PLACES), tax_scale)
+                row_stored = [_scaled(self.columns[field][index], MONEY_PLACES)
+                              for field in STORED_FIELDS] if stored else ()
+            except ValueError:
+                self.fallback.add(index)
+                subtotal = taxable = tax = 0
+                row_stored = [0] * len(STORED_FIELDS)
+            position = end
+            results['subtotal'].append(subtotal)
+            results['tax_amount'].append(tax)
+            results['total'].append(taxable + tax)
+            if stored:
+                for field, value in zip(STORED_FIELDS, row_stored):
+                    stored[field].append(value)
+        if stored:
+            results['stored'] = stored
+        return results
+
+    def _totals_numpy(self):
+        counts = np.array(self.counts, dtype=np.int64)
+        owners = np.repeat(np.arange(len(counts)), counts)
+        rows = np.arange(len(counts))
+        quantities = self._parse_column(self.quantities, QTY_PLACES, owners)
+        prices = self._parse_column(self.prices, MONEY_PLACES, owners)
+        discounts = self._parse_column(self.columns['discount'], MONEY_PLACES, rows)
+        rates = self._parse_column(self.columns['tax_rate'], RATE_PLACES, rows)
+
+        # Rows with a product too large for int64 go to the Decimal path.
+        too_large = _product_too_large(quantities, prices)
+        if too_large.any():
+            self.fallback.update(owners[too_large].tolist())
+            quantities[too_large] = 0
+
+        lines = _round_array(quantities * prices, 10 ** QTY_PLACES)
+        running = np.zeros(len(lines) + 1, dtype=np.int64)
+        np.cumsum(lines, out=running[1:])
+        bounds = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=bounds[1:])
+        subtotals = running[bounds[1:]] - running[bounds[:-1]]
+
+        taxable = subtotals - discounts
+        too_large = _product_too_large(taxable, rates)
+        if too_large.any():
+            self.fallback.update(rows[too_large].tolist())
+            taxable[too_large] = 0
+        taxes = _round_array(taxable * rates, 10 ** (RATE_PLACES + 2))
+
+        results = {'subtotal': subtotals, 'tax_amount': taxes, 'total': taxable + taxes}
+        if self.stored:
+            results['stored'] = {field: self._parse_column(self.columns[field], MONEY_PLACES, rows)
+                                 for field in STORED_FIELDS}
+        return results
+
+    def _parse_column(self, values, places, owners):
+        """
+        values as an int64 array scaled by 10**places. Values that can't be
+        scaled exactly send their rows (owners[i]) to the fallback and count
+        as 0 here.
+        """
+        if not values:
+            return np.zeros(0, dtype=np.int64)
+        texts = list(map(str, values))
+        try:
+            if '\n'.join(texts).translate(PLAIN_NUMBER_CHARS) or max(map(len, texts)) > FLOAT_EXACT_CHARS:
+                raise ValueError
+            floats = np.array(list(map(float, texts)), dtype=np.float64)
+        except ValueError:
+            return self._parse_values(values, places, owners)
+
+        # A value of at most FLOAT_EXACT_CHARS characters parses to within
+        # 2**-52 of itself, so once scaled it lies within FLOAT_TOLERANCE of
+        # an integer exactly when it has no more than `places` decimals.
+        scaled = floats * 10 ** places
+        rounded = np.rint(scaled)
+        magnitude = np.abs(scaled)
+        inexact = (np.abs(scaled - rounded) > magnitude * FLOAT_TOLERANCE) | (magnitude >= FLOAT_EXACT_LIMIT)
+        if inexact.any():
+            self.fallback.update(np.asarray(owners)[inexact].tolist())
+            rounded[inexact] = 0
+        return rounded.astype(np.int64)
+
+    def _parse_values(self, values, places, owners):
+        """_parse_column() one value at a time, for columns holding more than plain decimals (or None)."""
+        scaled = []
+        for i, value in enumerate(values):
+            try:
+                scaled.append(_scaled(value, places))
+            except ValueError:
+                self.fallback.add(int(owners[i]))
+                scaled.append(0)
+        return np.array(scaled, dtype=np.int64)
+
+
+def _decode_item_lists(rows):
+    """quotation_items() for every row; a row whose items can't be decoded gets None."""
+    texts = [row.get('items') or '[]' for row in rows]
+    if all(type(text) is str for text in texts):
+        # One parse of the whole column instead of one per row.
+        try:
+            decoded = json.loads('[' + ','.join(texts) + ']')
+            if len(decoded) == len(texts):
+                return decoded
+        except ValueError:
+            pass
+    item_lists = []
+    for text in texts:
+        try:
+            item_lists.append(json.loads(text) if isinstance(text, str) else text)
+        except ValueError:
+            item_lists.append(None)
+    return item_lists
+
+
+# Characters a plain decimal column may hold; anything left after deleting
+# these (exponents, spaces, words) sends the column down the per-value path.
+PLAIN_NUMBER_CHARS = str.maketrans('', '', '0123456789.-\n')
+# Values this short have at most 15 significant digits, which float64 keeps exactly.
+FLOAT_EXACT_CHARS = 15
+FLOAT_TOLERANCE = 5e-16
+FLOAT_EXACT_LIMIT = 2.0 ** 50
+
+
+def _product_too_large(left, right):
+    return np.abs(left.astype(np.float64)) * np.abs(right.astype(np.float64)) >= INT64_SAFE
+
+
+def _round_array(values, divisor):
+    return np.sign(values) * ((np.abs(values) + divisor // 2) // divisor)
+
+
+def audit_batch(rows):
+    """
+    audit_rows() over column arrays: the same mismatches in the same order,
+    with only the mismatching and fallback rows handled one at a time.
+    """
+    rows = rows if isinstance(rows, list) else list(rows)
+    batch = TotalsBatch(rows, stored=True)
+    computed = batch.totals()
+    stored = computed['stored']
+
+    if np is not None:
+        differs = np.zeros(len(rows), dtype=bool)
+        for field in STORED_FIELDS:
+            differs |= stored[field] != computed[field]
+        candidates = set(np.nonzero(differs)[0].tolist())
+    else:
+        candidates = {index for index in range(len(rows))
+                      if any(stored[field][index] != computed[field][index] for field in STORED_FIELDS)}
+
+    mismatches = []
+    for index in sorted(candidates | batch.fallback):
+        row = rows[index]
+        if index in batch.fallback:
+            mismatches.extend(audit_quotation(row))
+            continue
+        for field in STORED_FIELDS:
+            if stored[field][index] != computed[field][index]:
+                mismatches.append(_mismatch(row, field, _cents(stored[field][index]),
+                                            _cents(computed[field][index])))
+    return mismatches
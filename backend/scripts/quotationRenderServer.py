@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Quotation PDF Render Server
+Keeps ReportLab, the fonts and the logo loaded in one long-lived process and
+renders many quotations through create_quotation_pdf.
+
+Jobs are newline-delimited JSON, read from stdin (default) or from a local
+Unix socket (--socket PATH):
+
+    {"id": "42", "data_path": "/tmp/quote_42_data.json", "output_path": "/tmp/quote_42.pdf"}
+
+A job may carry the payload inline as "data" instead of "data_path", and
+may leave out "output_path" to get the PDF back base64-encoded in the reply
+("pdf") so nothing touches disk. Every job gets exactly one reply line:
+
+    {"id": "42", "ok": true, "output_path": "...", "sha256": "9bda...", "input_sha256": "51c0...", "invariant": true, "elapsed_ms": 83.1}
+    {"id": "42", "ok": true, "pdf": "JVBERi0xLjQK...", "sha256": "9bda...", "input_sha256": "51c0...", "invariant": true, "elapsed_ms": 83.1}
+    {"id": "42", "ok": false, "error": "..."}
+
+sha256 is the digest of the PDF and input_sha256 that of everything it was
+rendered from (quotationPdfCache.cache_key); "invariant" says whether the
+render was reproducible (PDF_INVARIANT_OUTPUT=1). Only then does
+input_sha256 stand for the PDF's bytes and work as a strong ETag: a job
+carrying the client's If-None-Match header as "if_none_match" that lists it
+is answered {"id": "42", "ok": true, "not_modified": true, "input_sha256":
+..., "invariant": true} without rendering. Without invariant output every
+render differs (dates, document ID), so if_none_match is ignored.
+
+A failing job never stops the server. After --max-jobs renders the server
+replies {"event": "recycle"} and exits so the supervisor can start a fresh
+process and keep memory bounded.
+
+A job with "layout": true is only paginated, not rendered, and answered
+{"id": "42", "ok": true, "layout": {...}, "elapsed_ms": 4.2} with the page
+count, per-page story and line item ranges and overflow warnings (see
+quotationLayout).
+
+With --cache-dir the server answers repeat renders of an unchanged
+quotation from quotationPdfCache; replies then carry "cache": "hit"/"miss".
+{"op": "stats"} returns the cache counters ("cache", null without
+--cache-dir) and those of the item paragraph cache ("paragraphs", see
+quotationParagraphCache).
+
+With --metrics (or PDF_RENDER_METRICS=1), or "metrics": true on a single
+job, each job also writes one render_metrics JSON line to stderr (see
+quotationMetrics). --profile-dir (PDF_RENDER_PROFILE_DIR) adds a cProfile
+dump per job.
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import base64
+import hashlib
+import argparse
+import socketserver
+
+from generateQuotationPDF import (
+    load_quotation_data, render_quotation_pdf, invariant_enabled, ASSETS
+)
+from quotationPdfCache import PdfCache, DEFAULT_MAX_BYTES, atomic_write, cache_key, etag_matches
+from quotationParagraphCache import PARAGRAPHS
+from quotationLayout import layout_quotation
+from quotationMetrics import (
+    RenderMetrics, NO_METRICS, metrics_enabled, profile_dir, profile_path_for, profiled
+)
+
+DEFAULT_MAX_JOBS = 200
+
+
+def warm_up():
+    """Pay the one-off font, logo and style setup cost (or load PDF_ASSET_BUNDLE) before the first job arrives."""
+    ASSETS.fonts()
+    ASSETS.logo()
+    ASSETS.stylesheet()
+
+
+def run_job(job, cache=None, metrics=False, profile_to=None):
+    """Renders one job dict and returns the reply dict. Never raises."""
+    job_id = job.get('id') if isinstance(job, dict) else None
+    started = time.perf_counter()
+    if isinstance(job, dict) and job.get('metrics'):
+        metrics = True
+    recorder = RenderMetrics(source='server', id=job_id) if metrics else NO_METRICS
+    try:
+        if not isinstance(job, dict):
+            raise ValueError("Job must be a JSON object")
+        output_path = job.get('output_path')
+
+        with recorder.phase('load'):
+            if 'data' in job:
+                data = job['data']
+            elif job.get('data_path'):
+                data = load_quotation_data(job['data_path'])
+            else:
+                raise ValueError("Job needs either data or data_path")
+        if not isinstance(data, dict):
+            raise ValueError("Quotation payload must be a JSON object")
+        quote_number = data.get('quote_number')
+        recorder.set(quote_number=quote_number)
+        profile_path = profile_path_for(profile_to, quote_number or job_id or 'job')
+        recorder.set(profile=profile_path)
+
+        if job.get('layout'):
+            with recorder.phase('layout'):
+                reply = {'id': job_id, 'ok': True, 'layout': layout_quotation(data)}
+            reply['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            recorder.set(ok=True, layout_only=True, elapsed_ms=reply['elapsed_ms'])
+            return reply
+
+        key = cache_key(data)
+        invariant = invariant_enabled()
+        reply = {'id': job_id, 'ok': True, 'input_sha256': key, 'invariant': invariant}
+        if invariant and etag_matches(job.get('if_none_match'), key):
+            reply['not_modified'] = True
+            reply['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            recorder.set(ok=True, not_modified=True, elapsed_ms=reply['elapsed_ms'])
+            return reply
+
+        with profiled(profile_path):
+            if cache is not None:
+                pdf_bytes, hit = cache.get_or_render(data, recorder, key)
+                reply['sha256'] = hashlib.sha256(pdf_bytes).hexdigest()
+                reply['cache'] = 'hit' if hit else 'miss'
+                recorder.set(cache=reply['cache'])
+            else:
+                buffer = io.BytesIO()
+                reply['sha256'] = render_quotation_pdf(data, buffer, recorder)
+                pdf_bytes = buffer.getvalue()
+
+        if output_path:
+            with recorder.phase('output'):
+                atomic_write(output_path, pdf_bytes)
+            reply['output_path'] = output_path
+        else:
+            with recorder.phase('encode'):
+                reply['pdf'] = base64.b64encode(pdf_bytes).decode('ascii')
+
+        reply['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        recorder.set(ok=True, elapsed_ms=reply['elapsed_ms'])
+        return reply
+    except Exception as e:
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        recorder.set(ok=False, error=str(e), elapsed_ms=elapsed_ms)
+        return {
+            'id': job_id,
+            'ok': False,
+            'error': str(e),
+            'elapsed_ms': elapsed_ms,
+        }
+    finally:
+        recorder.emit()
+
+
+def handle_stream(rfile, write_reply, state):
+    """
+    Reads jobs line by line from rfile until EOF or the job limit is reached.
+    Returns True when the server should recycle.
+    """
+    for raw in rfile:
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            write_reply({'id': None, 'ok': False, 'error': f"Invalid job JSON: {e}"})
+            continue
+
+        if isinstance(job, dict) and job.get('op') == 'stats':
+            cache = state.get('cache')
+            write_reply({'id': job.get('id'), 'ok': True,
+                         'cache': cache.stats() if cache is not None else None,
+                         'paragraphs': PARAGRAPHS.stats()})
+            continue
+
+        write_reply(run_job(job, state.get('cache'), state.get('metrics'), state.get('profile_dir')))
+        state['jobs'] += 1
+
+        if state['max_jobs'] and state['jobs'] >= state['max_jobs']:
+            write_reply({'event': 'recycle', 'jobs': state['jobs'], 'pid': os.getpid()})
+            return True
+    return False
+
+
+def serve_stdio(state):
+    # Replies own stdout; renderer warnings go to stderr.
+    out = sys.stdout
+
+    def write_reply(reply):
+        out.write(json.dumps(reply) + '\n')
+        out.flush()
+
+    write_reply({'event': 'ready', 'pid': os.getpid()})
+    handle_stream(sys.stdin, write_reply, state)
+
+
+def serve_socket(socket_path, state):
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    class JobHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def write_reply(reply):
+                self.wfile.write((json.dumps(reply) + '\n').encode('utf-8'))
+                self.wfile.flush()
+
+            lines = (raw.decode('utf-8') for raw in self.rfile)
+            if handle_stream(lines, write_reply, state):
+                state['recycle'] = True
+
+    server = socketserver.UnixStreamServer(socket_path, JobHandler)
+    print(json.dumps({'event': 'ready', 'pid': os.getpid(), 'socket': socket_path}), flush=True)
+    try:
+        while not state.get('recycle'):
+            server.handle_request()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-lived quotation PDF renderer")
+    parser.add_argument('--socket', help="Listen on this Unix socket instead of stdin/stdout")
+    parser.add_argument('--max-jobs', type=int,
+                        default=int(os.environ.get('PDF_RENDER_MAX_JOBS', DEFAULT_MAX_JOBS)),
+                        help="Exit after this many jobs so the supervisor restarts us (0 = never)")
+    parser.add_argument('--cache-dir', default=os.environ.get('PDF_CACHE_DIR'),
+                        help="Serve unchanged quotations from this PDF cache directory")
+    parser.add_argument('--cache-max-bytes', type=int,
+                        default=int(os.environ.get('PDF_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)))
+    parser.add_argument('--metrics', action='store_true', default=metrics_enabled(),
+                        help="Write a render_metrics JSON line to stderr for every job")
+    parser.add_argument('--profile-dir', default=profile_dir(),
+                        help="Save a cProfile dump of every job in this directory")
+    args = parser.parse_args()
+
+    warm_up()
+    state = {'jobs': 0, 'max_jobs': args.max_jobs,
+             'metrics': args.metrics, 'profile_dir': args.profile_dir}
+    if args.cache_dir:
+        state['cache'] = PdfCache(args.cache_dir, args.cache_max_bytes)
+
+    if args.socket:
+        serve_socket(args.socket, state)
+    else:
+        serve_stdio(state)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Compiled quotation templates.
+
+The PDF route joins quotation_templates into every payload (colours,
+show_* toggles, default_terms, vat_rate, logo_url, company details).
+compile_template() turns those columns into a CompiledTemplate: the
+paragraph and table styles in the template colours, the logo, and the
+acceptance page (laid out once, see quotationPrelaidPage.py). Everything
+in it is independent of the quotation, so it is built once and reused by
+every render with the same template.
+
+Bundles are cached per template id and invalidated when the row's
+updated_at (template_updated_at in the payload) changes, so editing one
+template only recompiles that template. Payloads without a template id or
+updated_at are cached by a digest of their template columns instead.
+"""
+
+import os
+import json
+import hashlib
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+from reportlab.platypus import Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.enums import TA_LEFT, TA_CENTER
+
+from quotationAssets import ASSETS, SCRIPT_DIR, register_custom_fonts, find_logo_path, file_key
+from quotationPrelaidPage import PrelaidPage
+
+# Colors
+PRIMARY_COLOR = colors.HexColor('#8B0000')
+TEXT_DARK = colors.HexColor('#212121')
+TEXT_LIGHT = colors.HexColor('#757575')
+HEADER_BG_GREY = colors.HexColor('#CCCCCC')
+# Text on primary/accent backgrounds, and the items/terms title bars.
+SECONDARY_COLOR = colors.white
+ACCENT_COLOR = colors.black
+
+# Used when the template has no default_terms.
+TERMS_CONDITIONS = [
+    ("Inclusive of VAT", "All prices quoted include a {vat_rate}% Value Added Tax (VAT)."),
+    ("Validity of Quotation", "This quotation is valid for 7 (seven) working days from the date of issue, unless otherwise specified in writing by ScaryByte."),
+    ("Payment Terms", "Payment is due within 1 (one) working week / 7 (seven) working days from the date of invoice following acceptance of this quotation."),
+    ("Currency", "All amounts quoted are in South African Rand (ZAR)."),
+    ("Acceptance of Quotation", "Acceptance of this quotation constitutes agreement to ScaryByte's standard invoicing terms and conditions, including payment terms, ownership terms, and surcharge conditions."),
+    ("Late Payment", "In the event of late or overdue payment, the customer agrees to cover all costs reasonably incurred by ScaryByte, including any applicable and approved additional fees."),
+    ("Credit Authorisation", "Any credit notes, discounts, or adjustments remain subject to the approval and discretion of ScaryByte's management team."),
+    ("Ownership of Goods", "All goods and deliverables remain the property of ScaryByte until full and final payment has been made."),
+    ("Overdue Payments & Surcharges", "Payments not received within 15 (fifteen) days from the invoice date will be deemed overdue. ScaryByte reserves the right to suspend or terminate services or apply a surcharge calculated at an interest rate of 2% for every 10 (ten) days of delayed payment."),
+    ("Amendments", "ScaryByte reserves the right to revise or update these terms and conditions at any time. Any changes affecting an already accepted quotation will be communicated in writing.")
+]
+
+
+class QuotationStyles:
+    """
+    Every ParagraphStyle and TableStyle the quotation uses. They depend only
+    on the fonts and the template colours, so one instance per combination
+    is built and shared through the asset registry (see get_quotation_styles).
+    """
+
+    def __init__(self, font_reg, font_bold, primary_color=PRIMARY_COLOR,
+                 secondary_color=SECONDARY_COLOR, accent_color=ACCENT_COLOR):
+        self.font_reg = font_reg
+        self.font_bold = font_bold
+        text_dark = TEXT_DARK
+        text_light = TEXT_LIGHT
+        header_bg_grey = HEADER_BG_GREY
+        styles = ASSETS.stylesheet()
+
+        # --- Header / footer ---
+        self.contact_style = ParagraphStyle('Contact', parent=styles['Normal'], 
+                                     fontName=font_reg, fontSize=9, leading=11, 
+                                     alignment=TA_CENTER, textColor=text_dark)
+        self.title_style = ParagraphStyle('QTitle', parent=styles['Heading1'], 
+                                   fontName=font_bold, fontSize=24, 
+                                   textColor=text_dark, alignment=TA_LEFT)
+
+        self.header_info_table = TableStyle([
+            ('FONTNAME', (0,0), (-1,-1), font_reg),
+            ('FONTSIZE', (0,0), (-1,-1), 8),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('BACKGROUND', (0,0), (-1,0), header_bg_grey),
+            ('FONTNAME', (0,0), (-1,0), font_bold),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.black),
+            ('BACKGROUND', (0,1), (-1,1), colors.white),
+            ('TEXTCOLOR', (0,1), (-1,1), text_light),
+            ('BACKGROUND', (0,2), (-1,2), header_bg_grey),
+            ('FONTNAME', (0,2), (-1,2), font_bold),
+            ('TEXTCOLOR', (0,2), (-1,2), colors.black),
+            ('BACKGROUND', (0,3), (-1,3), colors.white),
+            ('TEXTCOLOR', (0,3), (-1,3), text_light),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('BOX', (0,0), (-1,-1), 0.5, colors.black),
+            ('TOPPADDING', (0,0), (-1,-1), 3), 
+            ('BOTTOMPADDING', (0,0), (-1,-1), 3),
+        ])
+        self.reg_table = TableStyle([
+            ('FONTNAME', (0,0), (-1,-1), font_reg),
+            ('FONTSIZE', (0,0), (-1,-1), 8),
+            ('TEXTCOLOR', (0,0), (-1,-1), text_light),
+            ('ALIGN', (0,0), (0,-1), 'LEFT'),
+            ('ALIGN', (1,0), (1,-1), 'CENTER'),
+            ('ALIGN', (2,0), (2,-1), 'RIGHT'),
+            ('LEFTPADDING', (0,0), (-1,-1), 0),
+            ('RIGHTPADDING', (0,0), (-1,-1), 0),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ])
+        self.strip_table = TableStyle([
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('ALIGN', (0,0), (0,0), 'LEFT'),
+            ('ALIGN', (1,0), (1,0), 'RIGHT'),
+            ('LINEABOVE', (0,0), (-1,0), 1, colors.grey),
+            ('LINEBELOW', (0,0), (-1,0), 1, colors.grey),
+            ('TOPPADDING', (0,0), (-1,-1), 0),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 0),
+            ('LEFTPADDING', (0,0), (-1,-1), 0),
+            ('RIGHTPADDING', (0,0), (-1,-1), 0),
+        ])
+
+        # --- Page 1 ---
+        self.normal_style = ParagraphStyle('NormalCustom', parent=styles['Normal'], fontName=font_reg, fontSize=9, leading=12)
+        self.header_style = ParagraphStyle('HeaderCustom', parent=styles['Heading3'], fontName=font_bold, fontSize=11, textColor=primary_color, spaceAfter=5, spaceBefore=10)
+
+        self.client_table = TableStyle([
+            # Header Style
+            ('SPAN', (0,0), (1,0)), 
+            ('BACKGROUND', (0,0), (1,0), primary_color),
+            ('TEXTCOLOR', (0,0), (1,0), secondary_color),
+            ('FONTNAME', (0,0), (1,0), font_bold),
+            ('ALIGN', (0,0), (1,0), 'LEFT'),
+            ('TOPPADDING', (0,0), (-1,0), 8), 
+            ('BOTTOMPADDING', (0,0), (-1,0), 8),
+            # Content Style
+            ('FONTNAME', (0,1), (-1,-1), font_reg),
+            ('TEXTCOLOR', (0,1), (-1,-1), text_dark),
+            ('FONTNAME', (0,1), (0,-1), font_bold), 
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.lightgrey),
+            ('BOTTOMPADDING', (0,1), (-1,-1), 8),
+            ('TOPPADDING', (0,1), (-1,-1), 8),
+        ])
+        self.desc_table = TableStyle([
+            # Header Style
+            ('BACKGROUND', (0,0), (-1,0), primary_color),
+            ('TEXTCOLOR', (0,0), (-1,0), secondary_color),
+            ('FONTNAME', (0,0), (-1,0), font_bold),
+            ('ALIGN', (0,0), (-1,0), 'LEFT'),
+            ('TOPPADDING', (0,0), (-1,0), 8), 
+            ('BOTTOMPADDING', (0,0), (-1,0), 8),
+            # Content Style
+            ('VALIGN', (0,1), (-1,-1), 'TOP'),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.lightgrey),
+            ('TOPPADDING', (0,1), (-1,-1), 8),
+            ('BOTTOMPADDING', (0,1), (-1,-1), 8),
+        ])
+        self.items_table = TableStyle([
+            # -- Title Row --
+            ('SPAN', (0,0), (-1,0)),
+            ('BACKGROUND', (0,0), (-1,0), accent_color), # Changed to BLACK
+            ('TEXTCOLOR', (0,0), (-1,0), secondary_color),
+            ('FONTNAME', (0,0), (-1,0), font_bold),
+            ('ALIGN', (0,0), (-1,0), 'LEFT'),
+            ('TOPPADDING', (0,0), (-1,0), 8),
+            ('BOTTOMPADDING', (0,0), (-1,0), 8),
+            
+            # -- Column Headers --
+            ('BACKGROUND', (0,1), (-1,1), primary_color),
+            ('TEXTCOLOR', (0,1), (-1,1), secondary_color),
+            ('FONTNAME', (0,1), (-1,1), font_bold),
+            ('ALIGN', (1,1), (-1,1), 'RIGHT'), 
+            ('ALIGN', (0,1), (0,1), 'LEFT'),
+            ('TOPPADDING', (0,1), (-1,1), 8),
+            ('BOTTOMPADDING', (0,1), (-1,1), 8),
+            
+            # -- Data --
+            ('FONTNAME', (0,2), (-1,-1), font_reg),
+            ('FONTNAME', (0,2), (0,-1), font_bold), 
+            ('ALIGN', (1,2), (-1,-1), 'RIGHT'),
+            ('ALIGN', (0,2), (0,-1), 'LEFT'),
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.lightgrey),
+            ('TOPPADDING', (0,2), (-1,-1), 8),
+            ('BOTTOMPADDING', (0,2), (-1,-1), 8),
+        ])
+        self.totals_table = TableStyle([
+            ('ALIGN', (0,0), (-1,-1), 'RIGHT'),
+            ('FONTNAME', (0,0), (-1,-1), font_bold),
+            ('TEXTCOLOR', (-1,-1), (-1,-1), primary_color),
+            ('LINEABOVE', (0,-1), (-1,-1), 1, primary_color),
+            ('TOPPADDING', (0,0), (-1,-1), 6),
+        ])
+
+        # --- Page 2 ---
+        self.accept_style = ParagraphStyle('AcceptTitle', parent=styles['Heading1'], fontName=font_bold, fontSize=18, textColor=primary_color, alignment=TA_CENTER, spaceAfter=10)
+        self.terms_title_style = ParagraphStyle('TermsTitle', parent=styles['Heading2'], fontName=font_bold, fontSize=12, textColor=secondary_color, alignment=TA_LEFT, spaceAfter=8)
+        self.terms_item_style = ParagraphStyle('TermsItem', parent=styles['Normal'], fontName=font_reg, fontSize=6, leading=8, leftIndent=0, spaceBefore=2)
+
+        self.terms_table = TableStyle([
+            # Header Style
+            ('BACKGROUND', (0,0), (-1,0), accent_color),
+            ('TEXTCOLOR', (0,0), (-1,0), secondary_color),
+            ('FONTNAME', (0,0), (-1,0), font_bold),
+            ('FONTSIZE', (0,0), (-1,0), 11),
+            ('ALIGN', (0,0), (-1,0), 'LEFT'),
+            ('TOPPADDING', (0,0), (-1,0), 6),
+            ('BOTTOMPADDING', (0,0), (-1,0), 6),
+            # Content Style
+            ('VALIGN', (0,1), (-1,-1), 'TOP'),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.lightgrey),
+            ('TOPPADDING', (0,1), (-1,-1), 6),
+            ('BOTTOMPADDING', (0,1), (-1,-1), 6),
+            ('LEFTPADDING', (0,1), (-1,-1), 8),
+            ('RIGHTPADDING', (0,1), (-1,-1), 8),
+        ])
+        self.sig_table = TableStyle([
+            ('FONTNAME', (0,0), (-1,-1), font_bold),
+            ('FONTSIZE', (0,0), (-1,-1), 10),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 10),
+        ])
+
+
+def get_quotation_styles(font_reg, font_bold, primary_color=PRIMARY_COLOR,
+                         secondary_color=SECONDARY_COLOR, accent_color=ACCENT_COLOR):
+    key = ('QuotationStyles', font_reg, font_bold,
+           primary_color.hexval(), secondary_color.hexval(), accent_color.hexval())
+    return ASSETS.cached(key, lambda: QuotationStyles(font_reg, font_bold, primary_color,
+                                                      secondary_color, accent_color))
+
+
+BACKEND_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, '..'))
+# The only directories a template's logo_url may point into.
+LOGO_DIRS = [os.path.join(BACKEND_DIR, 'logos'), os.path.join(BACKEND_DIR, 'uploads')]
+
+# Column defaults, used when the payload has no template (or a NULL column).
+DEFAULT_TEMPLATE = {
+    'company_name': 'ScaryByte (Pty) Ltd',
+    'company_tagline': 'MILITARY GRADE CYBER SOLUTIONS',
+    'company_address': '165 West Street, Sandton, Johannesburg',
+    'company_phone': '+27 (0) 10 006 3999',
+    'company_email': 'support@scarybyte.co.za',
+    'company_website': 'www.scarybyte.co.za',
+    'company_reg_number': '2021/324782/07',
+    'company_vat_number': '4500299245',
+    'primary_color': '#8B0000',
+    'secondary_color': '#FFFFFF',
+    'accent_color': '#000000',
+    'show_logo': True,
+    'show_tagline': True,
+    'show_client_info': True,
+    'show_description': True,
+    'show_terms': True,
+    'show_signature': True,
+    'default_terms': None,
+    'vat_rate': '15.00',
+    'logo_url': None,
+}
+
+
+def template_row(data):
+    """The template columns of a route payload, with defaults filled in."""
+    row = {}
+    for name, default in DEFAULT_TEMPLATE.items():
+        value = data.get(name)
+        row[name] = default if value is None else value
+    return row
+
+
+def parse_color(value, default):
+    try:
+        return colors.toColor(value)
+    except Exception:
+        return default
+
+
+def format_rate(value, default='15'):
+    """'15.00' -> '15', '7.50' -> '7.5'."""
+    try:
+        return f"{float(value):g}"
+    except (TypeError, ValueError):
+        return default
+
+
+def resolve_logo_path(logo_url):
+    """
+    A local file for a template's logo_url, or None. Remote URLs are not
+    fetched at render time; those templates get the default logo. Only
+    files whose real path lies inside LOGO_DIRS are used.
+    """
+    if not logo_url or '://' in logo_url:
+        return None
+    relative = logo_url.lstrip('/\\')
+    candidates = [os.path.join(BACKEND_DIR, relative), os.path.join(BACKEND_DIR, 'logos', relative)]
+    if os.path.isabs(logo_url):
+        candidates.insert(0, logo_url)
+    roots = [os.path.realpath(root) + os.sep for root in LOGO_DIRS]
+    for path in candidates:
+        real = os.path.realpath(path)
+        if any(real.startswith(root) for root in roots) and os.path.isfile(real):
+            return real
+    return None
+
+
+def template_terms(default_terms, vat_rate):
+    """
+    [(title, text)] for the terms table: one entry per non-empty line of the
+    template's default_terms, or the built-in TERMS_CONDITIONS without them.
+    Returned text is already escaped for Paragraph markup.
+    """
+    if default_terms and default_terms.strip():
+        lines = [line.strip() for line in default_terms.splitlines() if line.strip()]
+        return [(None, escape(line)) for line in lines]
+    return [(title, content.format(vat_rate=vat_rate)) for title, content in TERMS_CONDITIONS]
+
+
+class CompiledTemplate:
+    """
+    Everything a render needs from one quotation_templates row: styles in
+    the template colours, header/footer text, toggles, VAT rate, logo and
+    the prelaid acceptance page.
+    """
+
+    def __init__(self, row, logo_path):
+        self.row = row
+        font_reg, font_bold = register_custom_fonts()
+        self.primary_color = parse_color(row['primary_color'], PRIMARY_COLOR)
+        self.secondary_color = parse_color(row['secondary_color'], SECONDARY_COLOR)
+        self.accent_color = parse_color(row['accent_color'], ACCENT_COLOR)
+        self.styles = get_quotation_styles(font_reg, font_bold, self.primary_color,
+                                           self.secondary_color, self.accent_color)
+
+        self.company_name = row['company_name']
+        self.tagline = row['company_tagline'] if row['show_tagline'] else ''
+        self.address = row['company_address']
+        self.phone = row['company_phone']
+        self.email = row['company_email']
+        self.website = row['company_website']
+        self.reg_num = row['company_reg_number']
+        self.vat_num = row['company_vat_number']
+
+        self.show_client_info = bool(row['show_client_info'])
+        self.show_description = bool(row['show_description'])
+        self.show_terms = bool(row['show_terms'])
+        self.show_signature = bool(row['show_signature'])
+        self.vat_rate = format_rate(row['vat_rate'])
+        self.terms = template_terms(row['default_terms'], self.vat_rate)
+        self.logo_path = logo_path
+        self.logo = ASSETS.image(logo_path) if logo_path else None
+        self._acceptance = {}
+
+    def acceptance_story(self, total_width):
+        """
+        Flowables for the customer acceptance page (terms and signature
+        block), or [] if the template shows neither. Built once per width;
+        they hold no per-quotation data, so the page is a PrelaidPage that
+        is laid out once and replayed into every render.
+        """
+        if total_width not in self._acceptance:
+            self._acceptance[total_width] = self._build_acceptance(total_width)
+        return self._acceptance[total_width]
+
+    def _build_acceptance(self, total_width):
+        if not (self.show_terms or self.show_signature):
+            return []
+        styles = self.styles
+        elements = [Spacer(1, 1*mm)]
+        elements.append(Paragraph("CUSTOMER ACCEPTANCE", styles.accept_style))
+
+        if self.show_terms:
+            # Terms & Conditions Section
+            tc_data = [["Terms & Conditions (Applicable to This Quotation)"]]
+            numbered = len(self.terms) > 1
+            for idx, (title, content) in enumerate(self.terms, 1):
+                if title:
+                    term_text = f"<b>{idx}. {title}</b><br/>{content}"
+                elif numbered:
+                    term_text = f"<b>{idx}.</b> {content}"
+                else:
+                    term_text = content
+                tc_data.append([Paragraph(term_text, styles.terms_item_style)])
+
+            t_terms = Table(tc_data, colWidths=[total_width])
+            t_terms.setStyle(styles.terms_table)
+            elements.append(t_terms)
+            elements.append(Spacer(1, 10*mm))
+
+        if self.show_signature:
+            sig_data = [
+                ["SIGNED AT: _______________________", "DATE: ______________________________"],
+                ["", ""],
+                ["FULL NAME: _______________________", "DESIGNATION: _______________________"],
+                ["", ""],
+                ["SIGNATURE: _______________________", "STAMP:"]
+            ]
+            t_sig = Table(sig_data, colWidths=[total_width/2, total_width/2])
+            t_sig.setStyle(styles.sig_table)
+            elements.append(t_sig)
+            elements.append(Spacer(1, 20*mm))
+        return [PageBreak(), PrelaidPage(elements)]
+
+
+def compile_template(data):
+    """
+    The CompiledTemplate for a payload's template, compiled on first use.
+    Keyed by template_id and versioned by template_updated_at (plus fonts
+    and logo file), so editing one template recompiles only that one.
+    """
+    row = template_row(data)
+    logo_path = None
+    if row['show_logo']:
+        logo_path = resolve_logo_path(row['logo_url']) or find_logo_path()
+
+    template_id = data.get('template_id')
+    updated_at = data.get('template_updated_at')
+    if template_id is not None and updated_at:
+        key, version = ('template', str(template_id)), str(updated_at)
+    else:
+        digest = hashlib.sha256(json.dumps(row, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        key, version = ('template', digest), None
+
+    version = (version, register_custom_fonts(), file_key(logo_path))
+    return ASSETS.versioned(key, version, lambda: CompiledTemplate(row, logo_path))
@@ -0,0 +1,77 @@
+const { spawn } = require('child_process');
+const path = require('path');
+
+// Background PDF renders through the durable job queue
+// (scripts/quotationJobQueue.py, a SQLite database at PDF_JOB_QUEUE_DB).
+// The API only submits and polls jobs, each through one short CLI call; the
+// renders happen in the queue's own workers (npm run pdf-job-workers), which
+// must share PDF_JOB_QUEUE_DB and PDF_JOB_OUTPUT_DIR with the API.
+// A quotation always uses the same job id, so requesting it again while its
+// job is queued or running collapses into one render of the latest payload.
+
+const scriptPath = path.join(__dirname, '../scripts/quotationJobQueue.py');
+// Use 'python' on Windows, 'python3' on Unix
+const pythonCmd = process.platform === 'win32' ? 'python' : 'python3';
+const dbPath = process.env.PDF_JOB_QUEUE_DB;
+// Exit code of `status` for an unknown job id (NO_JOB_EXIT in the script).
+const noJobExit = 66;
+// Job ids the queue accepts (JOB_ID in the script).
+const jobIdPattern = /^[A-Za-z0-9_-][A-Za-z0-9_.-]{0,127}$/;
+
+const isEnabled = () => Boolean(dbPath);
+
+// Runs the queue CLI with args (and input on stdin). Resolves with its parsed
+// JSON output; rejects with an Error carrying the exit code otherwise.
+const runQueue = (args, input = '') =>
+  new Promise((resolve, reject) => {
+    const proc = spawn(pythonCmd, [scriptPath, '--db', dbPath, ...args], {
+      stdio: ['pipe', 'pipe', 'pipe'],
+    });
+    let stdout = '';
+    let stderr = '';
+    proc.stdout.on('data', (chunk) => { stdout += chunk; });
+    proc.stderr.on('data', (chunk) => { stderr += chunk; });
+    proc.on('error', reject);
+    proc.on('close', (code) => {
+      if (code !== 0) {
+        const err = new Error(stderr.trim() || `PDF job queue exited with code ${code}`);
+        err.code = code;
+        return reject(err);
+      }
+      try {
+        resolve(JSON.parse(stdout));
+      } catch (err) {
+        reject(new Error(`PDF job queue sent invalid output: ${stdout}`));
+      }
+    });
+    proc.stdin.on('error', () => {});
+    proc.stdin.end(input);
+  });
+
+const jobIdFor = (quotation) => `quotation-${quotation.id}`;
+
+// Queues a render of a quotation row (as selected by the PDF route).
+// Resolves with the job id.
+const submitPdfJob = async (quotation) => {
+  const { id } = await runQueue(['submit', '-', `--id=${jobIdFor(quotation)}`], JSON.stringify(quotation));
+  return id;
+};
+
+// Resolves with a job's status (see job_summary in the script: status is
+// queued, running, done or dead, and output_path is set once it is done),
+// or null for an unknown job id.
+const getPdfJob = async (jobId) => {
+  if (!jobIdPattern.test(jobId)) return null;
+  try {
+    return await runQueue(['status', '--', jobId]);
+  } catch (err) {
+    if (err.code === noJobExit) return null;
+    throw err;
+  }
+};
+
+module.exports = {
+  isEnabled,
+  submitPdfJob,
+  getPdfJob,
+};
@@ -0,0 +1,247 @@
+const { spawn } = require('child_process');
+const crypto = require('crypto');
+const readline = require('readline');
+const os = require('os');
+const path = require('path');
+
+// Long-lived generateQuotationPDF.py workers (scripts/quotationRenderServer.py).
+// A small pool of Python processes (PDF_RENDER_WORKERS, default up to 2, one
+// per CPU) renders jobs sent as JSON lines over stdin, one job per worker at a
+// time; jobs wait in a queue until a worker is free. Workers are restarted
+// whenever they recycle themselves or die. Payloads go in and PDF bytes come
+// back over the pipe, so no temp files are involved.
+// A job's timeout (PDF_RENDER_TIMEOUT_MS) starts when a worker takes it, not
+// while it waits, and a job that times out kills only its own worker.
+// Renders are reproducible (PDF_INVARIANT_OUTPUT, on unless set to 0), so the
+// digest of a render's inputs serves as its ETag and an If-None-Match that
+// still matches is answered without rendering.
+// layoutQuotation() asks a worker for pagination only (page count, where the
+// items table breaks, overflow warnings), without rendering a PDF.
+// Concurrent requests for the same quotation row (same contents, so the same
+// version) share one job: the first starts it and the rest wait on its
+// result, so a quotation opened by several people at once renders once.
+// With PDF_RENDER_METRICS=1 the worker writes one render_metrics JSON line to
+// stderr per job; those are logged as-is and folded into getRenderStats().
+
+const scriptPath = path.join(__dirname, '../scripts/quotationRenderServer.py');
+// Use 'python' on Windows, 'python3' on Unix
+const pythonCmd = process.platform === 'win32' ? 'python' : 'python3';
+const maxJobs = Number(process.env.PDF_RENDER_MAX_JOBS) || 200;
+const jobTimeoutMs = Number(process.env.PDF_RENDER_TIMEOUT_MS) || 60000;
+const poolSize = Math.max(1, Number(process.env.PDF_RENDER_WORKERS) || Math.min(2, os.cpus().length));
+const workerEnv = { ...process.env, PDF_INVARIANT_OUTPUT: process.env.PDF_INVARIANT_OUTPUT || '1' };
+
+// Live workers that can take jobs; a worker leaves the set when it recycles or dies.
+const workers = new Set();
+// Jobs waiting for a free worker, oldest first.
+const queue = [];
+let nextJobId = 1;
+const inFlight = new Map();
+const renderStats = { renders: 0, failed: 0, cacheHits: 0, totalMs: 0, maxMs: 0, pages: 0, bytes: 0 };
+const flightStats = { jobs: 0, coalesced: 0 };
+
+const recordMetrics = (metrics) => {
+  renderStats.renders += 1;
+  if (!metrics.ok) renderStats.failed += 1;
+  if (metrics.cache === 'hit') renderStats.cacheHits += 1;
+  const elapsedMs = Number(metrics.elapsed_ms) || 0;
+  renderStats.totalMs += elapsedMs;
+  renderStats.maxMs = Math.max(renderStats.maxMs, elapsedMs);
+  renderStats.pages += metrics.pages || 0;
+  renderStats.bytes += metrics.pdf_bytes || 0;
+};
+
+const parseMetrics = (line) => {
+  if (!line.startsWith('{')) return null;
+  try {
+    const parsed = JSON.parse(line);
+    return parsed.event === 'render_metrics' ? parsed : null;
+  } catch (err) {
+    return null;
+  }
+};
+
+// Detaches the worker's current job (if any) and stops its timer.
+const takeJob = (proc) => {
+  const { job } = proc;
+  proc.job = null;
+  if (job) clearTimeout(job.timer);
+  return job;
+};
+
+const startWorker = () => {
+  const proc = spawn(pythonCmd, [scriptPath, '--max-jobs', String(maxJobs)], {
+    stdio: ['pipe', 'pipe', 'pipe'],
+    env: workerEnv,
+  });
+  proc.job = null;
+  workers.add(proc);
+
+  readline.createInterface({ input: proc.stdout }).on('line', (line) => {
+    let reply;
+    try {
+      reply = JSON.parse(line);
+    } catch (err) {
+      console.error('PDF renderer sent invalid reply:', line);
+      return;
+    }
+
+    if (reply.event === 'recycle') {
+      // It exits after this; its replacement can start now.
+      proc.recycled = true;
+      workers.delete(proc);
+      pump();
+      return;
+    }
+    if (reply.event) return;
+
+    if (!proc.job || proc.job.request.id !== String(reply.id)) return;
+    const job = takeJob(proc);
+
+    if (reply.ok && reply.layout) {
+      job.resolve(reply.layout);
+    } else if (reply.ok && reply.not_modified) {
+      job.resolve({ notModified: true, inputSha256: reply.input_sha256, invariant: true });
+    } else if (reply.ok) {
+      job.resolve({
+        pdf: Buffer.from(reply.pdf, 'base64'),
+        sha256: reply.sha256,
+        inputSha256: reply.input_sha256,
+        invariant: Boolean(reply.invariant),
+      });
+    } else {
+      job.reject(new Error(reply.error || 'PDF generation failed'));
+    }
+    pump();
+  });
+
+  // Writes to a worker that just died surface through the 'exit' handler instead.
+  proc.stdin.on('error', () => {});
+
+  readline.createInterface({ input: proc.stderr }).on('line', (line) => {
+    const text = line.trim();
+    if (!text) return;
+    const metrics = parseMetrics(text);
+    if (metrics) {
+      recordMetrics(metrics);
+      console.log('PDF render metrics:', text);
+    } else {
+      console.error('PDF generation warning:', text);
+    }
+  });
+
+  proc.on('exit', (code, signal) => {
+    workers.delete(proc);
+    const job = takeJob(proc);
+    if (job && proc.recycled) {
+      // Written after the worker hit its recycle limit, so never read; it goes first to the next one.
+      queue.unshift(job);
+    } else if (job) {
+      job.reject(new Error(`PDF renderer exited (code ${code}, signal ${signal})`));
+    }
+    pump();
+  });
+
+  proc.on('error', (err) => {
+    workers.delete(proc);
+    // The renderer can't be started at all, so fail what is waiting rather than retry forever.
+    const failed = [takeJob(proc), ...queue.splice(0)].filter(Boolean);
+    for (const job of failed) job.reject(new Error(`PDF renderer failed to start: ${err.message}`));
+  });
+
+  return proc;
+};
+
+const run = (proc, job) => {
+  proc.job = job;
+  job.timer = setTimeout(() => {
+    if (proc.job !== job) return;
+    takeJob(proc);
+    job.reject(new Error('PDF generation timed out'));
+    // The worker is stuck on this job alone; replace it.
+    workers.delete(proc);
+    proc.kill();
+    pump();
+  }, jobTimeoutMs);
+  proc.stdin.write(JSON.stringify(job.request) + '\n');
+};
+
+// Hands queued jobs to idle workers, starting workers up to poolSize.
+const pump = () => {
+  while (queue.length) {
+    let idle = null;
+    for (const proc of workers) {
+      if (!proc.job) {
+        idle = proc;
+        break;
+      }
+    }
+    if (!idle && workers.size < poolSize) idle = startWorker();
+    if (!idle) return;
+    run(idle, queue.shift());
+  }
+};
+
+const submit = (fields) => {
+  const id = String(nextJobId++);
+  flightStats.jobs += 1;
+
+  return new Promise((resolve, reject) => {
+    queue.push({ request: { id, ...fields }, resolve, reject });
+    pump();
+  });
+};
+
+// Runs submit(fields) unless an identical request is already in flight, in
+// which case its promise is shared. Settled jobs are forgotten, so the next
+// request after a render (or a failure) starts a fresh one.
+const singleFlight = (fields) => {
+  const key = crypto.createHash('sha256').update(JSON.stringify(fields)).digest('hex');
+  const running = inFlight.get(key);
+  if (running) {
+    flightStats.coalesced += 1;
+    return running;
+  }
+  const job = submit(fields).finally(() => inFlight.delete(key));
+  inFlight.set(key, job);
+  return job;
+};
+
+// Renders a quotation row (as selected by the PDF route). Resolves with
+// { pdf, sha256, inputSha256, invariant }: the PDF Buffer, its SHA-256, the
+// digest of what it was rendered from and whether the render was
+// reproducible. Only an invariant render's inputSha256 identifies its bytes,
+// so only then is it an ETag; when options.ifNoneMatch (the request's
+// If-None-Match header) lists it, resolves with { notModified: true,
+// inputSha256, invariant: true } instead, without rendering. Callers
+// sending the same row and If-None-Match at once share one render and its
+// result, so treat the resolved value (and its Buffer) as read-only.
+const renderQuotation = (quotation, options = {}) => {
+  const fields = { data: quotation };
+  if (options.ifNoneMatch) fields.if_none_match = options.ifNoneMatch;
+  return singleFlight(fields);
+};
+
+// Paginates a quotation row without rendering it. Resolves with the layout
+// from scripts/quotationLayout.py: { page_count, quotation_pages,
+// acceptance_pages, pages, story, warnings, complete }.
+const layoutQuotation = (quotation) => singleFlight({ data: quotation, layout: true });
+
+// Aggregates of the render_metrics lines seen so far (empty unless
+// PDF_RENDER_METRICS=1), plus the jobs sent to the workers, the requests that
+// joined one already in flight (coalesced), the jobs in flight now, the jobs
+// waiting for a free worker (queued) and the live workers.
+const getRenderStats = () => ({
+  ...renderStats,
+  avgMs: renderStats.renders ? renderStats.totalMs / renderStats.renders : null,
+  ...flightStats,
+  inFlight: inFlight.size,
+  queued: queue.length,
+  workers: workers.size,
+});
+
+module.exports = {
+  renderQuotation,
+  layoutQuotation,
+  getRenderStats,
+};